@@ -0,0 +1,1011 @@
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from contextlib import nullcontext
+
+import config
+import desplazamientos
+import fragmentacion
+import historico
+import instantanea
+from bitacora import Bitacora
+from bloqueo import BloqueoArchivo
+from desplazamientos import IndiceDesplazamientos, CachePacientes
+from escritor import EscritorDiferido
+from historial import marca_tiempo, SIN_FECHA
+from historico import HistoricoAtenciones
+from modelo import GestorDatos, Paciente, AtencionTriage, RegistroPacientes, DniDuplicadoException
+
+NIVELES_ATENCION = ["Urgente", "Normal"]
+CLASIFICACIONES_IMC = ["Bajo peso", "Normal", "Sobrepeso", "Obesidad", "Error (Talla 0)"]
+
+
+class Almacen:
+
+    # Interfaz comun de persistencia: el Controlador solo habla con ella, y
+    # cada implementacion resuelve las consultas a su manera
+
+    # Veces que el almacen releyo el historial al escribir porque otro
+    # proceso lo habia cambiado (quien tenga indices debe reconstruirlos)
+    recargas = 0
+
+    # El almacen resuelve atenciones_entre con su propio indice (si no,
+    # AlmacenIndexado mantiene uno en memoria)
+    rangos_de_tiempo_indexados = False
+
+    # AlmacenIndexado mantiene un indice de nombres en memoria (si no,
+    # busca por nombre recorriendo los pacientes)
+    indexar_nombres = True
+
+    # El almacen resuelve urgentes, estadisticas y busqueda por nombre con
+    # sus propios indices: AlmacenIndexado no arma la cola, las estadisticas
+    # ni el indice de nombres (ni recorre los pacientes al iniciar)
+    consultas_indexadas = False
+
+    def cargar(self):
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def total_pacientes(self):
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def buscar_por_dni(self, dni):
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def buscar_por_nombre(self, texto):
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def listar_pacientes(self):
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def listar_pagina(self, desde, cantidad):
+        # Los pacientes de listar_pacientes() en [desde, desde + cantidad);
+        # los almacenes que pueden saltear sin recorrer lo redefinen
+        return list(itertools.islice(self.listar_pacientes(), desde, desde + cantidad))
+
+    def listar_urgentes(self):
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def estadisticas(self):
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def atenciones_entre(self, desde, hasta, solo_urgentes=False):
+        # (paciente, atencion) con desde <= fecha < hasta (segundos Unix),
+        # de la mas antigua a la mas reciente
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def registrar_atencion(self, paciente, atencion, es_nuevo):
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def historial_archivado(self, dni):
+        # Atenciones del paciente que salieron del historial en memoria al
+        # archivo historico (historico.py), de la mas antigua a la mas reciente
+        return []
+
+    def registrar_lote(self, cambios, compactar=True):
+        # cambios: lista de (paciente, atencion, es_nuevo) que se guardan juntos;
+        # compactar=False deja el mantenimiento del almacen para el cierre
+        # (cargas masivas)
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def guardar_pendientes(self):
+        # Fuerza el guardado de lo registrado que todavia no esta en disco;
+        # los almacenes que guardan al registrar no tienen nada pendiente
+        return True
+
+    def cerrar(self):
+        raise NotImplementedError("Debe implementarse en las subclases.")
+
+    def exclusion(self):
+        # Quien modifica pacientes del registro antes de registrar_lote lo
+        # hace dentro de este contexto, para que un guardado en segundo plano
+        # no vea el cambio a medias
+        return nullcontext()
+
+    # Consultas puntuales (modo sin menu): abrir() deja el almacen listo sin
+    # cargar todo el historial si el formato lo permite, y las consultar_*
+    # devuelven iterables que no hace falta guardar completos
+
+    def abrir(self):
+        self.cargar()
+
+    def consultar_dni(self, dni):
+        return self.buscar_por_dni(dni)
+
+    def consultar_pacientes(self):
+        return self.listar_pacientes()
+
+    def consultar_urgentes(self):
+        return self.listar_urgentes()
+
+    @staticmethod
+    def estadisticas_vacias():
+        return {
+            "total": 0,
+            "promedio_edad": 0,
+            "por_atencion": {nivel: 0 for nivel in NIVELES_ATENCION},
+            "por_imc": {clasificacion: 0 for clasificacion in CLASIFICACIONES_IMC}
+        }
+
+    @staticmethod
+    def estadisticas_de(pacientes):
+        # Una sola pasada: pacientes puede ser un iterador
+        stats = Almacen.estadisticas_vacias()
+        total = 0
+        suma_edad = 0
+
+        for p in pacientes:
+            total += 1
+            suma_edad += p.edad
+            atencion = p.obtener_ultima_atencion()
+            if atencion is None:
+                continue
+
+            if atencion.nivel_atencion in stats["por_atencion"]:
+                stats["por_atencion"][atencion.nivel_atencion] += 1
+
+            if atencion.clasificacion_imc in stats["por_imc"]:
+                stats["por_imc"][atencion.clasificacion_imc] += 1
+
+        if total:
+            stats["total"] = total
+            stats["promedio_edad"] = round(suma_edad / total, 1)
+        return stats
+
+
+class AlmacenJson(Almacen):
+
+    # Todo el historial en memoria; persiste con GestorDatos (datos.json +
+    # bitacora). Varios procesos pueden compartir el archivo: cada escritura
+    # toma el bloqueo y, si la version en disco no es la que este proceso
+    # conoce, mezcla por DNI en lugar de pisar lo que escribieron los otros.
+    #
+    # durabilidad: "inmediato" guarda antes de volver de registrar_lote;
+    # "diferido" y "periodico" solo actualizan la memoria y dejan el guardado
+    # a un EscritorDiferido (con el historial cargado).
+    #
+    # dias_historico: al cargar, las atenciones mas antiguas pasan al archivo
+    # historico comprimido (historico.py) y solo se leen al pedirlas.
+
+    def __init__(self, archivo, usar_bitacora=True, umbral_compactacion=None,
+                 durabilidad="inmediato", ventana_guardado=0.5, periodo_guardado=5.0,
+                 dias_historico=None, compresion_historico="gzip"):
+        if durabilidad != "inmediato" and durabilidad not in EscritorDiferido.MODOS:
+            raise ValueError(f"Modo de durabilidad desconocido: {durabilidad}")
+
+        self.archivo = archivo
+        self.usar_bitacora = usar_bitacora
+        self.umbral_compactacion = umbral_compactacion
+        self.durabilidad = durabilidad
+        self.ventana_guardado = ventana_guardado
+        self.periodo_guardado = periodo_guardado
+        self.dias_historico = dias_historico
+        self.compresion_historico = compresion_historico
+        self._historico = None
+        self.pacientes = RegistroPacientes()
+        self.cargado = False
+        self.version = 0
+        # Cambios propios que todavia no estan en disco (sin bitacora, o a la
+        # espera del escritor en segundo plano)
+        self._pendientes = []
+        self._mutex = threading.RLock()
+        self._escritor = None
+
+    def cargar(self):
+        if self.dias_historico is not None:
+            with BloqueoArchivo(self.archivo):
+                historico.archivar_si_corresponde(self.archivo, self.dias_historico, self.compresion_historico)
+
+        with BloqueoArchivo(self.archivo, compartido=True):
+            self.pacientes = GestorDatos.cargar_pacientes(self.archivo)
+            self.version = GestorDatos.leer_version(self.archivo)
+        self.cargado = True
+        if self.usar_bitacora and self.umbral_compactacion is not None:
+            self._compactar(self.umbral_compactacion)
+
+        if self.durabilidad != "inmediato" and self._escritor is None:
+            self._escritor = EscritorDiferido(
+                self._guardar_pendientes, self.durabilidad,
+                self.ventana_guardado, self.periodo_guardado
+            )
+
+    def abrir(self):
+        # Con bitacora se puede registrar anexando sin cargar; sin ella cada
+        # registro reescribe el archivo completo y hace falta el historial
+        if not self.usar_bitacora:
+            self.cargar()
+
+    def consultar_dni(self, dni):
+        if self.cargado:
+            return self.buscar_por_dni(dni)
+        return next(GestorDatos.iterar_pacientes(self.archivo, dni), None)
+
+    def consultar_pacientes(self):
+        if self.cargado:
+            return self.listar_pacientes()
+        return GestorDatos.iterar_pacientes(self.archivo)
+
+    def consultar_urgentes(self):
+        if self.cargado:
+            return self.listar_urgentes()
+        return (p for p in GestorDatos.iterar_pacientes(self.archivo) if self._es_urgente(p))
+
+    @staticmethod
+    def _es_urgente(paciente):
+        atencion = paciente.obtener_ultima_atencion()
+        return atencion is not None and atencion.nivel_atencion == "Urgente"
+
+    def total_pacientes(self):
+        return len(self.pacientes)
+
+    def buscar_por_dni(self, dni):
+        return self.pacientes.buscar(dni)
+
+    def buscar_por_nombre(self, texto):
+        texto = texto.lower()
+        return [p for p in self.pacientes if texto in p.nombre.lower()]
+
+    def listar_pacientes(self):
+        return list(self.pacientes)
+
+    def listar_pagina(self, desde, cantidad):
+        return self.pacientes.pagina(desde, cantidad)
+
+    def listar_urgentes(self):
+        urgentes = []
+
+        for p in self.pacientes:
+            ultima_atencion = p.obtener_ultima_atencion()
+
+            if ultima_atencion is None:
+                continue
+
+            if ultima_atencion.nivel_atencion == "Urgente":
+                urgentes.append(p)
+
+        return urgentes
+
+    def estadisticas(self):
+        return self.estadisticas_de(self.pacientes)
+
+    def atenciones_entre(self, desde, hasta, solo_urgentes=False):
+        # Sin indice propio: recorre el historial (el cargado o el archivo)
+        pacientes = self.pacientes if self.cargado else GestorDatos.iterar_pacientes(self.archivo)
+        encontradas = []
+        for p in pacientes:
+            for posicion, marca in enumerate(p.marcas_atenciones()):
+                if desde <= marca < hasta:
+                    atencion = p.obtener_atenciones()[posicion]
+                    if not solo_urgentes or atencion.nivel_atencion == "Urgente":
+                        encontradas.append((marca, p, atencion))
+
+        encontradas.sort(key=lambda e: e[0])
+        return [(p, a) for _, p, a in encontradas]
+
+    def registrar_atencion(self, paciente, atencion, es_nuevo):
+        return self.registrar_lote([(paciente, atencion, es_nuevo)])
+
+    def historial_archivado(self, dni):
+        cabecera = HistoricoAtenciones.leer_cabecera(self.archivo)
+        if not cabecera["segmentos"]:
+            return []
+        if self._historico is None or self._historico.cabecera != cabecera:
+            # Indices de segmentos nuevos (otro proceso archivo entretanto)
+            self._historico = HistoricoAtenciones(self.archivo)
+
+        # Tras un corte durante el archivado una atencion puede seguir
+        # tambien en el historial reciente: se muestra una sola vez
+        paciente = self.consultar_dni(dni)
+        recientes = [a.to_dict() for a in paciente.obtener_atenciones()] if paciente else []
+        return [
+            AtencionTriage.from_dict(d, confiable=True)
+            for d in self._historico.atenciones(dni) if d not in recientes
+        ]
+
+    def exclusion(self):
+        return self._mutex
+
+    def registrar_lote(self, cambios, compactar=True):
+        with self._mutex:
+            if self.cargado:
+                for paciente, _, es_nuevo in cambios:
+                    if es_nuevo:
+                        self.pacientes.agregar(paciente)
+
+            if self._escritor is not None:
+                # El escritor guarda cuando corresponda; aqui no se toca el disco
+                self._pendientes.extend(cambios)
+                self._escritor.avisar()
+                return True
+
+        return self._escribir(cambios, compactar)
+
+    def _escribir(self, cambios, compactar):
+        if not self.usar_bitacora:
+            # Cada registro reescribe el archivo completo
+            self._pendientes.extend(cambios)
+            return self._guardar()
+
+        # Anexar es seguro aunque otro proceso haya escrito: la bitacora se
+        # aplica por DNI al cargar
+        with BloqueoArchivo(self.archivo):
+            version = GestorDatos.leer_version(self.archivo)
+            guardado = GestorDatos.registrar_atenciones(self.archivo, None, cambios)
+            if guardado and version == self.version:
+                self.version += 1
+
+        if guardado and compactar and self.cargado and self.umbral_compactacion is not None:
+            return self._compactar(self.umbral_compactacion)
+        return guardado
+
+    def guardar_pendientes(self):
+        # Fuerza el guardado de lo que espera al escritor en segundo plano
+        if self._escritor is None:
+            return True
+        return self._escritor.vaciar()
+
+    def cerrar(self):
+        if not self.cargado:
+            # Abierto con abrir(): lo registrado ya esta en la bitacora
+            return True
+
+        if self._escritor is not None:
+            guardado = self._escritor.detener()
+            self._escritor = None
+            if guardado and not self.usar_bitacora:
+                # El ultimo guardado del escritor ya reescribio el archivo
+                return True
+        return self._guardar()
+
+    def _guardar_pendientes(self):
+        # Corre en el hilo del EscritorDiferido. Sin bitacora reescribe el
+        # archivo con el registro tomado. Con bitacora solo toma la lista de
+        # cambios: anexarlos y compactar se hace en disco, sin recorrer el
+        # registro que el Controlador sigue modificando.
+        if not self.usar_bitacora:
+            with self._mutex:
+                return self._guardar()
+
+        with self._mutex:
+            cambios, self._pendientes = self._pendientes, []
+        if not cambios:
+            return True
+
+        guardado = False
+        try:
+            guardado = self._escribir(cambios, compactar=False)
+        finally:
+            if not guardado:
+                # Vuelven al frente de la cola para el proximo intento
+                with self._mutex:
+                    self._pendientes[:0] = cambios
+        if not guardado:
+            return False
+
+        umbral = self.umbral_compactacion
+        if umbral is None or Bitacora(Bitacora.ruta_para(self.archivo)).tamano() <= umbral:
+            return True
+        with BloqueoArchivo(self.archivo):
+            version = GestorDatos.leer_version(self.archivo)
+            guardado = GestorDatos.compactar_en_disco(self.archivo)
+            if guardado and version == self.version:
+                self.version = GestorDatos.leer_version(self.archivo)
+        return guardado
+
+    def _compactar(self, umbral):
+        # Vuelca la bitacora en el archivo principal cuando supera el umbral
+        if Bitacora(Bitacora.ruta_para(self.archivo)).tamano() <= umbral:
+            return True
+        return self._guardar()
+
+    def _guardar(self):
+        with BloqueoArchivo(self.archivo):
+            if GestorDatos.leer_version(self.archivo) != self.version:
+                self._mezclar_con_disco()
+
+            guardado = GestorDatos.guardar_pacientes(self.archivo, self.pacientes)
+            if guardado:
+                self.version = GestorDatos.leer_version(self.archivo)
+                self._pendientes = []
+        return guardado
+
+    def _mezclar_con_disco(self):
+        # Otro proceso escribio: se parte de lo que hay en disco (archivo +
+        # bitacora, que ya incluye lo que este proceso anexo) y se agregan
+        # los cambios propios que aun no llegaron a disco
+        disco = GestorDatos.cargar_pacientes(self.archivo)
+        for paciente, atencion, _ in self._pendientes:
+            existente = disco.buscar(paciente.dni)
+            if existente is None:
+                disco.agregar(paciente)
+            elif existente is not paciente:
+                existente.agregar_atencion(atencion)
+
+        self.pacientes = disco
+        self.recargas += 1
+
+
+class AlmacenFragmentado(Almacen):
+
+    # El historial de AlmacenJson repartido por DNI en varios archivos
+    # (fragmentacion.py). Cada fragmento es un AlmacenJson completo, con su
+    # bloqueo, sello y bitacora: un registro solo escribe en el fragmento de
+    # su paciente y al iniciar los fragmentos se cargan en varios hilos.
+    # Si no hay manifiesto, el historial de archivo se reparte la primera vez.
+
+    def __init__(self, archivo, fragmentos, hilos_carga=None, **opciones):
+        self.archivo = archivo
+        self.cantidad_inicial = fragmentos
+        self.hilos_carga = hilos_carga
+        self.opciones = opciones
+        self.fragmentos = []
+        # Una sola exclusion para todos los fragmentos (ver exclusion())
+        self._mutex = threading.RLock()
+
+    def _abrir_fragmentos(self):
+        if self.fragmentos:
+            return
+        manifiesto = fragmentacion.leer_manifiesto(self.archivo)
+        if manifiesto is None:
+            pacientes = fragmentacion.refragmentar(self.archivo, self.cantidad_inicial)
+            print(f"[SISTEMA] Historial repartido en {self.cantidad_inicial} fragmentos ({pacientes} pacientes).")
+            manifiesto = fragmentacion.leer_manifiesto(self.archivo)
+
+        self.cantidad = manifiesto["fragmentos"]
+        for ruta in fragmentacion.rutas_fragmentos(self.archivo, manifiesto):
+            fragmento = AlmacenJson(ruta, **self.opciones)
+            fragmento._mutex = self._mutex
+            self.fragmentos.append(fragmento)
+
+    def _fragmento(self, dni):
+        return self.fragmentos[fragmentacion.fragmento_de(dni, self.cantidad)]
+
+    @property
+    def recargas(self):
+        return sum(f.recargas for f in self.fragmentos)
+
+    def cargar(self):
+        self._abrir_fragmentos()
+        hilos = self.hilos_carga or min(len(self.fragmentos), os.cpu_count() or 1)
+        if Paciente.historial_columnar is not None:
+            # El historial columnar es compartido y no admite cargas simultaneas
+            hilos = 1
+        if hilos <= 1:
+            for fragmento in self.fragmentos:
+                fragmento.cargar()
+            return
+
+        with ThreadPoolExecutor(hilos) as ejecutor:
+            # list() propaga la primera excepcion (p. ej. DNI duplicado)
+            list(ejecutor.map(AlmacenJson.cargar, self.fragmentos))
+
+    def abrir(self):
+        self._abrir_fragmentos()
+        for fragmento in self.fragmentos:
+            fragmento.abrir()
+
+    def consultar_dni(self, dni):
+        return self._fragmento(dni).consultar_dni(dni)
+
+    def consultar_pacientes(self):
+        return itertools.chain.from_iterable(f.consultar_pacientes() for f in self.fragmentos)
+
+    def consultar_urgentes(self):
+        return itertools.chain.from_iterable(f.consultar_urgentes() for f in self.fragmentos)
+
+    def total_pacientes(self):
+        return sum(f.total_pacientes() for f in self.fragmentos)
+
+    def buscar_por_dni(self, dni):
+        return self._fragmento(dni).buscar_por_dni(dni)
+
+    def buscar_por_nombre(self, texto):
+        return [p for f in self.fragmentos for p in f.buscar_por_nombre(texto)]
+
+    def listar_pacientes(self):
+        return [p for f in self.fragmentos for p in f.listar_pacientes()]
+
+    def listar_pagina(self, desde, cantidad):
+        # Saltea fragmentos enteros por su total
+        pagina = []
+        for f in self.fragmentos:
+            total = f.total_pacientes()
+            if desde >= total:
+                desde -= total
+                continue
+            pagina.extend(f.listar_pagina(desde, cantidad - len(pagina)))
+            desde = 0
+            if len(pagina) >= cantidad:
+                break
+        return pagina
+
+    def listar_urgentes(self):
+        return [p for f in self.fragmentos for p in f.listar_urgentes()]
+
+    def estadisticas(self):
+        return self.estadisticas_de(self.listar_pacientes())
+
+    def atenciones_entre(self, desde, hasta, solo_urgentes=False):
+        # Cada fragmento ya las devuelve ordenadas por fecha
+        return list(heapq.merge(
+            *(f.atenciones_entre(desde, hasta, solo_urgentes) for f in self.fragmentos),
+            key=lambda encontrada: encontrada[1].fecha_registro
+        ))
+
+    def registrar_atencion(self, paciente, atencion, es_nuevo):
+        return self.registrar_lote([(paciente, atencion, es_nuevo)])
+
+    def historial_archivado(self, dni):
+        return self._fragmento(dni).historial_archivado(dni)
+
+    def exclusion(self):
+        return self._mutex
+
+    def registrar_lote(self, cambios, compactar=True):
+        # Un lote que abarca varios fragmentos se guarda fragmento por
+        # fragmento: si uno falla, los demas ya quedaron guardados
+        por_fragmento = {}
+        for cambio in cambios:
+            por_fragmento.setdefault(fragmentacion.fragmento_de(cambio[0].dni, self.cantidad), []).append(cambio)
+        guardados = [self.fragmentos[i].registrar_lote(lote, compactar) for i, lote in por_fragmento.items()]
+        return all(guardados)
+
+    def guardar_pendientes(self):
+        return all([f.guardar_pendientes() for f in self.fragmentos])
+
+    def cerrar(self):
+        return all([f.cerrar() for f in self.fragmentos])
+
+
+class AlmacenAcotado(Almacen):
+
+    # Modo de memoria acotada: el historial se queda en el archivo JSON y en
+    # memoria solo hay una cache LRU de pacientes ya construidos, de a lo
+    # sumo presupuesto_cache bytes. Un paciente que no esta en la cache se
+    # lee de su posicion en el archivo, que da el indice de desplazamientos
+    # (desplazamientos.py). Lo registrado se anexa a la
+    # bitacora, cuyo contenido (acotado por el umbral de compactacion) si se
+    # mantiene en memoria. Los recorridos completos (listados, nombres,
+    # rangos de tiempo) leen el archivo de a un paciente; la cola de
+    # urgencias y las estadisticas las arma AlmacenIndexado al cargar.
+
+    # atenciones_entre recorre el archivo: mantener un IndiceTemporal con
+    # todas las atenciones en memoria romperia el presupuesto
+    rangos_de_tiempo_indexados = True
+    indexar_nombres = False
+
+    def __init__(self, archivo, presupuesto_cache, umbral_compactacion=None):
+        if instantanea.es_instantanea(archivo):
+            raise ValueError("El modo de memoria acotada necesita un archivo de datos JSON.")
+
+        self.archivo = archivo
+        self.umbral_compactacion = umbral_compactacion
+        self.cache = CachePacientes(presupuesto_cache)
+        self.indice = None
+        self.version = 0
+        self._datos = None
+        # Bitacora vigente: altas (dni -> datos) y atenciones por DNI
+        self._nuevos = {}
+        self._atenciones = defaultdict(list)
+        self._total = 0
+
+    def cargar(self):
+        with BloqueoArchivo(self.archivo, compartido=True):
+            self._abrir_archivo()
+        if self.umbral_compactacion is not None:
+            self._compactar(self.umbral_compactacion)
+
+    def _abrir_archivo(self):
+        # Quien llama tiene el bloqueo del archivo
+        self._cerrar_archivo()
+        self.cache.vaciar()
+        self.version = GestorDatos.leer_version(self.archivo)
+        self._nuevos, self._atenciones = GestorDatos._registros_bitacora(self.archivo)
+        if not os.path.exists(self.archivo):
+            self._total = len(self._nuevos)
+            return
+
+        self.indice = IndiceDesplazamientos.abrir(self.archivo)
+        if self.indice is None:
+            # Primera vez o archivo reescrito por otro proceso
+            self.indice = desplazamientos.indexar(self.archivo)
+        # Sin buffer: cada lectura trae solo el registro pedido
+        self._datos = open(self.archivo, "rb", buffering=0)
+        self._total = len(self.indice) + sum(1 for dni in self._nuevos if self.indice.buscar(dni) is None)
+
+    def _ubicar(self, dni):
+        # (inicio, longitud) del registro en el archivo, o None
+        return self.indice.buscar(dni) if self.indice is not None else None
+
+    def _cerrar_archivo(self):
+        if self.indice is not None:
+            self.indice.cerrar()
+            self.indice = None
+        if self._datos is not None:
+            self._datos.close()
+            self._datos = None
+
+    def _construir(self, d, confiable=False):
+        paciente = GestorDatos._paciente_desde_dict(d, confiable)
+        for a in self._atenciones.get(paciente.dni, []):
+            paciente.agregar_atencion(AtencionTriage.from_dict(a))
+        return paciente
+
+    def total_pacientes(self):
+        return self._total
+
+    def buscar_por_dni(self, dni):
+        paciente = self.cache.obtener(dni)
+        if paciente is not None:
+            return paciente
+
+        ubicacion = self._ubicar(dni)
+        if ubicacion is not None:
+            inicio, longitud = ubicacion
+            self._datos.seek(inicio)
+            paciente = self._construir(json.loads(self._datos.read(longitud)), self.indice.confiable)
+        elif dni in self._nuevos:
+            longitud = len(json.dumps(self._nuevos[dni]))
+            paciente = self._construir(dict(self._nuevos[dni], atenciones=[]))
+        else:
+            return None
+        self.cache.guardar(dni, paciente, longitud * desplazamientos.FACTOR_MEMORIA)
+        return paciente
+
+    def buscar_por_nombre(self, texto):
+        texto = texto.lower()
+        return [p for p in self.listar_pacientes() if texto in p.nombre.lower()]
+
+    def listar_pacientes(self):
+        # De a uno y sin pasar por la cache (un recorrido la vaciaria); los
+        # que estan en ella se devuelven desde alli
+        if self.indice is not None:
+            confiable = self.indice.confiable
+            for d, _, _ in desplazamientos.iterar_registros(self.archivo):
+                yield self.cache.ver(d["dni"]) or self._construir(d, confiable)
+        for dni, d in self._nuevos.items():
+            if self._ubicar(dni) is None:
+                yield self.cache.ver(dni) or self._construir(dict(d, atenciones=[]))
+
+    def listar_urgentes(self):
+        return [p for p in self.listar_pacientes() if AlmacenJson._es_urgente(p)]
+
+    def estadisticas(self):
+        return self.estadisticas_de(self.listar_pacientes())
+
+    def atenciones_entre(self, desde, hasta, solo_urgentes=False):
+        encontradas = []
+        for p in self.listar_pacientes():
+            for posicion, marca in enumerate(p.marcas_atenciones()):
+                if desde <= marca < hasta:
+                    atencion = p.obtener_atenciones()[posicion]
+                    if not solo_urgentes or atencion.nivel_atencion == "Urgente":
+                        encontradas.append((marca, p, atencion))
+
+        encontradas.sort(key=lambda e: e[0])
+        return [(p, a) for _, p, a in encontradas]
+
+    def registrar_atencion(self, paciente, atencion, es_nuevo):
+        return self.registrar_lote([(paciente, atencion, es_nuevo)])
+
+    def registrar_lote(self, cambios, compactar=True):
+        with BloqueoArchivo(self.archivo):
+            if GestorDatos.leer_version(self.archivo) != self.version:
+                # Otro proceso escribio: lo suyo esta en la bitacora o en un
+                # archivo reescrito. Lo propio se anexa igual (la bitacora se
+                # aplica por DNI) y se vuelve a leer con el resto.
+                self._abrir_archivo()
+                self.recargas += 1
+
+            guardado = GestorDatos.registrar_atenciones(self.archivo, None, cambios)
+            if guardado:
+                self.version = GestorDatos.leer_version(self.archivo)
+                for paciente, atencion, es_nuevo in cambios:
+                    if es_nuevo and paciente.dni not in self._nuevos and self._ubicar(paciente.dni) is None:
+                        datos = paciente.to_dict()
+                        del datos["atenciones"]
+                        self._nuevos[paciente.dni] = datos
+                        self._total += 1
+                    # El paciente en cache (si sigue ahi) ya tiene la atencion;
+                    # si no, se vuelve a construir con ella desde la bitacora
+                    self._atenciones[paciente.dni].append(atencion.to_dict())
+
+        if guardado and compactar and self.umbral_compactacion is not None:
+            return self._compactar(self.umbral_compactacion)
+        return guardado
+
+    def _compactar(self, umbral):
+        # Vuelca la bitacora en el archivo de a un paciente por vez y vuelve a indexar
+        if Bitacora(Bitacora.ruta_para(self.archivo)).tamano() <= umbral:
+            return True
+        with BloqueoArchivo(self.archivo):
+            # Windows no reemplaza un archivo abierto
+            self._cerrar_archivo()
+            guardado = GestorDatos.compactar_en_disco(self.archivo)
+            self._abrir_archivo()
+        return guardado
+
+    def cerrar(self):
+        # Lo registrado ya esta en la bitacora
+        self._cerrar_archivo()
+        return True
+
+
+class AlmacenSqlite(Almacen):
+
+    # Base SQLite con indices: las consultas se resuelven en la base y solo se
+    # construyen los Paciente que se van a mostrar
+
+    rangos_de_tiempo_indexados = True
+    consultas_indexadas = True
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS pacientes (
+            dni TEXT PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            edad INTEGER NOT NULL,
+            sexo TEXT NOT NULL,
+            fecha_registro TEXT,
+            ultima_atencion INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS atenciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dni TEXT NOT NULL REFERENCES pacientes(dni),
+            peso REAL,
+            talla REAL,
+            presion REAL,
+            frecuencia INTEGER,
+            conciencia TEXT,
+            saturacion INTEGER,
+            imc REAL,
+            clasificacion_imc TEXT,
+            nivel_atencion TEXT,
+            fecha_registro TEXT,
+            marca_tiempo INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_atenciones_dni ON atenciones(dni);
+        CREATE INDEX IF NOT EXISTS idx_atenciones_nivel ON atenciones(nivel_atencion);
+        CREATE INDEX IF NOT EXISTS idx_atenciones_imc ON atenciones(clasificacion_imc);
+        CREATE INDEX IF NOT EXISTS idx_atenciones_tiempo ON atenciones(marca_tiempo);
+        CREATE INDEX IF NOT EXISTS idx_pacientes_ultima ON pacientes(ultima_atencion);
+    """
+
+    CAMPOS_ATENCION = [
+        "peso", "talla", "presion", "frecuencia", "conciencia", "saturacion",
+        "imc", "clasificacion_imc", "nivel_atencion", "fecha_registro"
+    ]
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.conexion = None
+
+    def cargar(self):
+        # Se abre en un hilo y el servicio la usa desde su hilo del registro
+        # (uno solo a la vez)
+        self.conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+        self.conexion.row_factory = sqlite3.Row
+        self.conexion.executescript(self.ESQUEMA)
+
+    def total_pacientes(self):
+        return self.conexion.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0]
+
+    def buscar_por_dni(self, dni):
+        fila = self.conexion.execute(
+            "SELECT * FROM pacientes WHERE dni = ?", (dni,)
+        ).fetchone()
+        if fila is None:
+            return None
+
+        atenciones = self.conexion.execute(
+            "SELECT * FROM atenciones WHERE dni = ? ORDER BY id", (dni,)
+        ).fetchall()
+        return self._paciente_desde_filas(fila, atenciones)
+
+    def buscar_por_nombre(self, texto):
+        return self._consultar_con_ultima(
+            "WHERE p.nombre LIKE ? ESCAPE '\\'", (f"%{self._escapar_like(texto)}%",)
+        )
+
+    def listar_pacientes(self):
+        return self._consultar_con_ultima("", ())
+
+    def listar_pagina(self, desde, cantidad):
+        return self._consultar_con_ultima("", (cantidad, desde), "LIMIT ? OFFSET ?")
+
+    def consultar_pacientes(self):
+        return self._iterar_con_ultima("", ())
+
+    def listar_urgentes(self):
+        return self._consultar_con_ultima("WHERE a.nivel_atencion = ?", ("Urgente",))
+
+    def estadisticas(self):
+        stats = self.estadisticas_vacias()
+
+        total, promedio = self.conexion.execute(
+            "SELECT COUNT(*), AVG(edad) FROM pacientes"
+        ).fetchone()
+        if not total:
+            return stats
+
+        stats["total"] = total
+        stats["promedio_edad"] = round(promedio, 1)
+
+        for columna, clave in [("nivel_atencion", "por_atencion"), ("clasificacion_imc", "por_imc")]:
+            filas = self.conexion.execute(
+                f"SELECT a.{columna}, COUNT(*) FROM pacientes p "
+                f"JOIN atenciones a ON a.id = p.ultima_atencion GROUP BY a.{columna}"
+            )
+            for valor, cantidad in filas:
+                if valor in stats[clave]:
+                    stats[clave][valor] = cantidad
+
+        return stats
+
+    def atenciones_entre(self, desde, hasta, solo_urgentes=False):
+        # Rango sobre idx_atenciones_tiempo; cada paciente viene solo con la
+        # atencion encontrada
+        columnas = ", ".join(f"a.{c} AS a_{c}" for c in self.CAMPOS_ATENCION)
+        filtro = " AND a.nivel_atencion = 'Urgente'" if solo_urgentes else ""
+        filas = self.conexion.execute(
+            f"SELECT p.*, {columnas} FROM atenciones a JOIN pacientes p ON p.dni = a.dni "
+            f"WHERE a.marca_tiempo >= ? AND a.marca_tiempo < ?{filtro} ORDER BY a.marca_tiempo, a.id",
+            (desde, hasta)
+        )
+        for fila in filas:
+            atencion = {c: fila[f"a_{c}"] for c in self.CAMPOS_ATENCION}
+            paciente = self._paciente_desde_filas(fila, [atencion])
+            yield paciente, paciente.obtener_ultima_atencion()
+
+    def registrar_atencion(self, paciente, atencion, es_nuevo):
+        try:
+            with self.conexion:
+                if es_nuevo:
+                    self._insertar_paciente(paciente)
+                self._insertar_atencion(paciente.dni, atencion)
+            return True
+        except sqlite3.IntegrityError as e:
+            raise DniDuplicadoException(
+                f"Ya existe un paciente registrado con DNI {paciente.dni}."
+            ) from e
+        except sqlite3.Error as e:
+            print(f"Error al guardar: {e}")
+            return False
+
+    def registrar_lote(self, cambios, compactar=True):
+        try:
+            with self.conexion:
+                for paciente, atencion, es_nuevo in cambios:
+                    if es_nuevo:
+                        self._insertar_paciente(paciente)
+                    self._insertar_atencion(paciente.dni, atencion)
+            return True
+        except sqlite3.IntegrityError as e:
+            raise DniDuplicadoException(
+                f"El lote contiene un DNI ya registrado: {e}"
+            ) from e
+        except sqlite3.Error as e:
+            print(f"Error al guardar: {e}")
+            return False
+
+    def importar(self, pacientes):
+        # Carga masiva (p. ej. desde datos.json) en una sola transaccion
+        with self.conexion:
+            for p in pacientes:
+                self._insertar_paciente(p)
+                for a in p.obtener_atenciones():
+                    self._insertar_atencion(p.dni, a)
+
+    def cerrar(self):
+        try:
+            self.conexion.commit()
+            self.conexion.close()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error al guardar: {e}")
+            return False
+
+    def _insertar_paciente(self, paciente):
+        self.conexion.execute(
+            "INSERT INTO pacientes (dni, nombre, edad, sexo, fecha_registro) VALUES (?, ?, ?, ?, ?)",
+            (paciente.dni, paciente.nombre, paciente.edad, paciente.sexo, paciente.fecha_registro)
+        )
+
+    def _insertar_atencion(self, dni, atencion):
+        datos = atencion.to_dict()
+        valores = [datos[c] for c in self.CAMPOS_ATENCION]
+        cursor = self.conexion.execute(
+            f"INSERT INTO atenciones (dni, {', '.join(self.CAMPOS_ATENCION)}, marca_tiempo) "
+            f"VALUES (?, {', '.join('?' for _ in self.CAMPOS_ATENCION)}, ?)",
+            [dni] + valores + [self._marca_tiempo(datos["fecha_registro"])]
+        )
+        self.conexion.execute(
+            "UPDATE pacientes SET ultima_atencion = ? WHERE dni = ?",
+            (cursor.lastrowid, dni)
+        )
+
+    def _consultar_con_ultima(self, filtro, parametros, limite=""):
+        return list(self._iterar_con_ultima(filtro, parametros, limite))
+
+    def _iterar_con_ultima(self, filtro, parametros, limite=""):
+        # Cada paciente con solo su ultima atencion, que es lo que muestran los listados
+        columnas = ", ".join(f"a.{c} AS a_{c}" for c in self.CAMPOS_ATENCION)
+        filas = self.conexion.execute(
+            f"SELECT p.*, a.id AS a_id, {columnas} FROM pacientes p "
+            f"LEFT JOIN atenciones a ON a.id = p.ultima_atencion {filtro} ORDER BY p.rowid {limite}",
+            parametros
+        )
+
+        for fila in filas:
+            atenciones = []
+            if fila["a_id"] is not None:
+                atenciones.append({c: fila[f"a_{c}"] for c in self.CAMPOS_ATENCION})
+            yield self._paciente_desde_filas(fila, atenciones)
+
+    def _paciente_desde_filas(self, fila, atenciones):
+        return GestorDatos._paciente_desde_dict({
+            "dni": fila["dni"],
+            "nombre": fila["nombre"],
+            "edad": fila["edad"],
+            "sexo": fila["sexo"],
+            "fecha_registro": fila["fecha_registro"],
+            "atenciones": [{c: a[c] for c in self.CAMPOS_ATENCION} for a in atenciones]
+        })
+
+    @staticmethod
+    def _marca_tiempo(fecha):
+        try:
+            marca = marca_tiempo(fecha)
+        except (TypeError, ValueError):
+            return None
+        return None if marca == SIN_FECHA else marca
+
+    @staticmethod
+    def _escapar_like(texto):
+        return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def crear_almacen(durabilidad=None):
+    # Almacen elegido en config.py (lo usan el Controlador y las herramientas
+    # de linea de comandos); durabilidad reemplaza a config.DURABILIDAD
+    if config.ALMACEN == "sqlite":
+        return AlmacenSqlite(config.ARCHIVO_SQLITE)
+    if config.MEMORIA_ACOTADA_MB is not None:
+        if config.FRAGMENTOS or config.DIAS_HISTORICO is not None:
+            raise ValueError("MEMORIA_ACOTADA_MB no se combina con FRAGMENTOS ni con DIAS_HISTORICO.")
+        # La otra mitad queda para el interprete, la cola de urgencias y la bitacora
+        return AlmacenAcotado(
+            config.ARCHIVO_DB, config.MEMORIA_ACOTADA_MB * 1024 * 1024 // 2, config.UMBRAL_COMPACTACION_BITACORA
+        )
+    opciones = {
+        "usar_bitacora": config.USAR_BITACORA,
+        "umbral_compactacion": config.UMBRAL_COMPACTACION_BITACORA,
+        "durabilidad": durabilidad or config.DURABILIDAD,
+        "ventana_guardado": config.VENTANA_GUARDADO,
+        "periodo_guardado": config.PERIODO_GUARDADO,
+        "dias_historico": config.DIAS_HISTORICO,
+        "compresion_historico": config.COMPRESION_HISTORICO,
+    }
+    # Un historial ya fragmentado se abre fragmentado aunque FRAGMENTOS sea 0
+    if config.FRAGMENTOS or os.path.exists(fragmentacion.ruta_manifiesto(config.ARCHIVO_DB)):
+        return AlmacenFragmentado(config.ARCHIVO_DB, config.FRAGMENTOS, config.HILOS_CARGA, **opciones)
+    return AlmacenJson(config.ARCHIVO_DB, **opciones)
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Migracion: python almacenamiento.py datos.json datos.db
+    if len(sys.argv) != 3:
+        print("Uso: python almacenamiento.py <origen.json> <destino.db>")
+        sys.exit(1)
+
+    destino = AlmacenSqlite(sys.argv[2])
+    destino.cargar()
+    pacientes = GestorDatos.cargar_pacientes(sys.argv[1])
+    destino.importar(pacientes)
+    destino.cerrar()
+    print(f"[SISTEMA] Se migraron {len(pacientes)} pacientes a {sys.argv[2]}.")
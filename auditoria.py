@@ -0,0 +1,332 @@
+import json
+import os
+import time
+from collections import Counter
+from contextlib import ExitStack
+from multiprocessing import Pool
+
+from bitacora import Bitacora
+from bloqueo import BloqueoArchivo
+from historico import HistoricoAtenciones
+from importador import _en_lotes
+from modelo import AtencionTriage, GestorDatos, ValidadorDni, clase_por_edad, DniInvalidoException
+
+# Auditoria de integridad: vuelve a validar cada registro del archivo de
+# datos tal como lo haria el registro interactivo (DNI, datos del paciente,
+# rangos de cada atencion) y recalcula lo derivado (IMC, su clasificacion y
+# el nivel de atencion con las reglas vigentes), que la carga normal toma
+# como viene. No modifica nada: devuelve un informe con las diferencias, los
+# registros invalidos y los DNIs repetidos.
+#
+# Tambien lo que esta fuera del archivo principal: las atenciones de la
+# bitacora sin compactar y las del archivo historico (historico.py) se
+# auditan con el paciente al que pertenecen, y las altas de la bitacora
+# como un paciente mas (tambien para los DNIs repetidos). Sus hallazgos
+# llevan "origen": "bitacora" o "historico".
+#
+# El archivo se reparte por tramos de bytes entre varios procesos. En el
+# formato que escribe GestorDatos (indent=4) cada paciente empieza en una
+# linea "    {" (los textos JSON no tienen saltos de linea sin escapar y las
+# atenciones van mas indentadas), asi que cada proceso encuentra y lee sus
+# registros solo. Otro formato (o una instantanea binaria) se lee en el
+# proceso principal y se reparte de a lotes.
+
+INICIO_REGISTRO = b"\n    {"
+# Tramos de a lo sumo este tamano (bytes), y varios por proceso para repartir parejo
+TAMANO_TRAMO = 32 * 1024 * 1024
+TRAMOS_POR_PROCESO = 4
+TAMANO_LOTE = 1000
+ERRORES_REGISTRO = (KeyError, TypeError, ValueError, AttributeError, DniInvalidoException)
+
+
+def _motivo(error):
+    if isinstance(error, KeyError):
+        return f"Falta el campo {error}."
+    return str(error)
+
+
+def _hallazgo(tipo, dni, atencion=None, origen=None, **detalle):
+    hallazgo = {"tipo": tipo, "dni": dni, "atencion": atencion, **detalle}
+    if origen is not None:
+        hallazgo["origen"] = origen
+    return hallazgo
+
+
+def auditar_registro(d, extras=(), origen=None):
+    # Hallazgos de un paciente (dict tal como esta en el archivo). extras:
+    # (origen, atenciones) del mismo paciente guardadas en otro lado, que se
+    # auditan con sus mismas reglas; origen marca los hallazgos del registro
+    if not isinstance(d, dict):
+        return [_hallazgo("registro_invalido", None, origen=origen, motivo="El registro no es un objeto.")]
+
+    hallazgos = []
+
+    def hallazgo(tipo, atencion=None, de=origen, **detalle):
+        hallazgos.append(_hallazgo(tipo, d.get("dni"), atencion, de, **detalle))
+
+    try:
+        ValidadorDni.validar(d.get("dni"))
+    except DniInvalidoException as e:
+        hallazgo("dni_invalido", motivo=str(e))
+
+    paciente = None
+    try:
+        paciente = clase_por_edad(d["edad"])(d["dni"], d["nombre"], d["edad"], d["sexo"])
+        paciente.fecha_registro = d.get("fecha_registro")
+    except ERRORES_REGISTRO as e:
+        hallazgo("paciente_invalido", motivo=_motivo(e))
+
+    atenciones = d.get("atenciones", [])
+    if not isinstance(atenciones, list):
+        hallazgo("paciente_invalido", motivo="Las atenciones deben ser una lista.")
+        atenciones = []
+
+    for de, lista in [(origen, atenciones), *extras]:
+        for posicion, a in enumerate(lista):
+            try:
+                atencion = AtencionTriage(
+                    a["peso"], a["talla"], a["presion"], a["frecuencia"], a["conciencia"], a["saturacion"]
+                )
+                atencion.fecha_registro = a.get("fecha_registro")
+            except ERRORES_REGISTRO as e:
+                hallazgo("atencion_invalida", posicion, de, motivo=_motivo(e))
+                continue
+
+            calculados = {"imc": atencion.imc, "clasificacion_imc": atencion.clasificacion_imc}
+            if paciente is not None:
+                # Con las reglas de la franja de edad del paciente
+                calculados["nivel_atencion"] = paciente.clasificar_atencion(atencion)
+            for campo, calculado in calculados.items():
+                if a.get(campo) != calculado:
+                    hallazgo(campo, posicion, de, guardado=a.get(campo), calculado=calculado)
+    return hallazgos
+
+
+# Atenciones de la bitacora de cada archivo por DNI, para cada proceso
+# (ver _recibir_bitacoras)
+_bitacoras = {}
+
+
+def _recibir_bitacoras(bitacoras):
+    global _bitacoras
+    _bitacoras = bitacoras
+
+
+def _resultado_vacio():
+    # bitacora: DNIs cuyas atenciones de la bitacora ya se auditaron con su paciente
+    return {"pacientes": 0, "atenciones": 0, "dnis": [], "hallazgos": [], "bitacora": []}
+
+
+def _auditar_en(resultado, d, historico, bitacora):
+    resultado["pacientes"] += 1
+    extras = []
+    if isinstance(d, dict):
+        dni = d.get("dni")
+        if isinstance(dni, str):
+            resultado["dnis"].append(dni)
+            try:
+                extras.append(("historico", historico.atenciones(dni)))
+            except Exception as e:
+                resultado["hallazgos"].append(_hallazgo(
+                    "registro_corrupto", dni, origen="historico", motivo=f"Segmento ilegible: {e}"
+                ))
+            if dni in bitacora:
+                extras.append(("bitacora", bitacora[dni]))
+                resultado["bitacora"].append(dni)
+        atenciones = d.get("atenciones")
+        resultado["atenciones"] += len(atenciones) if isinstance(atenciones, list) else 0
+        resultado["atenciones"] += sum(len(lista) for _, lista in extras)
+    resultado["hallazgos"].extend(auditar_registro(d, extras))
+
+
+def auditar_lote(tarea):
+    archivo, lote = tarea
+    historico = HistoricoAtenciones(archivo)
+    bitacora = _bitacoras.get(archivo, {})
+    resultado = _resultado_vacio()
+    for d in lote:
+        _auditar_en(resultado, d, historico, bitacora)
+    return resultado
+
+
+def auditar_tramo(tramo):
+    # Pacientes cuyo "{" inicial cae en [desde, hasta); el ultimo puede
+    # terminar despues de hasta y se lee hasta el inicio del siguiente
+    archivo, desde, hasta = tramo
+    historico = HistoricoAtenciones(archivo)
+    bitacora = _bitacoras.get(archivo, {})
+    resultado = _resultado_vacio()
+    # Un inicio partido por el borde del tramo tambien se encuentra
+    inicio_lectura = max(0, desde - len(INICIO_REGISTRO) + 1)
+    limite = hasta - inicio_lectura - len(INICIO_REGISTRO) + 1
+
+    with open(archivo, "rb") as f:
+        f.seek(inicio_lectura)
+        texto = f.read(hasta - inicio_lectura)
+        revisado = max(0, limite)
+        while texto.find(INICIO_REGISTRO, revisado) == -1:
+            bloque = f.read(1 << 20)
+            if not bloque:
+                break
+            revisado = max(0, len(texto) - len(INICIO_REGISTRO) + 1)
+            texto += bloque
+
+    posicion = texto.find(INICIO_REGISTRO)
+    while posicion != -1 and posicion < limite:
+        siguiente = texto.find(INICIO_REGISTRO, posicion + 1)
+        crudo = texto[posicion:] if siguiente == -1 else texto[posicion:siguiente]
+        try:
+            # Sin la coma que lo separa del siguiente (o el "]" final)
+            d = json.loads(crudo.strip().rstrip(b",]").rstrip())
+        except ValueError as e:
+            resultado["pacientes"] += 1
+            resultado["hallazgos"].append(_hallazgo(
+                "registro_corrupto", None, motivo=f"JSON inválido en el byte {inicio_lectura + posicion + 1}: {e}"
+            ))
+        else:
+            _auditar_en(resultado, d, historico, bitacora)
+        posicion = siguiente
+    return resultado
+
+
+def _formato_por_tramos(archivo):
+    with open(archivo, "rb") as f:
+        return f.read(len(INICIO_REGISTRO) + 1) == b"[" + INICIO_REGISTRO
+
+
+def _tramos(archivo, procesos):
+    tamano = os.path.getsize(archivo)
+    cantidad = max(procesos * TRAMOS_POR_PROCESO, -(-tamano // TAMANO_TRAMO))
+    paso = -(-tamano // cantidad)
+    return [(archivo, desde, min(desde + paso, tamano)) for desde in range(0, tamano, paso)]
+
+
+def _resultados(archivo, procesos, pool):
+    if not os.path.exists(archivo):
+        return
+    if _formato_por_tramos(archivo):
+        tramos = _tramos(archivo, procesos)
+        yield from (pool.imap(auditar_tramo, tramos) if pool else map(auditar_tramo, tramos))
+        return
+
+    lotes = ((archivo, lote) for lote in _en_lotes(GestorDatos._iterar_registros(archivo), TAMANO_LOTE))
+    try:
+        yield from (pool.imap(auditar_lote, lotes) if pool else map(auditar_lote, lotes))
+    except ValueError as e:
+        # JSON corrupto: no se puede seguir leyendo desde el proceso principal
+        resultado = _resultado_vacio()
+        resultado["hallazgos"].append(_hallazgo("registro_corrupto", None, motivo=f"{archivo}: {e}"))
+        yield resultado
+
+
+def _leer_bitacora(archivo):
+    # (altas, atenciones por DNI, hallazgos) de la bitacora vigente del
+    # archivo, sin juntar las altas repetidas como hace la carga
+    base, registros = Bitacora(Bitacora.ruta_para(archivo)).leer()
+    if registros and base != GestorDatos._firma_archivo(archivo):
+        # La carga la descarta: esos registros no llegan al historial
+        return [], {}, [_hallazgo(
+            "bitacora_vencida", None, origen="bitacora",
+            motivo=f"{len(registros)} registros escritos sobre otra versión de {archivo}"
+        )]
+
+    altas = []
+    atenciones = {}
+    hallazgos = []
+    for posicion, r in enumerate(registros):
+        if r.get("tipo") == "paciente" and isinstance(r.get("paciente"), dict):
+            altas.append(r["paciente"])
+        elif r.get("tipo") == "atencion" and isinstance(r.get("dni"), str):
+            atenciones.setdefault(r["dni"], []).append(r.get("atencion"))
+        else:
+            hallazgos.append(_hallazgo(
+                "registro_invalido", None, origen="bitacora", motivo=f"Registro {posicion + 1} sin tipo, paciente o DNI."
+            ))
+    return altas, atenciones, hallazgos
+
+
+def _resultado_bitacora(altas, pendientes, hallazgos):
+    # Altas de la bitacora (con las atenciones que no tienen paciente en el
+    # archivo principal, como las aplica la carga: a la primera alta del DNI)
+    resultado = _resultado_vacio()
+    resultado["hallazgos"].extend(hallazgos)
+    for datos in altas:
+        dni = datos.get("dni")
+        atenciones = pendientes.pop(dni, []) if isinstance(dni, str) else []
+        resultado["pacientes"] += 1
+        resultado["atenciones"] += len(atenciones)
+        if isinstance(dni, str):
+            resultado["dnis"].append(dni)
+        resultado["hallazgos"].extend(auditar_registro({**datos, "atenciones": atenciones}, origen="bitacora"))
+
+    for dni, atenciones in pendientes.items():
+        resultado["atenciones"] += len(atenciones)
+        for posicion in range(len(atenciones)):
+            resultado["hallazgos"].append(_hallazgo(
+                "dni_desconocido", dni, posicion, "bitacora", motivo="Atención de un paciente que no está registrado."
+            ))
+    return resultado
+
+
+def _archivadas_sin_paciente(archivo, dnis):
+    historico = HistoricoAtenciones(archivo)
+    return [
+        _hallazgo("dni_desconocido", dni, origen="historico", motivo="Atenciones archivadas de un paciente que no está registrado.")
+        for dni in historico.dnis() if dni not in dnis
+    ]
+
+
+def auditar(archivos, procesos=None, limite=None):
+    # Informe de los archivos (un historial, o todos sus fragmentos): los
+    # DNIs repetidos se buscan entre todos. Con el bloqueo compartido de
+    # cada uno para que nadie los reescriba a mitad de la auditoria. El
+    # resumen cuenta todos los hallazgos; el detalle guarda los primeros
+    # limite (con reglas nuevas pueden ser casi todas las atenciones).
+    procesos = procesos or os.cpu_count() or 1
+    informe = {
+        "archivos": list(archivos), "procesos": procesos, "pacientes": 0, "atenciones": 0,
+        "segundos": 0.0, "resumen": {}, "dnis_duplicados": [], "hallazgos": []
+    }
+    dnis = Counter()
+    tipos = Counter()
+    inicio = time.perf_counter()
+
+    def sumar(resultado):
+        informe["pacientes"] += resultado["pacientes"]
+        informe["atenciones"] += resultado["atenciones"]
+        tipos.update(h["tipo"] for h in resultado["hallazgos"])
+        lugar = len(resultado["hallazgos"]) if limite is None else max(0, limite - len(informe["hallazgos"]))
+        informe["hallazgos"].extend(resultado["hallazgos"][:lugar])
+        dnis.update(resultado["dnis"])
+
+    with ExitStack() as pila:
+        for archivo in archivos:
+            pila.enter_context(BloqueoArchivo(archivo, compartido=True))
+        # La bitacora se lee una vez aqui y cada proceso recibe sus atenciones
+        bitacoras = {archivo: _leer_bitacora(archivo) for archivo in archivos}
+        atenciones_bitacora = {archivo: b[1] for archivo, b in bitacoras.items()}
+        if procesos > 1:
+            pool = pila.enter_context(Pool(procesos, _recibir_bitacoras, (atenciones_bitacora,)))
+        else:
+            pool = None
+            _recibir_bitacoras(atenciones_bitacora)
+            pila.callback(_recibir_bitacoras, {})
+
+        for archivo in archivos:
+            altas, pendientes, hallazgos = bitacoras[archivo]
+            pendientes = dict(pendientes)
+            for resultado in _resultados(archivo, procesos, pool):
+                sumar(resultado)
+                for dni in resultado["bitacora"]:
+                    pendientes.pop(dni, None)
+            sumar(_resultado_bitacora(altas, pendientes, hallazgos))
+
+        for archivo in archivos:
+            sumar({**_resultado_vacio(), "hallazgos": _archivadas_sin_paciente(archivo, dnis)})
+
+    informe["dnis_duplicados"] = [{"dni": dni, "veces": veces} for dni, veces in dnis.items() if veces > 1]
+    informe["resumen"] = dict(tipos)
+    if informe["dnis_duplicados"]:
+        informe["resumen"]["dni_duplicado"] = len(informe["dnis_duplicados"])
+    informe["segundos"] = time.perf_counter() - inicio
+    return informe
@@ -0,0 +1,108 @@
+# Pico de memoria segun la cantidad de pacientes: historial completo en
+# memoria (AlmacenJson) vs modo de memoria acotada (AlmacenAcotado con su
+# cache LRU e indice de desplazamientos). Tambien mide el arranque (con y
+# sin indice ya armado), la busqueda por DNI (fallo de cache vs acierto) y
+# el registro. Cada medicion corre en su propio proceso para que el pico
+# de memoria de una no se mezcle con la otra.
+# Uso: python -m benchmarks.bench_acotado [presupuesto_mb] [pacientes ...]
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from almacenamiento import AlmacenJson, AlmacenAcotado
+from benchmarks.generador import generar_archivo
+from indices import AlmacenIndexado
+from modelo import PacienteEstandar, AtencionTriage
+
+ESCALAS = [20_000, 100_000, 300_000]
+PRESUPUESTO_MB = 64
+CONSULTAS = 2_000
+REGISTROS = 20
+
+
+def medir(ruta, presupuesto_mb):
+    if presupuesto_mb:
+        almacen = AlmacenAcotado(ruta, presupuesto_mb * 1024 * 1024 // 2, umbral_compactacion=None)
+    else:
+        almacen = AlmacenJson(ruta, usar_bitacora=True)
+    registro = AlmacenIndexado(almacen)
+
+    inicio = time.perf_counter()
+    registro.cargar()
+    arranque = time.perf_counter() - inicio
+
+    # DNIs del generador: 10000000 + numero de paciente
+    azar = random.Random(42)
+    dnis = [f"{10_000_000 + azar.randrange(registro.total_pacientes()):08d}" for _ in range(CONSULTAS)]
+    inicio = time.perf_counter()
+    for dni in dnis:
+        assert registro.buscar_por_dni(dni) is not None
+    primera = (time.perf_counter() - inicio) / CONSULTAS
+    inicio = time.perf_counter()
+    for dni in dnis:
+        registro.buscar_por_dni(dni)
+    repetida = (time.perf_counter() - inicio) / CONSULTAS
+
+    inicio = time.perf_counter()
+    for i in range(REGISTROS):
+        paciente = PacienteEstandar(dnis[i], "Ignorado", 40, "Femenino")
+        registro.registrar(paciente, AtencionTriage(70, 170, 120, 80, "Alerta", 98))
+    registrar = (time.perf_counter() - inicio) / REGISTROS
+    urgentes = sum(1 for _ in registro.listar_urgentes(20))
+
+    return {
+        "arranque": arranque, "pico_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "primera": primera, "repetida": repetida, "registro": registrar, "urgentes": urgentes,
+    }
+
+
+def en_proceso(ruta, presupuesto_mb):
+    # ru_maxrss se hereda al lanzar un proceso: cada medicion parte de uno chico
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_acotado", "--medir", ruta, str(presupuesto_mb)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main():
+    presupuesto = int(sys.argv[1]) if len(sys.argv) > 1 else PRESUPUESTO_MB
+    escalas = [int(n) for n in sys.argv[2:]] or ESCALAS
+
+    print(f"Memoria acotada a {presupuesto} MB (cache de {presupuesto // 2} MB) vs historial completo\n")
+    print(f"{'Pacientes':>9} | {'MB':>6} | {'Modo':>8} | {'Arranque':>9} | {'Pico MB':>7} | "
+          f"{'DNI 1a vez':>10} | {'DNI repet.':>10} | {'Registro':>9}")
+    print("-" * 90)
+    for pacientes in escalas:
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, "datos.json")
+            generar_archivo(ruta, pacientes)
+            tamano = os.path.getsize(ruta) / (1024 * 1024)
+            # Cada modo con su copia: los registros medidos cambian el archivo
+            copia = os.path.join(carpeta, "copia.json")
+            shutil.copy(ruta, copia)
+            shutil.copy(ruta + ".meta", copia + ".meta")
+
+            filas = [
+                ("completo", en_proceso(ruta, 0)),
+                ("acotado", en_proceso(copia, presupuesto)),
+                # Ya con el indice armado (y la bitacora de la medicion anterior)
+                ("reabre", en_proceso(copia, presupuesto)),
+            ]
+
+        for modo, r in filas:
+            print(f"{pacientes:>9} | {tamano:>6.0f} | {modo:>8} | {r['arranque']:>7.2f} s | {r['pico_mb']:>7.0f} | "
+                  f"{r['primera'] * 1e6:>7.0f} us | {r['repetida'] * 1e6:>7.0f} us | {r['registro'] * 1000:>6.2f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--medir":
+        print(json.dumps(medir(sys.argv[2], int(sys.argv[3]))))
+    else:
+        main()
@@ -0,0 +1,53 @@
+# Arranque en frio de cada comando sin menu (python main.py <comando>)
+# frente al arranque del menu interactivo, que carga todo el historial.
+# Cada medicion es un proceso nuevo; se informa la mediana.
+# Uso: python -m benchmarks.bench_arranque [pacientes] [repeticiones]
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_carga import generar_archivo
+
+# Ejecuta main.py como script apuntando config.ARCHIVO_DB al archivo generado
+LANZADOR = (
+    "import runpy, sys, config; config.ARCHIVO_DB = sys.argv[1]; "
+    "sys.argv = ['main.py'] + sys.argv[2:]; runpy.run_module('main', run_name='__main__')"
+)
+INTERACTIVO = "import sys, config; config.ARCHIVO_DB = sys.argv[1]; import main; main.Controlador()"
+
+
+def medir(argumentos, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run(argumentos, stdout=subprocess.DEVNULL, check=True)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def main():
+    n_pacientes = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "datos.json")
+        generar_archivo(ruta, n_pacientes, 1)
+        print(f"Archivo: {n_pacientes} pacientes ({os.path.getsize(ruta) / (1024 * 1024):.1f} MB)")
+
+        casos = [
+            ("python (vacio)", [sys.executable, "-c", "pass"]),
+            ("lookup (primero)", [sys.executable, "-c", LANZADOR, ruta, "lookup", "00000000"]),
+            ("lookup (ultimo)", [sys.executable, "-c", LANZADOR, ruta, "lookup", f"{n_pacientes - 1:08d}"]),
+            ("urgentes --json", [sys.executable, "-c", LANZADOR, ruta, "urgentes", "--json"]),
+            ("stats --json", [sys.executable, "-c", LANZADOR, ruta, "stats", "--json"]),
+            ("menu interactivo", [sys.executable, "-c", INTERACTIVO, ruta]),
+        ]
+        for nombre, argumentos in casos:
+            print(f"{nombre:>17}: {medir(argumentos, repeticiones) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Auditoria de integridad (auditoria.py) de un historial de ~1M de
+# atenciones segun la cantidad de procesos: tiempo, atenciones por segundo
+# y aceleracion respecto de un proceso. Como referencia, la carga normal
+# del mismo archivo (que no valida ni recalcula nada).
+# Uso: python -m benchmarks.bench_auditoria [pacientes] [profundidad] [procesos ...]
+import os
+import sys
+import tempfile
+import time
+
+import auditoria
+from benchmarks.generador import generar_archivo
+from modelo import GestorDatos
+
+PACIENTES = 200_000
+PROFUNDIDAD = 5
+
+
+def main():
+    pacientes = int(sys.argv[1]) if len(sys.argv) > 1 else PACIENTES
+    profundidad = float(sys.argv[2]) if len(sys.argv) > 2 else PROFUNDIDAD
+    nucleos = os.cpu_count() or 1
+    escalas = [int(n) for n in sys.argv[3:]] or sorted({1, 2, 4, 8, nucleos} & set(range(1, nucleos + 1)))
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "datos.json")
+        atenciones = generar_archivo(ruta, pacientes, profundidad=profundidad)
+        tamano = os.path.getsize(ruta) / (1024 * 1024)
+
+        inicio = time.perf_counter()
+        GestorDatos.cargar_pacientes(ruta)
+        carga = time.perf_counter() - inicio
+
+        print(f"{pacientes} pacientes, {atenciones} atenciones ({tamano:.0f} MB), {nucleos} nucleos")
+        print(f"Carga normal (sin validar): {carga:.2f} s\n")
+        print(f"{'Procesos':>8} | {'Tiempo':>8} | {'Atenciones/s':>12} | {'Aceleracion':>11} | {'Hallazgos':>9}")
+        print("-" * 62)
+        base = None
+        for procesos in escalas:
+            informe = auditoria.auditar([ruta], procesos)
+            assert informe["atenciones"] == atenciones
+            base = base or informe["segundos"]
+            print(f"{procesos:>8} | {informe['segundos']:>6.2f} s | {atenciones / informe['segundos']:>12.0f} | "
+                  f"{base / informe['segundos']:>10.2f}x | {sum(informe['resumen'].values()):>9}")
+
+
+if __name__ == "__main__":
+    main()
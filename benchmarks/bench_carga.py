@@ -0,0 +1,80 @@
+# Carga de datos.json: json.load + construccion completa vs lectura por
+# bloques con historial diferido. Cada modo corre en su propio proceso para
+# medir la memoria residente maxima por separado.
+# Uso: python -m benchmarks.bench_carga [pacientes] [atenciones_por_paciente]
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from modelo import GestorDatos
+
+
+def generar_archivo(ruta, n_pacientes, n_atenciones):
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i in range(n_pacientes):
+            atenciones = [{
+                "peso": 70.0, "talla": 170.0, "presion": float(random.randint(80, 190)),
+                "frecuencia": random.randint(50, 120), "conciencia": "Alerta",
+                "saturacion": random.randint(88, 100), "imc": 24.22,
+                "clasificacion_imc": "Normal", "nivel_atencion": "Normal",
+                "fecha_registro": "01-01-2025 08:00"
+            } for _ in range(n_atenciones)]
+            paciente = {
+                "dni": f"{i:08d}", "nombre": "Paciente Prueba", "edad": random.randint(0, 99),
+                "sexo": "Femenino", "fecha_registro": "01-01-2025 08:00", "atenciones": atenciones
+            }
+            f.write(("" if i == 0 else ",\n") + json.dumps(paciente, indent=4))
+        f.write("\n]")
+
+
+def cargar_completo(ruta):
+    with open(ruta, "r", encoding="utf-8") as f:
+        datos = json.load(f)
+    pacientes = [GestorDatos._paciente_desde_dict(d) for d in datos]
+    for p in pacientes:
+        p.obtener_atenciones()
+    return pacientes
+
+
+def cargar_diferido(ruta):
+    return GestorDatos.cargar_pacientes(ruta)
+
+
+def medir(modo, ruta):
+    inicio = time.perf_counter()
+    pacientes = {"completo": cargar_completo, "diferido": cargar_diferido}[modo](ruta)
+    segundos = time.perf_counter() - inicio
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"pacientes": len(pacientes), "segundos": segundos, "pico_mb": pico_mb}))
+
+
+def main():
+    n_pacientes = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    n_atenciones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "datos.json")
+        generar_archivo(ruta, n_pacientes, n_atenciones)
+        tamano_mb = os.path.getsize(ruta) / (1024 * 1024)
+        print(f"Archivo: {n_pacientes} pacientes x {n_atenciones} atenciones ({tamano_mb:.1f} MB)")
+
+        for modo in ("completo", "diferido"):
+            salida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_carga", "--medir", modo, ruta],
+                capture_output=True, text=True, check=True
+            ).stdout
+            r = json.loads(salida.strip().splitlines()[-1])
+            print(f"{modo:>9}: {r['segundos']:.2f} s | pico RSS {r['pico_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--medir":
+        medir(sys.argv[2], sys.argv[3])
+    else:
+        main()
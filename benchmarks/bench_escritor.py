@@ -0,0 +1,62 @@
+# Latencia de registrar (lo que espera el menu) segun config.DURABILIDAD,
+# con y sin bitacora, para historiales de distinto tamaño. Se informa la
+# mediana y el peor caso de cada registro, y el tiempo del cierre.
+# Uso: python -m benchmarks.bench_escritor [registros]
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from almacenamiento import AlmacenJson
+from benchmarks.bench_carga import generar_archivo
+from indices import AlmacenIndexado
+from modelo import PacienteEstandar, AtencionTriage
+
+TAMANOS = [10_000, 100_000]
+CASOS = [
+    ("inmediato", False),
+    ("diferido", False),
+    ("inmediato", True),
+    ("diferido", True),
+]
+
+
+def medir(ruta, durabilidad, usar_bitacora, registros):
+    registro = AlmacenIndexado(AlmacenJson(
+        ruta, usar_bitacora, 1024 * 1024 if usar_bitacora else None, durabilidad, ventana_guardado=0.2
+    ))
+    registro.cargar()
+
+    latencias = []
+    for i in range(registros):
+        paciente = PacienteEstandar(f"9{i:07d}", "Paciente Prueba", 40, "Femenino")
+        atencion = AtencionTriage(70, 170, 120, 80, "Alerta", 98)
+        inicio = time.perf_counter()
+        registro.registrar(paciente, atencion)
+        latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    registro.cerrar()
+    return statistics.median(latencias), max(latencias), time.perf_counter() - inicio
+
+
+def main():
+    registros = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    print(f"{'Pacientes':>10} | {'Durabilidad':>11} | {'Bitacora':>8} | {'Mediana (ms)':>12} | {'Peor (ms)':>10} | {'Cierre (ms)':>11}")
+    print("-" * 80)
+    with tempfile.TemporaryDirectory() as carpeta:
+        for n in TAMANOS:
+            for durabilidad, usar_bitacora in CASOS:
+                ruta = os.path.join(carpeta, f"datos_{n}_{durabilidad}_{usar_bitacora}.json")
+                generar_archivo(ruta, n, 1)
+                mediana, peor, cierre = medir(ruta, durabilidad, usar_bitacora, registros)
+                print(
+                    f"{n:>10} | {durabilidad:>11} | {'si' if usar_bitacora else 'no':>8} | "
+                    f"{mediana * 1000:>12.3f} | {peor * 1000:>10.2f} | {cierre * 1000:>11.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
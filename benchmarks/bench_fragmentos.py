@@ -0,0 +1,69 @@
+# Tiempo de guardar un registro segun el tamano del historial: un solo
+# archivo vs historial fragmentado por DNI (AlmacenFragmentado). Sin
+# bitacora, cada registro reescribe el archivo completo o solo su
+# fragmento; tambien se mide el arranque (carga de todo el historial).
+# Uso: python -m benchmarks.bench_fragmentos [fragmentos] [pacientes ...]
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+import fragmentacion
+from almacenamiento import AlmacenJson, AlmacenFragmentado
+from benchmarks.generador import generar_archivo
+from modelo import PacienteEstandar, AtencionTriage
+
+ESCALAS = [10_000, 50_000, 100_000]
+FRAGMENTOS = 16
+REGISTROS = 5
+
+
+def medir_almacen(almacen):
+    inicio = time.perf_counter()
+    almacen.cargar()
+    arranque = time.perf_counter() - inicio
+
+    # Mejor de varios registros de pacientes nuevos (caen en fragmentos distintos)
+    mejor = None
+    for i in range(REGISTROS):
+        paciente = PacienteEstandar(f"{99_000_000 + i:08d}", "Paciente Nuevo", 40, "Femenino")
+        atencion = AtencionTriage(70, 170, 120, 80, "Alerta", 98)
+        paciente.clasificar_atencion(atencion)
+        paciente.agregar_atencion(atencion)
+        inicio = time.perf_counter()
+        assert almacen.registrar_atencion(paciente, atencion, True)
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return arranque, mejor
+
+
+def main():
+    fragmentos = int(sys.argv[1]) if len(sys.argv) > 1 else FRAGMENTOS
+    escalas = [int(n) for n in sys.argv[2:]] or ESCALAS
+
+    print(f"Guardado de un registro sin bitacora, {fragmentos} fragmentos\n")
+    print(f"{'Pacientes':>9} | {'MB':>6} | {'Arranque unico':>14} | {'Arranque frag.':>14} | "
+          f"{'Registro unico':>14} | {'Registro frag.':>14}")
+    print("-" * 88)
+    for pacientes in escalas:
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, "datos.json")
+            generar_archivo(ruta, pacientes)
+            tamano = os.path.getsize(ruta) / (1024 * 1024)
+
+            arranque_unico, registro_unico = medir_almacen(AlmacenJson(ruta, usar_bitacora=False))
+
+            # Se vuelve a generar: el anterior ya tiene los registros medidos
+            generar_archivo(ruta, pacientes)
+            with redirect_stdout(StringIO()):
+                fragmentacion.refragmentar(ruta, fragmentos)
+            arranque_frag, registro_frag = medir_almacen(AlmacenFragmentado(ruta, fragmentos, usar_bitacora=False))
+
+        print(f"{pacientes:>9} | {tamano:>6.1f} | {arranque_unico * 1000:>11.0f} ms | {arranque_frag * 1000:>11.0f} ms | "
+              f"{registro_unico * 1000:>11.1f} ms | {registro_frag * 1000:>11.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Registros por segundo al construir pacientes desde dicts: camino validado
+# (constructores y setters) vs camino confiable (from_dict con confiable=True),
+# y carga completa de un archivo con y sin sello de verificacion.
+# Uso: python -m benchmarks.bench_hidratacion [pacientes] [atenciones_por_paciente]
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_carga import generar_archivo
+from modelo import GestorDatos
+
+
+def medir_construccion(datos, confiable):
+    inicio = time.perf_counter()
+    for d in datos:
+        GestorDatos._paciente_desde_dict(d, confiable).obtener_atenciones()
+    segundos = time.perf_counter() - inicio
+    return sum(1 + len(d["atenciones"]) for d in datos) / segundos
+
+
+def medir_carga(ruta):
+    inicio = time.perf_counter()
+    pacientes = GestorDatos.cargar_pacientes(ruta)
+    return len(pacientes) / (time.perf_counter() - inicio)
+
+
+def main():
+    n_pacientes = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    n_atenciones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "datos.json")
+        generar_archivo(ruta, n_pacientes, n_atenciones)
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+
+        validado = medir_construccion(datos, confiable=False)
+        confiable = medir_construccion(datos, confiable=True)
+        print(f"Construccion validada : {validado:>12,.0f} registros/s")
+        print(f"Construccion confiable: {confiable:>12,.0f} registros/s ({confiable / validado:.1f}x)")
+
+        sin_sello = medir_carga(ruta)
+        GestorDatos.guardar_pacientes(ruta, GestorDatos.cargar_pacientes(ruta))
+        con_sello = medir_carga(ruta)
+        print(f"cargar_pacientes sin sello: {sin_sello:>10,.0f} pacientes/s")
+        print(f"cargar_pacientes con sello: {con_sello:>10,.0f} pacientes/s ({con_sello / sin_sello:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Historial de varios anos con y sin archivo historico: memoria tras la
+# carga, tiempo de carga y de guardado, y lectura bajo demanda de lo
+# archivado (un paciente). Cada medicion corre en su propio proceso para que
+# la memoria de una no se mezcle con la otra.
+# Uso: python -m benchmarks.bench_historico [pacientes] [anos] [dias_recientes]
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import historico
+from almacenamiento import AlmacenJson
+from benchmarks.generador import generar_archivo
+from historico import HistoricoAtenciones
+from modelo import GestorDatos
+
+PACIENTES = 50_000
+ANOS = 3
+DIAS_RECIENTES = 90
+PROFUNDIDAD = 12
+CONSULTAS = 200
+
+
+def medir(ruta):
+    inicio = time.perf_counter()
+    almacen = AlmacenJson(ruta, usar_bitacora=False)
+    almacen.cargar()
+    carga = time.perf_counter() - inicio
+    memoria = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    atenciones = sum(p.cantidad_atenciones() for p in almacen.pacientes)
+
+    inicio = time.perf_counter()
+    GestorDatos.guardar_pacientes(ruta + ".copia.json", almacen.pacientes)
+    guardado = time.perf_counter() - inicio
+    for sobrante in (ruta + ".copia.json", GestorDatos._ruta_sello(ruta + ".copia.json")):
+        os.remove(sobrante)
+
+    dnis = random.Random(42).sample([p.dni for p in almacen.pacientes], CONSULTAS)
+    inicio = time.perf_counter()
+    archivadas = sum(len(almacen.historial_archivado(dni)) for dni in dnis)
+    lectura = (time.perf_counter() - inicio) / CONSULTAS
+    return {
+        "carga": carga, "memoria_mb": memoria, "guardado": guardado,
+        "atenciones": atenciones, "archivadas_leidas": archivadas, "lectura_archivadas": lectura,
+    }
+
+
+def archivar(ruta, dias):
+    inicio = time.perf_counter()
+    movidas = historico.archivar(ruta, int(time.time()) - dias * 24 * 3600)
+    return {"movidas": movidas, "segundos": time.perf_counter() - inicio}
+
+
+def en_proceso(*argumentos):
+    # ru_maxrss se hereda al lanzar un proceso: cada paso parte de uno chico
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_historico", *argumentos],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main():
+    pacientes = int(sys.argv[1]) if len(sys.argv) > 1 else PACIENTES
+    anos = float(sys.argv[2]) if len(sys.argv) > 2 else ANOS
+    dias = int(sys.argv[3]) if len(sys.argv) > 3 else DIAS_RECIENTES
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "datos.json")
+        generar_archivo(ruta, pacientes, profundidad=PROFUNDIDAD, dias=anos * 365)
+        tamano = os.path.getsize(ruta) / (1024 * 1024)
+        completo = en_proceso("--medir", ruta)
+        archivado = en_proceso("--archivar", ruta, str(dias))
+        segmentos = HistoricoAtenciones.leer_cabecera(ruta)["segmentos"]
+        comprimido = sum(os.path.getsize(os.path.join(carpeta, s)) for s in segmentos) / (1024 * 1024)
+        reciente = en_proceso("--medir", ruta)
+        reciente_mb = os.path.getsize(ruta) / (1024 * 1024)
+
+    print(f"{pacientes} pacientes, {completo['atenciones']} atenciones en {anos:g} anos ({tamano:.1f} MB)")
+    print(f"Archivado de {archivado['movidas']} atenciones con mas de {dias} dias: {archivado['segundos']:.1f} s, "
+          f"{comprimido:.1f} MB comprimidos, principal de {reciente_mb:.1f} MB\n")
+    print(f"{'':>26} | {'Completo':>10} | {'Reciente':>10}")
+    print("-" * 52)
+    print(f"{'Atenciones en memoria':>26} | {completo['atenciones']:>10} | {reciente['atenciones']:>10}")
+    print(f"{'Memoria tras cargar (MB)':>26} | {completo['memoria_mb']:>10.0f} | {reciente['memoria_mb']:>10.0f}")
+    print(f"{'Carga (s)':>26} | {completo['carga']:>10.2f} | {reciente['carga']:>10.2f}")
+    print(f"{'Guardado (s)':>26} | {completo['guardado']:>10.2f} | {reciente['guardado']:>10.2f}")
+    print(f"\nHistorial archivado de un paciente: {reciente['lectura_archivadas'] * 1000:.2f} ms "
+          f"(promedio de {CONSULTAS}, primera consulta incluye leer los indices)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--medir":
+        print(json.dumps(medir(sys.argv[2])))
+    elif len(sys.argv) == 4 and sys.argv[1] == "--archivar":
+        print(json.dumps(archivar(sys.argv[2], int(sys.argv[3]))))
+    else:
+        main()
@@ -0,0 +1,113 @@
+# Instantanea binaria (instantanea.py) frente a datos.json: tamaño del
+# archivo, tiempo y memoria de json.load, carga completa con
+# GestorDatos.cargar_pacientes y busqueda de un DNI sin cargar el historial.
+# Cada medicion corre en su propio proceso para separar la memoria residente.
+# Uso: python -m benchmarks.bench_instantanea [pacientes] [atenciones_por_paciente]
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_carga import generar_archivo
+from modelo import GestorDatos
+
+
+def _cargar_json_crudo(ruta, dni):
+    with open(ruta, "r", encoding="utf-8") as f:
+        return len(json.load(f))
+
+
+def _abrir_instantanea(ruta, dni):
+    from instantanea import Instantanea
+    with Instantanea(ruta) as datos:
+        return len(datos)
+
+
+def _cargar_registro(ruta, dni):
+    return len(GestorDatos.cargar_pacientes(ruta))
+
+
+def _buscar_dni(ruta, dni):
+    return sum(1 for _ in GestorDatos.iterar_pacientes(ruta, dni))
+
+
+MODOS = {
+    "json.load": _cargar_json_crudo,
+    "mmap (cabecera)": _abrir_instantanea,
+    "cargar_pacientes": _cargar_registro,
+    "buscar DNI": _buscar_dni,
+}
+
+
+def medir(modo, ruta, dni):
+    inicio = time.perf_counter()
+    elementos = MODOS[modo](ruta, dni)
+    segundos = time.perf_counter() - inicio
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"elementos": elementos, "segundos": segundos, "pico_mb": pico_mb}))
+
+
+def _en_proceso(modo, ruta, dni):
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_instantanea", "--medir", modo, ruta, dni],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def preparar(ruta_json, ruta_bin, n_pacientes, n_atenciones):
+    generar_archivo(ruta_json, n_pacientes, n_atenciones)
+    # Sellado, para que ambos formatos usen la carga confiable
+    GestorDatos.compactar_en_disco(ruta_json)
+
+    inicio = time.perf_counter()
+    GestorDatos.convertir(ruta_json, ruta_bin)
+    print(json.dumps(time.perf_counter() - inicio))
+
+
+def main():
+    n_pacientes = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_atenciones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_json = os.path.join(carpeta, "datos.json")
+        ruta_bin = os.path.join(carpeta, "datos.bin")
+        # En otro proceso: ru_maxrss se hereda al lanzar las mediciones, que
+        # deben partir de un proceso chico
+        salida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_instantanea", "--preparar",
+             ruta_json, ruta_bin, str(n_pacientes), str(n_atenciones)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        conversion = json.loads(salida.strip().splitlines()[-1])
+
+        print(f"{n_pacientes} pacientes x {n_atenciones} atenciones (conversión: {conversion:.2f} s)")
+        for ruta in (ruta_json, ruta_bin):
+            print(f"  {os.path.basename(ruta):>10}: {os.path.getsize(ruta) / (1024 * 1024):8.1f} MB")
+
+        casos = [
+            ("json.load", ruta_json),
+            ("mmap (cabecera)", ruta_bin),
+            ("cargar_pacientes", ruta_json),
+            ("cargar_pacientes", ruta_bin),
+            ("buscar DNI", ruta_json),
+            ("buscar DNI", ruta_bin),
+        ]
+        print(f"{'Medicion':>17} | {'Archivo':>10} | {'Segundos':>9} | {'Pico RSS (MB)':>13}")
+        print("-" * 60)
+        for modo, ruta in casos:
+            # El ultimo DNI: el peor caso para recorrer el JSON
+            r = _en_proceso(modo, ruta, f"{n_pacientes - 1:08d}")
+            print(f"{modo:>17} | {os.path.basename(ruta):>10} | {r['segundos']:>9.3f} | {r['pico_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--medir":
+        medir(sys.argv[2], sys.argv[3], sys.argv[4])
+    elif len(sys.argv) == 6 and sys.argv[1] == "--preparar":
+        preparar(sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))
+    else:
+        main()
@@ -0,0 +1,45 @@
+# Memoria del historial de atenciones: un objeto AtencionTriage por atencion
+# vs HistorialColumnar (arreglos tipados + vistas bajo demanda).
+# Uso: python -m benchmarks.bench_memoria [pacientes] [atenciones_por_paciente]
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from benchmarks.bench_carga import generar_archivo
+from historial import HistorialColumnar
+from modelo import Paciente, GestorDatos
+
+
+def medir(ruta, columnar):
+    Paciente.usar_historial_columnar(HistorialColumnar() if columnar else None)
+    tracemalloc.start()
+    pacientes = GestorDatos.cargar_pacientes(ruta)
+    for p in pacientes:
+        p.obtener_atenciones()
+    actual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    Paciente.usar_historial_columnar(None)
+    return actual / (1024 * 1024), len(pacientes)
+
+
+def main():
+    n_pacientes = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_atenciones = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "datos.json")
+        generar_archivo(ruta, n_pacientes, n_atenciones)
+        # Sellar el archivo para que ambos modos usen la carga confiable
+        GestorDatos.guardar_pacientes(ruta, GestorDatos.cargar_pacientes(ruta))
+
+        objetos, n = medir(ruta, columnar=False)
+        columnas, _ = medir(ruta, columnar=True)
+        total = n * n_atenciones
+        print(f"{n} pacientes, {total} atenciones")
+        print(f"Objetos   : {objetos:8.1f} MB ({objetos * 1024 * 1024 / total:6.0f} B/atencion)")
+        print(f"Columnar  : {columnas:8.1f} MB ({columnas * 1024 * 1024 / total:6.0f} B/atencion)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Busqueda por nombre: IndiceNombres (trigramas) vs recorrido con subcadena.
+# Uso: python -m benchmarks.bench_nombres
+import random
+import time
+
+from indices import IndiceNombres
+
+TAMANOS = [1_000, 10_000, 100_000, 1_000_000]
+NOMBRES = ["Juan", "María", "Carlos", "Lucía", "José", "Ana", "Luis", "Rosa", "Jorge", "Carmen",
+           "Pedro", "Elena", "Miguel", "Sofía", "Víctor", "Julia", "Raúl", "Teresa", "Óscar", "Inés"]
+SILABAS = ["ca", "mo", "ri", "lú", "pe", "zá", "qui", "ñe", "to", "var", "gas", "rez", "lo", "hua", "mán", "de", "sal", "tí"]
+BUSQUEDAS = 200
+
+
+def nombre_aleatorio():
+    # Apellidos sinteticos de 2-3 silabas: miles de apellidos distintos como en un censo real
+    apellidos = ["".join(random.choices(SILABAS, k=random.randint(2, 3))).title() for _ in range(2)]
+    return f"{random.choice(NOMBRES)} {apellidos[0]} {apellidos[1]}"
+
+
+def main():
+    random.seed(1)
+    print(f"{'Pacientes':>10} | {'Indice (ms)':>12} | {'Recorrido (ms)':>15}")
+    print("-" * 44)
+    for n in TAMANOS:
+        nombres = {f"{i:08d}": nombre_aleatorio() for i in range(n)}
+        indice = IndiceNombres()
+        for dni, nombre in nombres.items():
+            indice.actualizar(dni, nombre)
+        # Consultas por el nombre completo de un paciente existente
+        consultas = [nombres[f"{random.randrange(n):08d}"] for _ in range(BUSQUEDAS)]
+
+        inicio = time.perf_counter()
+        for c in consultas:
+            indice.buscar(c, limite=10)
+        t_indice = (time.perf_counter() - inicio) / BUSQUEDAS
+
+        inicio = time.perf_counter()
+        for c in consultas[:10]:
+            c = c.lower()
+            [dni for dni, nombre in nombres.items() if c in nombre.lower()]
+        t_recorrido = (time.perf_counter() - inicio) / 10
+
+        print(f"{n:>10} | {t_indice * 1e3:>12.2f} | {t_recorrido * 1e3:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
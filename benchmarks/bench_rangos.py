@@ -0,0 +1,82 @@
+# Consultas por rango de tiempo ("ultimas 2 horas", "urgentes del turno")
+# recorriendo todo el historial cargado vs con el IndiceTemporal de
+# AlmacenIndexado. Las atenciones se reparten en los ultimos 30 dias.
+# Uso: python -m benchmarks.bench_rangos [pacientes] [atenciones_por_paciente]
+import os
+import random
+import sys
+import tempfile
+import time
+
+from almacenamiento import AlmacenJson
+from indices import AlmacenIndexado, IndiceTemporal
+from modelo import GestorDatos
+
+DIAS = 30
+CONSULTAS = [
+    ("Ultimas 2 horas", 2 * 3600, False),
+    ("Urgentes del turno (8 h)", 8 * 3600, True),
+    ("Ultimo dia", 24 * 3600, False),
+]
+REPETICIONES = 5
+
+
+def generar_archivo(ruta, n_pacientes, n_atenciones, ahora):
+    random.seed(42)
+    pacientes = []
+    for i in range(n_pacientes):
+        marcas = sorted(ahora - random.randrange(DIAS * 24 * 3600) for _ in range(n_atenciones))
+        pacientes.append({
+            "dni": f"{i:08d}", "nombre": "Paciente Prueba", "edad": random.randint(0, 99),
+            "sexo": "Femenino", "fecha_registro": marcas[0],
+            "atenciones": [{
+                "peso": 70.0, "talla": 170.0, "presion": float(random.randint(80, 190)),
+                "frecuencia": random.randint(50, 120), "conciencia": "Alerta",
+                "saturacion": random.randint(88, 100), "imc": 24.22, "clasificacion_imc": "Normal",
+                "nivel_atencion": random.choice(["Normal", "Urgente"]), "fecha_registro": marca
+            } for marca in marcas]
+        })
+    GestorDatos._guardar_dicts(ruta, pacientes)
+
+
+def medir(funcion):
+    mejor = None
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = len(list(funcion()))
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor, resultado
+
+
+def main():
+    n_pacientes = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_atenciones = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    ahora = int(time.time())
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "datos.json")
+        generar_archivo(ruta, n_pacientes, n_atenciones, ahora)
+
+        registro = AlmacenIndexado(AlmacenJson(ruta, usar_bitacora=False))
+        registro.cargar()
+        pacientes = registro.almacen.pacientes
+
+        inicio = time.perf_counter()
+        IndiceTemporal.desde_pacientes(pacientes)
+        construccion = time.perf_counter() - inicio
+
+        print(f"{n_pacientes} pacientes, {n_pacientes * n_atenciones} atenciones")
+        print(f"Construccion del indice: {construccion * 1000:.1f} ms\n")
+        print(f"{'Consulta':>26} | {'Resultados':>10} | {'Recorrido (ms)':>14} | {'Indice (ms)':>11}")
+        print("-" * 72)
+        for nombre, segundos, solo_urgentes in CONSULTAS:
+            desde = ahora - segundos
+            recorrido, esperados = medir(lambda: registro.almacen.atenciones_entre(desde, ahora + 1, solo_urgentes))
+            indice, obtenidos = medir(lambda: registro.atenciones_entre(desde, ahora + 1, solo_urgentes))
+            assert esperados == obtenidos
+            print(f"{nombre:>26} | {obtenidos:>10} | {recorrido * 1000:>14.1f} | {indice * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Latencia de busqueda por DNI: RegistroPacientes (dict) vs recorrido lineal.
+# Uso: python -m benchmarks.bench_registro
+import random
+import time
+
+from modelo import PacienteEstandar, RegistroPacientes
+
+TAMANOS = [1_000, 10_000, 100_000, 1_000_000]
+BUSQUEDAS = 10_000
+BUSQUEDAS_LINEALES = 20
+
+
+def generar_pacientes(n):
+    return [PacienteEstandar(f"{i:08d}", "Paciente Prueba", 30, "Masculino") for i in range(n)]
+
+
+def medir_registro(registro, dnis):
+    inicio = time.perf_counter()
+    for dni in dnis:
+        registro.buscar(dni)
+    return (time.perf_counter() - inicio) / len(dnis)
+
+
+def medir_lineal(lista, dnis):
+    inicio = time.perf_counter()
+    for dni in dnis:
+        for p in lista:
+            if p.dni == dni:
+                break
+    return (time.perf_counter() - inicio) / len(dnis)
+
+
+def main():
+    print(f"{'Pacientes':>10} | {'Registro (us)':>14} | {'Lineal (us)':>12}")
+    print("-" * 43)
+    for n in TAMANOS:
+        lista = generar_pacientes(n)
+        registro = RegistroPacientes(lista)
+        dnis = [f"{random.randrange(n):08d}" for _ in range(BUSQUEDAS)]
+
+        t_registro = medir_registro(registro, dnis)
+        t_lineal = medir_lineal(lista, dnis[:BUSQUEDAS_LINEALES])
+
+        print(f"{n:>10} | {t_registro * 1e6:>14.3f} | {t_lineal * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
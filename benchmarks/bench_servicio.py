@@ -0,0 +1,77 @@
+# Latencia del servicio compartido con varios puestos a la vez: cada puesto
+# es un hilo con su propia conexion que alterna busquedas por DNI y registros.
+# Uso: python -m benchmarks.bench_servicio [puestos] [pedidos_por_puesto]
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from almacenamiento import AlmacenJson
+from benchmarks.bench_carga import generar_archivo
+from indices import AlmacenIndexado
+from modelo import PacienteEstandar, AtencionTriage
+from servicio import ServidorTriaje, ClienteTriaje
+
+N_PACIENTES = 50_000
+
+
+def puesto(direccion, indice, pedidos, latencias):
+    cliente = ClienteTriaje(direccion)
+    cliente.cargar()
+    for i in range(pedidos):
+        inicio = time.perf_counter()
+        if i % 2:
+            cliente.buscar_por_dni(f"{(indice * pedidos + i) % N_PACIENTES:08d}")
+            latencias["lookup"].append(time.perf_counter() - inicio)
+        else:
+            cliente.registrar(
+                PacienteEstandar(f"9{indice:02d}{i:05d}", "Paciente Servicio", 40, "Femenino"),
+                AtencionTriage(70, 170, 120, 80, "Alerta", 98)
+            )
+            latencias["registro"].append(time.perf_counter() - inicio)
+    cliente.cerrar()
+
+
+def main():
+    puestos = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    pedidos = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        archivo = os.path.join(carpeta, "datos.json")
+        generar_archivo(archivo, N_PACIENTES, 1)
+        registro = AlmacenIndexado(AlmacenJson(archivo))
+        registro.cargar()
+
+        servidor = ServidorTriaje(registro)
+        bucle = asyncio.new_event_loop()
+        hilo = threading.Thread(target=bucle.run_forever, daemon=True)
+        hilo.start()
+        asyncio.run_coroutine_threadsafe(servidor.iniciar("127.0.0.1:0"), bucle).result()
+
+        latencias = {"lookup": [], "registro": []}
+        inicio = time.perf_counter()
+        hilos = [
+            threading.Thread(target=puesto, args=(servidor.direccion(), i, pedidos, latencias))
+            for i in range(puestos)
+        ]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        segundos = time.perf_counter() - inicio
+
+        asyncio.run_coroutine_threadsafe(servidor.detener(), bucle).result()
+        bucle.call_soon_threadsafe(bucle.stop)
+
+    print(f"{puestos} puestos x {pedidos} pedidos: {puestos * pedidos / segundos:.0f} pedidos/s")
+    for operacion, tiempos in latencias.items():
+        tiempos.sort()
+        p99 = tiempos[int(len(tiempos) * 0.99) - 1]
+        print(f"{operacion:>9}: mediana {statistics.median(tiempos) * 1000:.2f} ms | p99 {p99 * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
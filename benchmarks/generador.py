@@ -0,0 +1,177 @@
+# Generador de historiales sinteticos con la forma de datos.json: mezcla de
+# edades (PacienteEstandar y PacienteAdultoMayor), proporcion de atenciones
+# urgentes y profundidad de historial configurables. Cada atencion se arma y
+# clasifica con el modelo, asi IMC y nivel de atencion son los que calcularia
+# el sistema. El archivo se escribe de a un paciente (sirve para 1M) y queda
+# sellado como si lo hubiera guardado la aplicacion.
+# Uso: python -m benchmarks.generador <salida.json> <pacientes> [--semilla N]
+#      [--mayores 0.3] [--urgentes 0.2] [--profundidad 3] [--dias 365]
+import argparse
+import hashlib
+import json
+import math
+import random
+import time
+
+import reglas
+from modelo import AtencionTriage, GestorDatos, clase_por_edad
+
+NOMBRES = ["Juan", "María", "Carlos", "Lucía", "José", "Ana", "Luis", "Rosa", "Jorge", "Carmen",
+           "Pedro", "Elena", "Miguel", "Sofía", "Víctor", "Julia", "Raúl", "Teresa", "Óscar", "Inés"]
+APELLIDOS = ["Quispe", "Flores", "Sánchez", "Rodríguez", "García", "Huamán", "Mamani", "Chávez", "Rojas",
+             "Mendoza", "Ramírez", "Vargas", "Castillo", "Torres", "Díaz", "Gutiérrez", "Ñahui", "López"]
+SILABAS = ["ca", "mo", "ri", "lú", "pe", "zá", "qui", "ñe", "to", "var", "gas", "rez", "lo", "hua", "mán"]
+CONCIENCIAS_ALTERADAS = ["Verbal", "Dolor", "Inconsciente"]
+
+# Edad minima de cada grupo: la talla valida empieza en 100 cm
+EDAD_MINIMA = 4
+EDAD_ADULTO = 18
+# Desde la ultima franja de las reglas: PacienteAdultoMayor (clase_por_edad)
+EDAD_MAYOR = reglas.motor().franjas[-1][1]
+EDAD_MAXIMA = 100
+PROPORCION_MENORES = 0.15
+MAXIMO_ATENCIONES = 50
+
+
+class GeneradorPacientes:
+
+    def __init__(self, semilla=42, mayores=0.3, urgentes=0.2, profundidad=3, dias=365, ahora=None):
+        if not 0 <= mayores <= 1 - PROPORCION_MENORES:
+            raise ValueError(f"La proporción de mayores debe estar entre 0 y {1 - PROPORCION_MENORES}.")
+        if not 0 <= urgentes <= 1:
+            raise ValueError("La proporción de urgentes debe estar entre 0 y 1.")
+        if profundidad < 1:
+            raise ValueError("La profundidad media del historial debe ser al menos 1.")
+
+        self.azar = random.Random(semilla)
+        self.mayores = mayores
+        self.urgentes = urgentes
+        self.profundidad = profundidad
+        self.segundos = int(dias * 24 * 3600)
+        self.ahora = int(time.time()) if ahora is None else ahora
+
+    def _nombre(self):
+        azar = self.azar
+        # La mitad de los apellidos son comunes (homonimos, como en una clinica
+        # real) y la otra mitad sinteticos, para que el indice de nombres no
+        # trabaje con un vocabulario diminuto
+        apellidos = [
+            azar.choice(APELLIDOS) if azar.random() < 0.5 else
+            "".join(azar.choices(SILABAS, k=azar.randint(2, 3)))
+            for _ in range(2)
+        ]
+        return f"{azar.choice(NOMBRES)} {apellidos[0]} {apellidos[1]}"
+
+    def _edad(self):
+        azar = self.azar
+        sorteo = azar.random()
+        if sorteo < PROPORCION_MENORES:
+            return azar.randint(EDAD_MINIMA, EDAD_ADULTO - 1)
+        if sorteo < PROPORCION_MENORES + self.mayores:
+            return azar.randint(EDAD_MAYOR, EDAD_MAXIMA)
+        return azar.randint(EDAD_ADULTO, EDAD_MAYOR - 1)
+
+    def _cantidad_atenciones(self):
+        # Geometrica con media self.profundidad: la mayoria viene una o dos
+        # veces y unos pocos tienen historiales largos
+        if self.profundidad == 1:
+            return 1
+        extra = int(self.azar.expovariate(math.log(1 + 1 / (self.profundidad - 1))))
+        return min(1 + extra, MAXIMO_ATENCIONES)
+
+    def _signos(self, edad):
+        azar = self.azar
+        if edad < EDAD_ADULTO:
+            talla = azar.randint(100, 180)
+        else:
+            talla = azar.randint(145, 195)
+        peso = round(min(max(azar.gauss(22, 4) * (talla / 100) ** 2, 15), 200), 1)
+
+        # Valores normales para ambas clases de paciente
+        presion = azar.randint(100, 160)
+        frecuencia = azar.randint(60, 100)
+        saturacion = azar.randint(94, 100)
+        conciencia = "Alerta"
+
+        if azar.random() < self.urgentes:
+            # Un signo fuera de rango, urgente para ambas clases
+            signo = azar.randrange(5)
+            if signo == 0:
+                presion = azar.randint(60, 89)
+            elif signo == 1:
+                presion = azar.randint(181, 200)
+            elif signo == 2:
+                frecuencia = azar.randint(111, 160)
+            elif signo == 3:
+                saturacion = azar.randint(75, 91)
+            else:
+                conciencia = azar.choice(CONCIENCIAS_ALTERADAS)
+
+        return peso, talla, presion, frecuencia, conciencia, saturacion
+
+    def paciente(self, numero):
+        # DNI unico derivado del numero: los mismos DNIs para cualquier semilla
+        edad = self._edad()
+        paciente = clase_por_edad(edad)(f"{10_000_000 + numero:08d}", self._nombre(), edad, self.azar.choice(["Masculino", "Femenino"]))
+
+        marcas = sorted(self.ahora - self.azar.randrange(self.segundos) for _ in range(self._cantidad_atenciones()))
+        paciente.fecha_registro = marcas[0]
+        for marca in marcas:
+            atencion = AtencionTriage(*self._signos(edad))
+            atencion.fecha_registro = marca
+            paciente.clasificar_atencion(atencion)
+            paciente.agregar_atencion(atencion)
+        return paciente
+
+    def pacientes(self, cantidad):
+        for numero in range(cantidad):
+            yield self.paciente(numero)
+
+
+def generar_archivo(ruta, cantidad, **opciones):
+    # Mismo texto que GestorDatos.guardar_pacientes (lista JSON con indent=4),
+    # escrito de a un paciente, y el sello que dejaria la aplicacion
+    resumen = hashlib.sha256()
+    atenciones = 0
+
+    def escribir(f, texto):
+        datos = texto.encode("utf-8")
+        f.write(datos)
+        resumen.update(datos)
+
+    with open(ruta, "wb") as f:
+        escribir(f, "[")
+        for numero, paciente in enumerate(GeneradorPacientes(**opciones).pacientes(cantidad)):
+            atenciones += paciente.cantidad_atenciones()
+            texto = json.dumps(paciente.to_dict(), indent=4).replace("\n", "\n    ")
+            escribir(f, ("," if numero else "") + "\n    " + texto)
+        escribir(f, "\n]" if cantidad else "]")
+
+    GestorDatos._escribir_sello(ruta, resumen.hexdigest(), 1)
+    return atenciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un datos.json sintético.")
+    parser.add_argument("salida")
+    parser.add_argument("pacientes", type=int)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--mayores", type=float, default=0.3, help="Proporción de pacientes de 65 años o más")
+    parser.add_argument("--urgentes", type=float, default=0.2, help="Proporción de atenciones urgentes")
+    parser.add_argument("--profundidad", type=float, default=3, help="Atenciones por paciente en promedio")
+    parser.add_argument("--dias", type=float, default=365, help="Antigüedad máxima de las atenciones")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    atenciones = generar_archivo(
+        args.salida, args.pacientes, semilla=args.semilla, mayores=args.mayores,
+        urgentes=args.urgentes, profundidad=args.profundidad, dias=args.dias
+    )
+    print(
+        f"[SISTEMA] {args.salida}: {args.pacientes} pacientes, {atenciones} atenciones "
+        f"en {time.perf_counter() - inicio:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
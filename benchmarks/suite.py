@@ -0,0 +1,207 @@
+# Suite de rendimiento a varias escalas sobre historiales de
+# benchmarks.generador: carga, guardado, busqueda por DNI y por nombre,
+# urgentes, estadisticas y clasificacion. Cada escala corre en su propio
+# proceso (la memoria de una no contamina a la siguiente) y el resultado se
+# guarda en JSON para comparar corridas; --comparar marca las operaciones que
+# empeoraron mas que --umbral y termina con codigo 1 si hubo alguna.
+# Uso: python -m benchmarks.suite [--escalas 10000 100000 1000000]
+#      [--salida resultado.json] [--comparar anterior.json] [--umbral 0.2]
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from almacenamiento import AlmacenJson
+from benchmarks.generador import generar_archivo, NOMBRES, APELLIDOS
+from indices import AlmacenIndexado
+from modelo import GestorDatos
+
+ESCALAS = [10_000, 100_000, 1_000_000]
+SEMILLA = 42
+BUSQUEDAS_DNI = 100_000
+BUSQUEDAS_NOMBRE = 200
+REPETICIONES = 5
+CARPETA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+
+def _cronometrar(funcion, repeticiones=1):
+    # Mejor de varias repeticiones: lo que sobra es ruido de la maquina
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor
+
+
+def _pico_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir_escala(ruta):
+    # Corre en un proceso propio; devuelve segundos por operacion (las
+    # busquedas, por consulta)
+    azar = random.Random(SEMILLA)
+    segundos = {}
+
+    inicio = time.perf_counter()
+    pacientes = GestorDatos.cargar_pacientes(ruta)
+    segundos["cargar_pacientes"] = time.perf_counter() - inicio
+    carga_mb = _pico_mb()
+
+    copia = ruta + ".copia.json"
+    segundos["guardar_pacientes"] = _cronometrar(lambda: GestorDatos.guardar_pacientes(copia, pacientes))
+    for sobrante in (copia, GestorDatos._ruta_sello(copia)):
+        os.remove(sobrante)
+
+    def clasificar():
+        for p in pacientes:
+            p.clasificar_atencion(p.obtener_ultima_atencion())
+    segundos["clasificar_por_paciente"] = _cronometrar(clasificar, REPETICIONES) / len(pacientes)
+
+    # El resto, como lo usa el menu: almacen JSON con sus indices
+    del pacientes
+    gc.collect()
+    registro = AlmacenIndexado(AlmacenJson(ruta, usar_bitacora=False))
+    inicio = time.perf_counter()
+    registro.cargar()
+    segundos["arranque_indexado"] = time.perf_counter() - inicio
+
+    total = registro.total_pacientes()
+    # Mitad existentes, mitad inexistentes
+    dnis = [f"{10_000_000 + azar.randrange(total):08d}" for _ in range(BUSQUEDAS_DNI // 2)]
+    dnis += [f"{90_000_000 + azar.randrange(total):08d}" for _ in range(BUSQUEDAS_DNI // 2)]
+    segundos["buscar_dni_por_consulta"] = _cronometrar(
+        lambda: [registro.buscar_por_dni(dni) for dni in dnis], REPETICIONES
+    ) / len(dnis)
+
+    nombres = [azar.choice(NOMBRES + APELLIDOS) for _ in range(BUSQUEDAS_NOMBRE)]
+    segundos["buscar_nombre_por_consulta"] = _cronometrar(
+        lambda: [registro.buscar_por_nombre(nombre) for nombre in nombres], REPETICIONES
+    ) / len(nombres)
+
+    # listar_urgentes devuelve un generador: hay que recorrerlo para buscar a los pacientes
+    segundos["listar_urgentes"] = _cronometrar(lambda: list(registro.listar_urgentes()), REPETICIONES)
+    segundos["calcular_estadisticas"] = _cronometrar(registro.resumen_estadisticas, REPETICIONES)
+    segundos["estadisticas_recorriendo"] = _cronometrar(registro.almacen.estadisticas, REPETICIONES)
+
+    return {"segundos": segundos, "carga_mb": carga_mb, "pico_mb": _pico_mb()}
+
+
+def correr_escala(carpeta, pacientes):
+    ruta = os.path.join(carpeta, f"datos_{pacientes}.json")
+    inicio = time.perf_counter()
+    atenciones = generar_archivo(ruta, pacientes, semilla=SEMILLA)
+    generacion = time.perf_counter() - inicio
+
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--medir", ruta],
+        capture_output=True, text=True, check=True
+    ).stdout
+    resultado = json.loads(salida.strip().splitlines()[-1])
+    resultado.update({
+        "pacientes": pacientes,
+        "atenciones": atenciones,
+        "tamano_mb": os.path.getsize(ruta) / (1024 * 1024),
+        "generacion_segundos": generacion,
+    })
+    for sobrante in (ruta, GestorDatos._ruta_sello(ruta)):
+        os.remove(sobrante)
+    return resultado
+
+
+def _formato(segundos):
+    if segundos < 1e-3:
+        return f"{segundos * 1e6:.1f} us"
+    if segundos < 1:
+        return f"{segundos * 1e3:.1f} ms"
+    return f"{segundos:.2f} s"
+
+
+def imprimir(resultado):
+    for escala, datos in resultado["escalas"].items():
+        print(
+            f"\n{escala} pacientes, {datos['atenciones']} atenciones ({datos['tamano_mb']:.1f} MB) | "
+            f"RSS tras cargar {datos['carga_mb']:.0f} MB, pico {datos['pico_mb']:.0f} MB"
+        )
+        for operacion, segundos in datos["segundos"].items():
+            print(f"  {operacion:>28}: {_formato(segundos)}")
+
+
+def comparar(anterior, actual, umbral):
+    # Solo las escalas y operaciones presentes en ambas corridas
+    regresiones = []
+    print(f"\n{'Escala':>9} | {'Operacion':>28} | {'Anterior':>10} | {'Actual':>10} | {'Cambio':>7}")
+    print("-" * 78)
+    for escala, datos in actual["escalas"].items():
+        base = anterior["escalas"].get(escala)
+        if base is None:
+            continue
+        for operacion, segundos in datos["segundos"].items():
+            previo = base["segundos"].get(operacion)
+            if not previo:
+                continue
+            cambio = segundos / previo - 1
+            marca = "  <- REGRESION" if cambio > umbral else ""
+            if marca:
+                regresiones.append((escala, operacion))
+            print(
+                f"{escala:>9} | {operacion:>28} | {_formato(previo):>10} | {_formato(segundos):>10} | "
+                f"{cambio:>+7.0%}{marca}"
+            )
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de rendimiento del sistema de triaje.")
+    parser.add_argument("--escalas", type=int, nargs="+", default=ESCALAS)
+    parser.add_argument("--salida", help="Archivo JSON del resultado (por defecto en benchmarks/resultados/)")
+    parser.add_argument("--comparar", metavar="ANTERIOR", help="Resultado JSON de una corrida anterior")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento tolerado al comparar (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+
+    resultado = {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "procesadores": os.cpu_count(),
+        "semilla": SEMILLA,
+        "escalas": {},
+    }
+    with tempfile.TemporaryDirectory() as carpeta:
+        for pacientes in args.escalas:
+            print(f"[SISTEMA] Midiendo {pacientes} pacientes...", flush=True)
+            resultado["escalas"][str(pacientes)] = correr_escala(carpeta, pacientes)
+
+    salida = args.salida
+    if salida is None:
+        os.makedirs(CARPETA_RESULTADOS, exist_ok=True)
+        salida = os.path.join(CARPETA_RESULTADOS, f"suite-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2)
+
+    imprimir(resultado)
+    print(f"\n[SISTEMA] Resultado guardado en {salida}")
+
+    if anterior is not None and comparar(anterior, resultado, args.umbral):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--medir":
+        print(json.dumps(medir_escala(sys.argv[2])))
+    else:
+        main()
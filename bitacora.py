@@ -0,0 +1,102 @@
+import json
+import os
+
+import metricas
+
+
+class Bitacora:
+
+    # Registro de solo-anexado (una linea JSON por registro) que acompaña al
+    # archivo principal. La primera linea guarda la firma del archivo sobre el
+    # que se escribio, para descartar la bitacora si ese archivo ya cambio.
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    @staticmethod
+    def ruta_para(archivo):
+        return archivo + ".bitacora"
+
+    def tamano(self):
+        try:
+            return os.path.getsize(self.ruta)
+        except FileNotFoundError:
+            return 0
+
+    def _recortar_linea_incompleta(self):
+        # Un corte a mitad de una escritura deja la ultima linea sin "\n" (y
+        # sin confirmar): se recorta para que lo siguiente no quede pegado a ella
+        try:
+            with open(self.ruta, "rb+") as f:
+                fin = f.seek(0, os.SEEK_END)
+                if fin == 0:
+                    return
+                f.seek(fin - 1)
+                if f.read(1) == b"\n":
+                    return
+
+                posicion = fin
+                while posicion > 0:
+                    desde = max(0, posicion - 4096)
+                    f.seek(desde)
+                    salto = f.read(posicion - desde).rfind(b"\n")
+                    if salto != -1:
+                        posicion = desde + salto + 1
+                        break
+                    posicion = desde
+                f.truncate(posicion)
+                f.flush()
+                os.fsync(f.fileno())
+        except FileNotFoundError:
+            pass
+
+    def agregar(self, registros, base):
+        self._recortar_linea_incompleta()
+        lineas = []
+        if self.tamano() == 0:
+            lineas.append(json.dumps({"tipo": "base", "firma": base}))
+        lineas.extend(json.dumps(r) for r in registros)
+
+        texto = "\n".join(lineas) + "\n"
+        with open(self.ruta, "a", encoding="utf-8") as f:
+            f.write(texto)
+            f.flush()
+            os.fsync(f.fileno())
+        # json.dumps escapa lo que no es ASCII: un caracter por byte
+        metricas.contar("bitacora.bytes_escritos", len(texto))
+
+    def leer(self):
+        base = None
+        registros = []
+
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        registro = json.loads(linea)
+                    except json.JSONDecodeError:
+                        # Linea incompleta por un corte durante la escritura:
+                        # las siguientes se escribieron despues y valen
+                        continue
+
+                    if registro.get("tipo") == "base":
+                        base = registro.get("firma")
+                    else:
+                        registros.append(registro)
+        except FileNotFoundError:
+            pass
+
+        return base, registros
+
+    def vaciar(self):
+        try:
+            os.remove(self.ruta)
+        except FileNotFoundError:
+            pass
+
+    def descartar(self):
+        # Se conserva aparte por si hace falta revisarla a mano
+        try:
+            os.replace(self.ruta, self.ruta + ".descartada")
+        except FileNotFoundError:
+            pass
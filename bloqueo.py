@@ -0,0 +1,73 @@
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+class BloqueoArchivo:
+
+    # Bloqueo consultivo entre procesos sobre <archivo>.lock. Solo protege
+    # frente a otros procesos que tambien lo usen (todas las escrituras de
+    # GestorDatos pasan por AlmacenJson, que lo toma). No es reentrante.
+
+    ESPERA_WINDOWS = 0.05
+
+    def __init__(self, archivo, compartido=False):
+        self.ruta = self.ruta_para(archivo)
+        self.compartido = compartido
+        self._archivo = None
+
+    @staticmethod
+    def ruta_para(archivo):
+        return archivo + ".lock"
+
+    def __enter__(self):
+        self._archivo = open(self.ruta, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._archivo.fileno(), fcntl.LOCK_SH if self.compartido else fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                # Windows no tiene bloqueo compartido: siempre exclusivo, y
+                # LK_LOCK solo reintenta unos segundos antes de fallar
+                self._archivo.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._archivo.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(self.ESPERA_WINDOWS)
+        except BaseException:
+            self._archivo.close()
+            raise
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._archivo.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self._archivo.seek(0)
+                msvcrt.locking(self._archivo.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._archivo.close()
+            self._archivo = None
+        return False
+
+
+def reemplazar_atomico(ruta, contenido):
+    # Escribe en un temporal junto al destino y lo renombra encima: quien lea
+    # ve el archivo anterior completo o el nuevo completo, nunca uno a medias
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8", newline="") as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
@@ -0,0 +1,287 @@
+import argparse
+import json
+import sys
+import time
+
+import config
+import fragmentacion
+from almacenamiento import crear_almacen
+from historial import formato_fecha, inicio_turno
+from indices import ColaUrgencias, EstadisticasIncrementales
+from modelo import ValidadorDni, DniInvalidoException, DniDuplicadoException
+
+# Modo sin menu: cada comando responde una consulta y termina. No importa la
+# Vista (tabulate) ni carga el historial completo: usa las consultas directas
+# del almacen, que en JSON recorren el archivo de a un paciente.
+
+
+def _imprimir_json(datos):
+    json.dump(datos, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+def _error(mensaje):
+    print(f"[ERROR] {mensaje}", file=sys.stderr)
+
+
+def _resumen_paciente(paciente):
+    atencion = paciente.obtener_ultima_atencion()
+    nivel = atencion.nivel_atencion.upper() if atencion else "SIN ATENCIÓN"
+    return f"{paciente.dni} | {paciente.nombre} | {paciente.edad} años | {paciente.sexo} | {nivel}"
+
+
+def comando_lookup(almacen, args):
+    try:
+        dni = ValidadorDni.validar(args.dni)
+    except DniInvalidoException as e:
+        _error(e)
+        return 2
+
+    paciente = almacen.consultar_dni(dni)
+    if paciente is None:
+        _error(f"No se encontró paciente con DNI {dni}.")
+        return 1
+
+    if args.json:
+        _imprimir_json(paciente.to_dict())
+    else:
+        print(_resumen_paciente(paciente))
+        print(f"Atenciones registradas: {len(paciente.obtener_atenciones())}")
+    return 0
+
+
+def comando_urgentes(almacen, args):
+    cola = ColaUrgencias()
+    urgentes = {}
+    for p in almacen.consultar_urgentes():
+        cola.actualizar(p.dni, p.obtener_ultima_atencion())
+        urgentes[p.dni] = p
+
+    orden = [urgentes[dni] for dni in cola.primeros(args.limite)]
+
+    if args.json:
+        _imprimir_json({
+            "total": len(urgentes),
+            "pacientes": [
+                {
+                    "dni": p.dni,
+                    "nombre": p.nombre,
+                    "edad": p.edad,
+                    "sexo": p.sexo,
+                    "puntaje": cola.puntaje(p.dni),
+                    "atencion": p.obtener_ultima_atencion().to_dict()
+                }
+                for p in orden
+            ]
+        })
+        return 0
+
+    for posicion, p in enumerate(orden, start=1):
+        print(f"{posicion}. {_resumen_paciente(p)} | puntaje {cola.puntaje(p.dni)}")
+    print(f"Total urgentes: {len(urgentes)}")
+    return 0
+
+
+def comando_stats(almacen, args):
+    stats = EstadisticasIncrementales.desde_pacientes(almacen.consultar_pacientes()).resumen()
+
+    if args.json:
+        _imprimir_json(stats)
+        return 0
+
+    print(f"Total Pacientes: {stats['total']}")
+    print(f"Edad Promedio: {stats['promedio_edad']} años")
+    for nivel, cantidad in stats["por_atencion"].items():
+        print(f"Atención {nivel}: {cantidad}")
+    for clasificacion, cantidad in stats["por_imc"].items():
+        print(f"IMC {clasificacion}: {cantidad}")
+    return 0
+
+
+def comando_recientes(almacen, args):
+    ahora = int(time.time())
+    if args.turno:
+        desde = inicio_turno(ahora, config.INICIO_TURNOS)
+    else:
+        desde = ahora - int(args.horas * 3600)
+
+    encontradas = list(almacen.atenciones_entre(desde, ahora + 1, args.urgentes))
+    total = len(encontradas)
+    if args.limite is not None:
+        # Las mas recientes
+        encontradas = encontradas[-args.limite:] if args.limite > 0 else []
+
+    if args.json:
+        _imprimir_json({
+            "desde": formato_fecha(desde),
+            "total": total,
+            "atenciones": [
+                {"dni": p.dni, "nombre": p.nombre, "fecha": formato_fecha(a.fecha_registro), "atencion": a.to_dict()}
+                for p, a in encontradas
+            ]
+        })
+        return 0
+
+    for p, a in encontradas:
+        print(f"{formato_fecha(a.fecha_registro)} | {p.dni} | {p.nombre} | {p.edad} años | {a.nivel_atencion.upper()}")
+    print(f"Total desde {formato_fecha(desde)}: {total}")
+    return 0
+
+
+def comando_register(almacen, args):
+    # Mismo formato y validacion que una fila de importador.py
+    from importador import Importador, validar_lote
+
+    try:
+        if args.from_json == "-":
+            filas = json.load(sys.stdin)
+        else:
+            with open(args.from_json, "r", encoding="utf-8") as f:
+                filas = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        _error(f"No se pudo leer {args.from_json}: {e}")
+        return 2
+
+    if not isinstance(filas, list):
+        filas = [filas]
+
+    try:
+        cambios, rechazadas = Importador(almacen, procesos=1).guardar_lote(
+            validar_lote(list(enumerate(filas, start=1)))
+        )
+    except (DniDuplicadoException, OSError) as e:
+        _error(e)
+        return 1
+
+    for numero, _, motivo in rechazadas:
+        _error(f"Registro {numero} rechazado: {motivo}")
+
+    if args.json:
+        _imprimir_json([
+            {"dni": p.dni, "nuevo": es_nuevo, "nivel_atencion": a.nivel_atencion}
+            for p, a, es_nuevo in cambios
+        ])
+    else:
+        for p, a, _ in cambios:
+            print(f"[SISTEMA] Atención registrada para {p.nombre}. Nivel de atención: {a.nivel_atencion.upper()}")
+
+    return 1 if rechazadas else 0
+
+
+def _archivos_historial():
+    # El archivo de datos, o todos sus fragmentos
+    manifiesto = fragmentacion.leer_manifiesto(config.ARCHIVO_DB)
+    if manifiesto is None:
+        return [config.ARCHIVO_DB]
+    return fragmentacion.rutas_fragmentos(config.ARCHIVO_DB, manifiesto)
+
+
+ORIGENES_HALLAZGO = {"bitacora": "en la bitácora", "historico": "en el archivo histórico"}
+
+
+def _describir_hallazgo(h):
+    lugar = f"DNI {h['dni']}" if h["dni"] is not None else "Registro"
+    if h["atencion"] is not None:
+        lugar += f", atención {h['atencion'] + 1}"
+    if "origen" in h:
+        lugar += f" {ORIGENES_HALLAZGO[h['origen']]}"
+    if "motivo" in h:
+        return f"{lugar}: {h['tipo']} ({h['motivo']})"
+    return f"{lugar}: {h['tipo']} guardado {h['guardado']}, calculado {h['calculado']}"
+
+
+def comando_audit(almacen, args):
+    # No abre el almacen: lee los archivos directamente (tambien con DNIs duplicados)
+    import auditoria
+
+    if config.ALMACEN != "json":
+        _error("La auditoría revisa el historial JSON (ALMACEN = \"json\").")
+        return 2
+    try:
+        informe = auditoria.auditar(_archivos_historial(), args.procesos, args.limite)
+    except (OSError, ValueError) as e:
+        _error(e)
+        return 2
+    problemas = bool(informe["resumen"])
+
+    if args.json:
+        _imprimir_json(informe)
+        return 1 if problemas else 0
+
+    print(f"[SISTEMA] Pacientes auditados: {informe['pacientes']} ({informe['atenciones']} atenciones) "
+          f"en {informe['segundos']:.1f} s con {informe['procesos']} procesos")
+    if not problemas:
+        print("[SISTEMA] Sin diferencias: todos los registros son válidos y coinciden con lo recalculado.")
+        return 0
+
+    for tipo, cantidad in informe["resumen"].items():
+        print(f"[SISTEMA] {tipo}: {cantidad}")
+    for d in informe["dnis_duplicados"]:
+        print(f"  - DNI {d['dni']} repetido {d['veces']} veces")
+    for h in informe["hallazgos"]:
+        print(f"  - {_describir_hallazgo(h)}")
+    if len(informe["hallazgos"]) < sum(informe["resumen"].values()) - len(informe["dnis_duplicados"]):
+        print(f"  ... (se muestran los primeros {args.limite}; el informe completo con --limite mayor y --json)")
+    return 1
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Consultas y registros sin el menú interactivo."
+    )
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    lookup = comandos.add_parser("lookup", help="Ficha de un paciente por DNI")
+    lookup.add_argument("dni")
+    lookup.add_argument("--json", action="store_true", help="Historial completo en JSON")
+    lookup.set_defaults(funcion=comando_lookup)
+
+    urgentes = comandos.add_parser("urgentes", help="Urgentes por prioridad")
+    urgentes.add_argument("--json", action="store_true")
+    urgentes.add_argument("--limite", type=int, default=None, help="Solo los N primeros")
+    urgentes.set_defaults(funcion=comando_urgentes)
+
+    stats = comandos.add_parser("stats", help="Estadísticas generales")
+    stats.add_argument("--json", action="store_true")
+    stats.set_defaults(funcion=comando_stats)
+
+    recientes = comandos.add_parser("recientes", help="Atenciones de las últimas horas o del turno")
+    periodo = recientes.add_mutually_exclusive_group(required=True)
+    periodo.add_argument("--horas", type=float, help="Últimas N horas")
+    periodo.add_argument("--turno", action="store_true", help="Desde el inicio del turno en curso")
+    recientes.add_argument("--urgentes", action="store_true", help="Solo atenciones urgentes")
+    recientes.add_argument("--json", action="store_true")
+    recientes.add_argument("--limite", type=int, default=None, help="Solo las N más recientes")
+    recientes.set_defaults(funcion=comando_recientes)
+
+    register = comandos.add_parser("register", help="Registrar atenciones desde un archivo JSON")
+    register.add_argument("--from-json", required=True, metavar="ARCHIVO", help="Objeto o lista de objetos; '-' para stdin")
+    register.add_argument("--json", action="store_true")
+    register.set_defaults(funcion=comando_register)
+
+    audit = comandos.add_parser("audit", help="Auditoría de integridad del historial (validaciones, IMC y triaje)")
+    audit.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, uno por núcleo)")
+    audit.add_argument("--limite", type=int, default=100, help="Hallazgos con detalle (los demás solo se cuentan)")
+    audit.add_argument("--json", action="store_true", help="Informe completo en JSON")
+    audit.set_defaults(funcion=comando_audit, abrir_almacen=False)
+
+    return parser
+
+
+def ejecutar_comando(argumentos):
+    args = crear_parser().parse_args(argumentos)
+    if not getattr(args, "abrir_almacen", True):
+        return args.funcion(None, args)
+
+    almacen = crear_almacen()
+    try:
+        almacen.abrir()
+    except DniDuplicadoException as e:
+        _error(f"El historial contiene DNIs duplicados: {e}")
+        return 1
+
+    try:
+        return args.funcion(almacen, args)
+    finally:
+        almacen.cerrar()
@@ -1,11 +1,121 @@
 import os
 
 CARPETA_BASE = os.path.dirname(os.path.abspath(__file__))
+# Con extension .bin el historial se guarda como instantanea binaria
+# (instantanea.py); para convertir: python instantanea.py datos.json datos.bin
 ARCHIVO_DB = os.path.join(CARPETA_BASE, "datos.json")
 
+# Almacen de datos: "json" (ARCHIVO_DB) o "sqlite" (ARCHIVO_SQLITE)
+ALMACEN = "json"
+ARCHIVO_SQLITE = os.path.join(CARPETA_BASE, "datos.db")
+
+# Modo de memoria compacta: el historial de atenciones se guarda en
+# arreglos tipados (historial.py) en lugar de un objeto por atencion
+HISTORIAL_COLUMNAR = False
+
+# Cada registro se anexa a una bitacora junto a ARCHIVO_DB; al superar el
+# umbral (en bytes) se vuelca al archivo principal
+USAR_BITACORA = True
+UMBRAL_COMPACTACION_BITACORA = 1024 * 1024
+
+# Cuando se guarda cada registro (almacen JSON):
+#   "inmediato": antes de volver al menu
+#   "diferido":  un hilo guarda VENTANA_GUARDADO segundos despues del
+#                ultimo registro, juntando los que lleguen seguidos
+#   "periodico": un hilo guarda cada PERIODO_GUARDADO segundos si hubo cambios
+# Salir (u otra salida ordenada: Ctrl+C, SIGTERM) guarda lo pendiente
+DURABILIDAD = "inmediato"
+VENTANA_GUARDADO = 0.5
+PERIODO_GUARDADO = 5.0
+
+# Historial fragmentado por DNI (fragmentacion.py): con FRAGMENTOS > 0,
+# ARCHIVO_DB se reparte en esa cantidad de archivos la primera vez y cada
+# registro solo escribe en el de su paciente. Los fragmentos se cargan en
+# HILOS_CARGA hilos (None: uno por procesador). Para cambiar la cantidad de
+# un historial ya fragmentado: python fragmentacion.py datos.json N
+FRAGMENTOS = 0
+HILOS_CARGA = None
+
+# Archivo historico (historico.py): con DIAS_HISTORICO, al iniciar (como
+# mucho una vez por dia) las atenciones con mas de esos dias pasan a
+# segmentos comprimidos ("gzip" o "lzma") y solo se leen al ver el
+# historial del paciente. None: todo el historial queda en ARCHIVO_DB
+DIAS_HISTORICO = None
+COMPRESION_HISTORICO = "gzip"
+
+# Modo de memoria acotada (almacen JSON): con MEMORIA_ACOTADA_MB el
+# historial no se carga entero; cada paciente se lee de ARCHIVO_DB cuando
+# se pide (con un indice de posiciones junto al archivo, datos.json.idx) y
+# los ya leidos se guardan en una cache de la mitad de ese presupuesto.
+# Registra siempre en la bitacora y de inmediato; no se combina con
+# FRAGMENTOS ni con DIAS_HISTORICO. None: todo el historial en memoria
+MEMORIA_ACOTADA_MB = None
+
+# Servicio compartido (servicio.py): con USAR_SERVICIO cada puesto trabaja
+# contra el registro del servicio en lugar de cargar su propia copia.
+# Direccion "host:puerto" o "unix:/ruta/al/socket"
+USAR_SERVICIO = False
+DIRECCION_SERVICIO = "127.0.0.1:8765"
+
+# Reglas de triaje (reglas.py). Cada grupo cubre una franja de edad y lista
+# sus niveles en orden de prioridad: gana el primero con alguna condicion
+# cumplida y, si ninguna se cumple, queda "por_defecto". Una condicion es
+# [signo, operador, valor], con signo presion, frecuencia, saturacion o
+# conciencia y operador <, <=, >, >=, == o !=. Con ARCHIVO_REGLAS (un JSON
+# con la misma forma) las reglas se leen de ese archivo y se recargan si
+# cambia mientras el sistema esta abierto
+REGLAS_TRIAJE = {
+    "grupos": [
+        {
+            "nombre": "Estandar", "edad_desde": 0, "edad_hasta": 64,
+            "niveles": [
+                {"nivel": "Urgente", "si_alguna": [
+                    ["presion", "<", 90], ["presion", ">", 180],
+                    ["frecuencia", ">", 100],
+                    ["saturacion", "<", 92],
+                    ["conciencia", "!=", "Alerta"],
+                ]},
+            ],
+            "por_defecto": "Normal",
+        },
+        {
+            "nombre": "Adulto mayor", "edad_desde": 65, "edad_hasta": None,
+            "niveles": [
+                {"nivel": "Urgente", "si_alguna": [
+                    ["presion", "<", 100], ["presion", ">", 160],
+                    ["frecuencia", "<", 55], ["frecuencia", ">", 110],
+                    ["saturacion", "<", 94],
+                    ["conciencia", "!=", "Alerta"],
+                ]},
+            ],
+            "por_defecto": "Normal",
+        },
+    ],
+}
+ARCHIVO_REGLAS = None
+
+# Metricas de latencia por operacion (metricas.py): se exportan a
+# ARCHIVO_METRICAS (texto de Prometheus, o JSON si termina en .json) cada
+# PERIODO_METRICAS segundos y al salir. PERFILAR_OPERACION (por ejemplo
+# "controlador.listar_pacientes") guarda un perfil de cProfile de la
+# proxima vez que corra esa operacion
+METRICAS = False
+ARCHIVO_METRICAS = os.path.join(CARPETA_BASE, "metricas.prom")
+PERIODO_METRICAS = 60.0
+PERFILAR_OPERACION = None
+
+# Hora local de inicio de cada turno (main.py recientes --turno)
+INICIO_TURNOS = [7, 15, 23]
+
 ENCABEZADOS_TABLA = [
     "DNI", "Nombre", "Edad", "Sexo", "Peso (Kg)", "Talla (cm)", "IMC", "Clasificacion", "Presion", "Saturacion", "Atencion"
 ]
 
+# Listados: mas de TAMANO_PAGINA filas se muestran por paginas con el
+# renderizador de ancho fijo ("auto"); "fijo" lo usa siempre
+TAMANO_PAGINA = 20
+MUESTRA_ANCHOS_TABLA = 200
+RENDERIZADOR_TABLAS = "auto"
+
 MSG_BIENVENIDA = "🏥 SISTEMA DE GESTION DE TRIAJE  - CLINICA SANTA MARIA"
 MSG_DESPEDIDA = "✅ Datos guardados correctamente, ¡Gracias por utilizar el sistema! "
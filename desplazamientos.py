@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import struct
+import zlib
+from collections import OrderedDict
+
+from modelo import GestorDatos, DniDuplicadoException
+
+# Indice de desplazamientos de datos.json (modo de memoria acotada): para
+# cada DNI, donde empieza su registro en el archivo y cuantos bytes ocupa.
+# Vive junto al archivo (datos.json.idx) como una tabla hash de ranuras de
+# ancho fijo: buscar un DNI lee una o dos ranuras y la tabla nunca pasa a la
+# memoria del proceso. Se lee con seek y no con mmap: las paginas mapeadas
+# que se tocan cuentan como memoria del proceso y crecerian con el archivo.
+# Todo en little-endian:
+#
+#   cabecera  MAGIA, tamano y mtime del archivo que indexa, ranuras,
+#             pacientes y si el archivo coincidia con su sello
+#   ranuras   (dni, inicio, longitud); un dni en ceros es una ranura libre
+
+MAGIA = b"TRIAJEDX"
+CABECERA = struct.Struct("<8sQQQQB")
+ENTRADA = struct.Struct("<8sQI")
+LIBRE = bytes(8)
+# Ocupacion maxima de la tabla antes de duplicarla
+OCUPACION_MAXIMA = 0.6
+# Bytes de archivo por ranura al empezar (un paciente ocupa bastante mas)
+BYTES_POR_RANURA = 256
+# Memoria de un paciente construido por cada byte de su registro en el
+# archivo (medido con tracemalloc; solo se construye la ultima atencion)
+FACTOR_MEMORIA = 2
+
+
+def ruta_para(archivo):
+    return archivo + ".idx"
+
+
+def _reparar(valor):
+    # Textos leidos como latin-1 de un archivo UTF-8 (ver iterar_registros)
+    if isinstance(valor, str):
+        return valor if valor.isascii() else valor.encode("latin-1").decode("utf-8")
+    if isinstance(valor, dict):
+        return {clave: _reparar(v) for clave, v in valor.items()}
+    if isinstance(valor, list):
+        return [_reparar(v) for v in valor]
+    return valor
+
+
+def iterar_registros(archivo, resumen=None, tamano_bloque=1 << 20):
+    # Como GestorDatos._iterar_registros, con la posicion en bytes de cada
+    # registro: (registro, inicio, longitud). El texto se decodifica como
+    # latin-1 (un caracter por byte) para que las posiciones coincidan con
+    # las del archivo; si un registro trae caracteres no ASCII se corrige.
+    # Con resumen (hashlib) tambien se calcula el resumen del archivo.
+    decodificador = json.JSONDecoder()
+
+    with open(archivo, "rb") as f:
+        def leer():
+            bloque = f.read(tamano_bloque)
+            if resumen is not None:
+                resumen.update(bloque)
+            return bloque.decode("latin-1")
+
+        buffer = leer()
+        base = 0
+        pos = 0
+        fin_archivo = not buffer
+        esperando_inicio = True
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+
+            if pos >= len(buffer):
+                if fin_archivo:
+                    raise json.JSONDecodeError("Fin de archivo inesperado", buffer, pos)
+                base += pos
+                buffer = leer()
+                pos = 0
+                fin_archivo = not buffer
+                continue
+
+            if esperando_inicio:
+                if buffer[pos] != "[":
+                    raise json.JSONDecodeError("Se esperaba un arreglo de pacientes", buffer, pos)
+                esperando_inicio = False
+                pos += 1
+                continue
+
+            if buffer[pos] == "]":
+                while resumen is not None and leer():
+                    pass
+                return
+
+            try:
+                registro, fin = decodificador.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Registro partido entre dos bloques: leer mas y reintentar
+                bloque = leer()
+                if not bloque:
+                    raise
+                base += pos
+                buffer = buffer[pos:] + bloque
+                pos = 0
+                continue
+
+            if not buffer[pos:fin].isascii():
+                registro = _reparar(registro)
+            yield registro, base + pos, fin - pos
+            pos = fin
+
+
+def _sondear(f, ranuras, clave):
+    # Posicion y contenido de la ranura con clave, o de la libre donde iria
+    ranura = zlib.crc32(clave) % ranuras
+    while True:
+        posicion = CABECERA.size + ranura * ENTRADA.size
+        f.seek(posicion)
+        entrada = f.read(ENTRADA.size)
+        if entrada[:8] == clave or entrada[:8] == LIBRE:
+            return posicion, entrada
+        ranura = (ranura + 1) % ranuras
+
+
+class IndiceDesplazamientos:
+
+    def __init__(self, f, ranuras, cantidad, confiable):
+        self._archivo = f
+        self.ranuras = ranuras
+        self.cantidad = cantidad
+        # El archivo coincidia con su sello al indexarlo
+        self.confiable = confiable
+
+    def __len__(self):
+        return self.cantidad
+
+    @classmethod
+    def abrir(cls, archivo):
+        # None si no hay indice o si es de otra version del archivo de datos
+        firma = GestorDatos._firma_archivo(archivo)
+        try:
+            f = open(ruta_para(archivo), "rb", buffering=0)
+        except FileNotFoundError:
+            return None
+
+        cabecera = f.read(CABECERA.size)
+        if firma is not None and len(cabecera) == CABECERA.size:
+            magia, tamano, mtime_ns, ranuras, cantidad, confiable = CABECERA.unpack(cabecera)
+            if (magia == MAGIA and (tamano, mtime_ns) == (firma["tamano"], firma["mtime_ns"])
+                    and os.fstat(f.fileno()).st_size == CABECERA.size + ranuras * ENTRADA.size):
+                return cls(f, ranuras, cantidad, bool(confiable))
+        f.close()
+        return None
+
+    def buscar(self, dni):
+        # (inicio, longitud) del registro, o None
+        _, entrada = _sondear(self._archivo, self.ranuras, dni.encode("ascii"))
+        clave, inicio, longitud = ENTRADA.unpack(entrada)
+        return None if clave == LIBRE else (inicio, longitud)
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+class ConstructorIndice:
+
+    # Arma el indice en un temporal y lo publica con terminar()
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.temporal = ruta_para(archivo) + ".tmp"
+        self.cantidad = 0
+        tamano = GestorDatos._firma_archivo(archivo)["tamano"]
+        self._crear(max(16, tamano // BYTES_POR_RANURA))
+
+    def _crear(self, ranuras):
+        self.ranuras = ranuras
+        self._archivo = open(self.temporal, "wb+")
+        self._archivo.truncate(CABECERA.size + ranuras * ENTRADA.size)
+
+    def agregar(self, dni, inicio, longitud):
+        clave = dni.encode("ascii")
+        posicion, entrada = _sondear(self._archivo, self.ranuras, clave)
+        if entrada[:8] == clave:
+            raise DniDuplicadoException(f"El DNI {dni} aparece más de una vez en {self.archivo}.")
+        self._archivo.seek(posicion)
+        self._archivo.write(ENTRADA.pack(clave, inicio, longitud))
+        self.cantidad += 1
+        if self.cantidad > self.ranuras * OCUPACION_MAXIMA:
+            self._duplicar()
+
+    def _duplicar(self):
+        anterior, ranuras = self._archivo, self.ranuras
+        os.replace(self.temporal, self.temporal + ".anterior")
+        self._crear(ranuras * 2)
+        anterior.seek(CABECERA.size)
+        for _ in range(ranuras):
+            entrada = anterior.read(ENTRADA.size)
+            if entrada[:8] != LIBRE:
+                posicion, _ = _sondear(self._archivo, self.ranuras, entrada[:8])
+                self._archivo.seek(posicion)
+                self._archivo.write(entrada)
+        anterior.close()
+        os.remove(self.temporal + ".anterior")
+
+    def terminar(self, firma, confiable):
+        self._archivo.seek(0)
+        self._archivo.write(CABECERA.pack(
+            MAGIA, firma["tamano"], firma["mtime_ns"], self.ranuras, self.cantidad, int(confiable)
+        ))
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._archivo.close()
+        os.replace(self.temporal, ruta_para(self.archivo))
+
+    def descartar(self):
+        self._archivo.close()
+        os.remove(self.temporal)
+
+
+def indexar(archivo):
+    # Recorre el archivo y publica su indice; de paso verifica el sello, que
+    # vale para todas las lecturas hasta que el archivo cambie
+    firma = GestorDatos._firma_archivo(archivo)
+    constructor = ConstructorIndice(archivo)
+    resumen = hashlib.sha256()
+    try:
+        for d, inicio, longitud in iterar_registros(archivo, resumen):
+            constructor.agregar(d["dni"], inicio, longitud)
+    except BaseException:
+        constructor.descartar()
+        raise
+
+    sello = GestorDatos._leer_sello(archivo)
+    confiable = (sello is not None and sello.get("formato") == GestorDatos.FORMATO_VERSION
+                 and sello.get("sha256") == resumen.hexdigest())
+    constructor.terminar(firma, confiable)
+    return IndiceDesplazamientos.abrir(archivo)
+
+
+class CachePacientes:
+
+    # Pacientes ya construidos hasta un presupuesto de bytes (estimado por
+    # el largo de su registro); al pasarse se descartan los usados hace mas
+    # tiempo
+
+    def __init__(self, presupuesto):
+        self.presupuesto = presupuesto
+        self.usado = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._pacientes = OrderedDict()
+
+    def __len__(self):
+        return len(self._pacientes)
+
+    def __contains__(self, dni):
+        return dni in self._pacientes
+
+    def obtener(self, dni):
+        entrada = self._pacientes.get(dni)
+        if entrada is None:
+            self.fallos += 1
+            return None
+        self._pacientes.move_to_end(dni)
+        self.aciertos += 1
+        return entrada[0]
+
+    def ver(self, dni):
+        # Sin contar ni renovar el uso (recorridos completos)
+        entrada = self._pacientes.get(dni)
+        return None if entrada is None else entrada[0]
+
+    def guardar(self, dni, paciente, costo):
+        anterior = self._pacientes.pop(dni, None)
+        if anterior is not None:
+            self.usado -= anterior[1]
+        self._pacientes[dni] = (paciente, costo)
+        self.usado += costo
+        while self.usado > self.presupuesto and len(self._pacientes) > 1:
+            _, (_, costo_descartado) = self._pacientes.popitem(last=False)
+            self.usado -= costo_descartado
+
+    def vaciar(self):
+        self._pacientes.clear()
+        self.usado = 0
@@ -0,0 +1,122 @@
+import threading
+import time
+
+
+class EscritorDiferido:
+
+    # Hilo de guardado en segundo plano. Quien registra solo llama a avisar()
+    # y sigue; el hilo junta los avisos y llama a guardar() una vez:
+    #   "diferido":  cuando pasa `ventana` s sin avisos nuevos (como maximo
+    #                MAXIMO_VENTANAS ventanas desde el primero)
+    #   "periodico": cada `periodo` s, si hubo avisos
+
+    MODOS = ("diferido", "periodico")
+    MAXIMO_VENTANAS = 4
+    # Tras un guardado fallido (p. ej. disco lleno) el hilo espera antes de
+    # reintentar, el doble cada vez, en lugar de reintentar enseguida
+    REINTENTO_INICIAL = 0.5
+    REINTENTO_MAXIMO = 30.0
+
+    def __init__(self, guardar, modo="diferido", ventana=0.5, periodo=5.0):
+        if modo not in self.MODOS:
+            raise ValueError(f"Modo de guardado desconocido: {modo}")
+
+        self._guardar = guardar
+        self.modo = modo
+        self.ventana = ventana
+        self.periodo = periodo
+        self.guardados = 0
+
+        self._condicion = threading.Condition()
+        self._guardando = threading.Lock()
+        self._sucio = False
+        self._primer_aviso = 0.0
+        self._ultimo_aviso = 0.0
+        self._espera_reintento = 0.0
+        self._reintentar_desde = 0.0
+        self._detenido = False
+
+        self._hilo = threading.Thread(target=self._ejecutar, name="escritor-diferido", daemon=True)
+        self._hilo.start()
+
+    def avisar(self):
+        with self._condicion:
+            ahora = time.monotonic()
+            if not self._sucio:
+                self._primer_aviso = ahora
+            self._sucio = True
+            self._ultimo_aviso = ahora
+            self._condicion.notify()
+
+    def vaciar(self):
+        # Guarda ya lo pendiente, en el hilo de quien llama
+        return self._guardar_pendiente()
+
+    def detener(self):
+        with self._condicion:
+            self._detenido = True
+            self._condicion.notify()
+        self._hilo.join()
+        return self._guardar_pendiente()
+
+    def _ejecutar(self):
+        while True:
+            with self._condicion:
+                if self.modo == "diferido":
+                    self._esperar_ventana()
+                else:
+                    self._esperar_periodo()
+                if self._detenido:
+                    return
+            self._guardar_pendiente()
+
+    def _esperar_ventana(self):
+        while not self._sucio and not self._detenido:
+            self._condicion.wait()
+
+        while not self._detenido:
+            limite = max(self._reintentar_desde, min(
+                self._ultimo_aviso + self.ventana,
+                self._primer_aviso + self.ventana * self.MAXIMO_VENTANAS
+            ))
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return
+            self._condicion.wait(restante)
+
+    def _esperar_periodo(self):
+        limite = time.monotonic() + self.periodo
+        while not self._detenido:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                if self._sucio:
+                    return
+                limite += self.periodo
+                continue
+            self._condicion.wait(restante)
+
+    def _guardar_pendiente(self):
+        with self._guardando:
+            with self._condicion:
+                if not self._sucio:
+                    return True
+                # Los avisos que lleguen mientras se guarda marcan de nuevo
+                self._sucio = False
+
+            try:
+                guardado = self._guardar()
+            except Exception as e:
+                guardado = False
+                print(f"[ERROR] Falló el guardado en segundo plano: {e}")
+
+            with self._condicion:
+                if not guardado:
+                    self._sucio = True
+                    self._espera_reintento = min(
+                        max(self._espera_reintento * 2, self.REINTENTO_INICIAL), self.REINTENTO_MAXIMO
+                    )
+                    self._reintentar_desde = time.monotonic() + self._espera_reintento
+                else:
+                    self._espera_reintento = 0.0
+                    self.guardados += 1
+            return guardado
@@ -0,0 +1,133 @@
+import json
+import os
+import zlib
+from contextlib import ExitStack
+
+from bitacora import Bitacora
+from bloqueo import BloqueoArchivo, reemplazar_atomico
+from historico import HistoricoAtenciones
+from modelo import GestorDatos
+
+# Historial fragmentado por DNI: en lugar de un solo ARCHIVO_DB, N archivos
+# con el mismo formato (cada uno con su sello, bitacora y bloqueo) y un
+# manifiesto que los enumera. Un registro solo reescribe el fragmento de su
+# paciente. Para pasar de un formato a otro (con el sistema cerrado):
+#   python fragmentacion.py datos.json 16     (0 vuelve a un solo archivo)
+
+FORMATO_MANIFIESTO = 1
+
+
+def ruta_manifiesto(archivo):
+    base, _ = os.path.splitext(archivo)
+    return base + ".fragmentos.json"
+
+
+def fragmento_de(dni, cantidad):
+    # Por hash y no por prefijo: los DNI correlativos de una misma epoca
+    # caerian todos en el mismo fragmento
+    return zlib.crc32(dni.encode("utf-8")) % cantidad
+
+
+def nombres_fragmentos(archivo, cantidad):
+    # La cantidad va en el nombre: al refragmentar, los archivos nuevos no
+    # pisan a los anteriores hasta que el manifiesto apunta a ellos
+    base, extension = os.path.splitext(os.path.basename(archivo))
+    return [f"{base}.{cantidad}-{indice:03d}{extension}" for indice in range(cantidad)]
+
+
+def leer_manifiesto(archivo):
+    # None si el historial no esta fragmentado
+    try:
+        with open(ruta_manifiesto(archivo), "r", encoding="utf-8") as f:
+            manifiesto = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    if (not isinstance(manifiesto, dict) or manifiesto.get("formato") != FORMATO_MANIFIESTO
+            or not isinstance(manifiesto.get("archivos"), list) or not manifiesto["archivos"]
+            or len(manifiesto["archivos"]) != manifiesto.get("fragmentos")):
+        raise ValueError(f"Manifiesto de fragmentos inválido: {ruta_manifiesto(archivo)}")
+    return manifiesto
+
+
+def rutas_fragmentos(archivo, manifiesto):
+    carpeta = os.path.dirname(archivo)
+    return [os.path.join(carpeta, nombre) for nombre in manifiesto["archivos"]]
+
+
+def _borrar(ruta):
+    for archivo in (ruta, GestorDatos._ruta_sello(ruta), Bitacora.ruta_para(ruta), BloqueoArchivo.ruta_para(ruta),
+                    HistoricoAtenciones.ruta_cabecera(ruta)):
+        try:
+            os.remove(archivo)
+        except FileNotFoundError:
+            pass
+
+
+def refragmentar(archivo, cantidad):
+    # Reparte el historial actual (un solo archivo o fragmentos, con sus
+    # bitacoras aplicadas) en cantidad fragmentos; con 0 lo une en archivo.
+    # Con la misma cantidad solo compacta las bitacoras. Devuelve la
+    # cantidad de pacientes.
+    if cantidad < 0:
+        raise ValueError("La cantidad de fragmentos no puede ser negativa.")
+
+    manifiesto = leer_manifiesto(archivo)
+    anteriores = rutas_fragmentos(archivo, manifiesto) if manifiesto else [archivo]
+    carpeta = os.path.dirname(archivo)
+    nuevos = [os.path.join(carpeta, n) for n in nombres_fragmentos(archivo, cantidad)] if cantidad else [archivo]
+    for ruta in anteriores:
+        # El historico esta indexado por archivo: no sigue a los pacientes
+        if HistoricoAtenciones.leer_cabecera(ruta)["segmentos"]:
+            raise ValueError(
+                f"{ruta} tiene atenciones archivadas; restáurelas antes con "
+                f"python historico.py {ruta} --restaurar"
+            )
+
+    with ExitStack() as bloqueos:
+        for ruta in anteriores:
+            bloqueos.enter_context(BloqueoArchivo(ruta))
+
+        repartidos = [[] for _ in nuevos]
+        for ruta in anteriores:
+            for d in GestorDatos._dicts_con_bitacora(ruta):
+                repartidos[fragmento_de(d["dni"], cantidad) if cantidad else 0].append(d)
+
+        for ruta, dicts in zip(nuevos, repartidos):
+            if not GestorDatos._guardar_dicts(ruta, dicts):
+                raise OSError(f"No se pudo escribir el fragmento {ruta}.")
+
+        # El manifiesto es el punto de no retorno: hasta aqui el historial
+        # anterior sigue intacto
+        if cantidad:
+            reemplazar_atomico(ruta_manifiesto(archivo), json.dumps({
+                "formato": FORMATO_MANIFIESTO,
+                "fragmentos": cantidad,
+                "archivos": [os.path.basename(r) for r in nuevos],
+            }, indent=4))
+        elif manifiesto:
+            os.remove(ruta_manifiesto(archivo))
+
+    for ruta in anteriores:
+        if ruta not in nuevos:
+            _borrar(ruta)
+    return sum(len(dicts) for dicts in repartidos)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3 or not sys.argv[2].isdigit():
+        print("Uso: python fragmentacion.py <datos.json> <fragmentos>   (0 = un solo archivo)")
+        sys.exit(1)
+
+    cantidad = int(sys.argv[2])
+    try:
+        pacientes = refragmentar(sys.argv[1], cantidad)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    if cantidad:
+        print(f"[SISTEMA] {pacientes} pacientes repartidos en {cantidad} fragmentos ({ruta_manifiesto(sys.argv[1])}).")
+    else:
+        print(f"[SISTEMA] {pacientes} pacientes reunidos en {sys.argv[1]}.")
@@ -0,0 +1,205 @@
+from array import array
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# Codigos de los campos de texto; el indice es el valor guardado en la columna
+CONCIENCIAS = ["Alerta", "Verbal", "Dolor", "Inconsciente"]
+CLASIFICACIONES_IMC = ["", "Bajo peso", "Normal", "Sobrepeso", "Obesidad", "Error (Talla 0)"]
+NIVELES_ATENCION = ["", "Urgente", "Normal"]
+
+# Las fechas se guardan como segundos desde la epoca Unix; el texto con
+# FORMATO_FECHA (hora local, al minuto) solo se usa para mostrarlas y al
+# leer archivos anteriores que las guardaban asi
+FORMATO_FECHA = "%d-%m-%Y %H:%M"
+SIN_FECHA = -1
+
+
+def marca_tiempo(valor):
+    if isinstance(valor, int):
+        return valor
+    if valor is None or valor == "":
+        return SIN_FECHA
+    if isinstance(valor, float):
+        return int(valor)
+    return _marca_desde_texto(valor)
+
+
+@lru_cache(maxsize=4096)
+def _marca_desde_texto(texto):
+    texto = texto.strip()
+    # SQLite devuelve como texto los enteros guardados en columnas TEXT
+    if texto.lstrip("-").isdigit():
+        return int(texto)
+    return int(datetime.strptime(texto, FORMATO_FECHA).timestamp())
+
+
+def formato_fecha(marca):
+    if marca is None or marca == SIN_FECHA:
+        return ""
+    return datetime.fromtimestamp(marca).strftime(FORMATO_FECHA)
+
+
+def inicio_turno(marca, horas_inicio):
+    # Comienzo (hora local) del turno en curso en marca; antes del primer
+    # turno del dia sigue el ultimo turno de ayer
+    actual = datetime.fromtimestamp(marca)
+    for hora in sorted(horas_inicio, reverse=True):
+        inicio = actual.replace(hour=hora, minute=0, second=0, microsecond=0)
+        if inicio <= actual:
+            return int(inicio.timestamp())
+    inicio = actual.replace(hour=max(horas_inicio), minute=0, second=0, microsecond=0) - timedelta(days=1)
+    return int(inicio.timestamp())
+
+
+def _codigo(tabla, valor, campo):
+    try:
+        return tabla.index(valor)
+    except ValueError:
+        raise ValueError(f"Valor no reconocido para {campo}: {valor!r}") from None
+
+
+def _entero(valor, campo):
+    if valor != int(valor):
+        raise ValueError(f"El historial columnar guarda {campo} como entero: {valor!r}")
+    return int(valor)
+
+
+class HistorialColumnar:
+
+    # Todas las atenciones de todos los pacientes en arreglos tipados, una
+    # columna por campo. Cada paciente guarda solo los numeros de sus filas.
+
+    def __init__(self):
+        self.peso = array("d")
+        self.talla = array("d")
+        self.presion = array("d")
+        self.frecuencia = array("H")
+        self.saturacion = array("H")
+        self.conciencia = array("B")
+        self.imc = array("d")
+        self.clasificacion_imc = array("B")
+        self.nivel_atencion = array("B")
+        self.fecha_registro = array("q")
+
+    def __len__(self):
+        return len(self.peso)
+
+    def agregar(self, a):
+        # a: dict con las claves de AtencionTriage.to_dict()
+        self.peso.append(a["peso"])
+        self.talla.append(a["talla"])
+        self.presion.append(a["presion"])
+        self.frecuencia.append(_entero(a["frecuencia"], "frecuencia"))
+        self.saturacion.append(_entero(a["saturacion"], "saturacion"))
+        self.conciencia.append(_codigo(CONCIENCIAS, a["conciencia"], "conciencia"))
+        self.imc.append(a["imc"])
+        self.clasificacion_imc.append(_codigo(CLASIFICACIONES_IMC, a["clasificacion_imc"], "clasificacion_imc"))
+        self.nivel_atencion.append(_codigo(NIVELES_ATENCION, a["nivel_atencion"], "nivel_atencion"))
+        self.fecha_registro.append(marca_tiempo(a["fecha_registro"]))
+        return len(self.peso) - 1
+
+    def fila(self, indice):
+        return VistaAtencion(self, indice)
+
+    def nuevas_filas(self):
+        return FilasAtencion(self)
+
+
+class VistaAtencion:
+
+    # Fila del historial con la misma interfaz de lectura que AtencionTriage
+
+    __slots__ = ("_historial", "_fila")
+
+    def __init__(self, historial, fila):
+        self._historial = historial
+        self._fila = fila
+
+    @property
+    def peso(self):
+        return self._historial.peso[self._fila]
+
+    @property
+    def talla(self):
+        return self._historial.talla[self._fila]
+
+    @property
+    def presion(self):
+        return self._historial.presion[self._fila]
+
+    @property
+    def frecuencia(self):
+        return self._historial.frecuencia[self._fila]
+
+    @property
+    def saturacion(self):
+        return self._historial.saturacion[self._fila]
+
+    @property
+    def conciencia(self):
+        return CONCIENCIAS[self._historial.conciencia[self._fila]]
+
+    @property
+    def imc(self):
+        return self._historial.imc[self._fila]
+
+    @property
+    def clasificacion_imc(self):
+        return CLASIFICACIONES_IMC[self._historial.clasificacion_imc[self._fila]]
+
+    @property
+    def nivel_atencion(self):
+        return NIVELES_ATENCION[self._historial.nivel_atencion[self._fila]]
+
+    @nivel_atencion.setter
+    def nivel_atencion(self, valor):
+        # Unico campo que se actualiza despues de registrar (re-triaje)
+        self._historial.nivel_atencion[self._fila] = _codigo(NIVELES_ATENCION, valor, "nivel_atencion")
+
+    @property
+    def fecha_registro(self):
+        return self._historial.fecha_registro[self._fila]
+
+    def to_dict(self):
+        return {
+            "peso": self.peso,
+            "talla": self.talla,
+            "presion": self.presion,
+            "frecuencia": self.frecuencia,
+            "conciencia": self.conciencia,
+            "saturacion": self.saturacion,
+            "imc": self.imc,
+            "clasificacion_imc": self.clasificacion_imc,
+            "nivel_atencion": self.nivel_atencion,
+            "fecha_registro": self.fecha_registro
+        }
+
+
+class FilasAtencion:
+
+    # Lista de atenciones de un paciente respaldada por el HistorialColumnar
+
+    __slots__ = ("_historial", "_filas")
+
+    def __init__(self, historial):
+        self._historial = historial
+        self._filas = array("L")
+
+    def append(self, atencion):
+        self._filas.append(self._historial.agregar(atencion.to_dict()))
+
+    def extender_dicts(self, atenciones):
+        for a in atenciones:
+            self._filas.append(self._historial.agregar(a))
+
+    def __len__(self):
+        return len(self._filas)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self._historial.fila(f) for f in self._filas[indice]]
+        return self._historial.fila(self._filas[indice])
+
+    def __iter__(self):
+        for f in self._filas:
+            yield self._historial.fila(f)
@@ -0,0 +1,224 @@
+import gzip
+import json
+import lzma
+import os
+import time
+
+from bloqueo import BloqueoArchivo, reemplazar_atomico
+from historial import SIN_FECHA, formato_fecha
+from modelo import GestorDatos
+
+# Archivo historico: las atenciones anteriores a un corte salen del archivo
+# principal hacia segmentos comprimidos junto a el (datos.json.historico-0001.gz),
+# con un bloque comprimido por paciente y un indice DNI -> bloque por
+# segmento (.idx). El archivo principal, el historial en memoria y cada
+# guardado solo llevan las atenciones recientes (y siempre la ultima de cada
+# paciente: urgencias y estadisticas no cambian); las archivadas se leen
+# cuando se pide el historial completo de un paciente.
+# Uso: python historico.py datos.json <dias> [--lzma]   (archiva)
+#      python historico.py datos.json --restaurar       (las devuelve)
+
+FORMATO_HISTORICO = 1
+COMPRESORES = {
+    "gzip": (".gz", gzip.compress, gzip.decompress),
+    "lzma": (".xz", lzma.compress, lzma.decompress),
+}
+# Con archivado automatico, como mucho una vez por este intervalo (segundos)
+INTERVALO_ARCHIVADO = 24 * 3600
+
+
+def _descompresor(nombre):
+    for extension, _, descomprimir in COMPRESORES.values():
+        if nombre.endswith(extension):
+            return descomprimir
+    raise ValueError(f"Segmento histórico desconocido: {nombre}")
+
+
+class HistoricoAtenciones:
+
+    # Lectura del archivo historico de un archivo de datos. Los indices de
+    # los segmentos se leen recien con la primera consulta y quedan en memoria.
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.carpeta = os.path.dirname(archivo)
+        self.cabecera = self.leer_cabecera(archivo)
+        self._indices = {}
+
+    @staticmethod
+    def ruta_cabecera(archivo):
+        return archivo + ".historico"
+
+    @staticmethod
+    def leer_cabecera(archivo):
+        # {"formato", "corte", "archivado_en", "segmentos": [nombre, ...]}
+        try:
+            with open(HistoricoAtenciones.ruta_cabecera(archivo), "r", encoding="utf-8") as f:
+                cabecera = json.load(f)
+        except FileNotFoundError:
+            return {"formato": FORMATO_HISTORICO, "corte": None, "archivado_en": None, "segmentos": []}
+
+        if not isinstance(cabecera, dict) or cabecera.get("formato") != FORMATO_HISTORICO:
+            raise ValueError(f"Archivo histórico inválido: {HistoricoAtenciones.ruta_cabecera(archivo)}")
+        return cabecera
+
+    def existe(self):
+        return bool(self.cabecera["segmentos"])
+
+    def _indice(self, nombre):
+        indice = self._indices.get(nombre)
+        if indice is None:
+            with open(os.path.join(self.carpeta, nombre + ".idx"), "r", encoding="utf-8") as f:
+                indice = self._indices[nombre] = json.load(f)
+        return indice
+
+    def atenciones(self, dni):
+        # Dicts de las atenciones archivadas del paciente, de la mas antigua
+        # a la mas reciente
+        atenciones = []
+        for nombre in self.cabecera["segmentos"]:
+            bloque = self._indice(nombre).get(dni)
+            if bloque is None:
+                continue
+            desplazamiento, longitud, _ = bloque
+            with open(os.path.join(self.carpeta, nombre), "rb") as f:
+                f.seek(desplazamiento)
+                datos = f.read(longitud)
+            atenciones.extend(json.loads(_descompresor(nombre)(datos)))
+        return atenciones
+
+    def cantidad(self):
+        return sum(b[2] for nombre in self.cabecera["segmentos"] for b in self._indice(nombre).values())
+
+    def dnis(self):
+        # Pacientes con atenciones archivadas, cada uno una vez (solo lee los indices)
+        return list(dict.fromkeys(dni for nombre in self.cabecera["segmentos"] for dni in self._indice(nombre)))
+
+
+def _escribir_segmento(ruta, archivadas, comprimir):
+    indice = {}
+    with open(ruta, "wb") as f:
+        for dni, atenciones in archivadas.items():
+            bloque = comprimir(json.dumps(atenciones).encode("utf-8"))
+            indice[dni] = [f.tell(), len(bloque), len(atenciones)]
+            f.write(bloque)
+        f.flush()
+        os.fsync(f.fileno())
+    reemplazar_atomico(ruta + ".idx", json.dumps(indice))
+
+
+def archivar(archivo, antes_de, compresion="gzip"):
+    # Mueve al historico las atenciones anteriores a antes_de (segundos
+    # Unix). Quien llama tiene el bloqueo del archivo. Devuelve cuantas movio.
+    if compresion not in COMPRESORES:
+        raise ValueError(f"Compresión desconocida: {compresion} (use {', '.join(COMPRESORES)}).")
+
+    historico = HistoricoAtenciones(archivo)
+    cabecera = historico.cabecera
+    lista_dicts = GestorDatos._dicts_con_bitacora(archivo)
+
+    archivadas = {}
+    cambiaron = False
+    for d in lista_dicts:
+        atenciones = d["atenciones"]
+        # Solo un prefijo (el orden se conserva) y nunca la ultima atencion
+        cantidad = 0
+        while (cantidad < len(atenciones) - 1 and
+               SIN_FECHA < atenciones[cantidad]["fecha_registro"] < antes_de):
+            cantidad += 1
+        if not cantidad:
+            continue
+
+        antiguas = atenciones[:cantidad]
+        if historico.existe():
+            # Un corte despues de escribir el historico y antes de reescribir
+            # el archivo principal deja atenciones en los dos: no se duplican
+            ya_archivadas = historico.atenciones(d["dni"])
+            antiguas = [a for a in antiguas if a not in ya_archivadas]
+        if antiguas:
+            archivadas[d["dni"]] = antiguas
+        d["atenciones"] = atenciones[cantidad:]
+        cambiaron = True
+
+    ahora = int(time.time())
+    if archivadas:
+        extension, comprimir, _ = COMPRESORES[compresion]
+        nombre = f"{os.path.basename(archivo)}.historico-{len(cabecera['segmentos']) + 1:04d}{extension}"
+        _escribir_segmento(os.path.join(historico.carpeta, nombre), archivadas, comprimir)
+        cabecera["segmentos"].append(nombre)
+        cabecera["corte"] = max(cabecera["corte"] or antes_de, antes_de)
+
+    # La cabecera es el punto de no retorno: desde aqui las atenciones ya
+    # estan en el historico aunque falle la reescritura del principal
+    cabecera["archivado_en"] = ahora
+    reemplazar_atomico(HistoricoAtenciones.ruta_cabecera(archivo), json.dumps(cabecera, indent=4))
+
+    if cambiaron and not GestorDatos._guardar_dicts(archivo, lista_dicts):
+        raise OSError(f"No se pudo reescribir {archivo} sin las atenciones archivadas.")
+    return sum(len(a) for a in archivadas.values())
+
+
+def archivar_si_corresponde(archivo, dias, compresion="gzip"):
+    # Archivado automatico al cargar: como mucho una vez por INTERVALO_ARCHIVADO
+    ahora = int(time.time())
+    ultimo = HistoricoAtenciones.leer_cabecera(archivo)["archivado_en"]
+    if (ultimo is not None and ahora - ultimo < INTERVALO_ARCHIVADO) or not os.path.exists(archivo):
+        return 0
+
+    corte = ahora - int(dias * 24 * 3600)
+    movidas = archivar(archivo, corte, compresion)
+    if movidas:
+        print(f"[SISTEMA] Se archivaron {movidas} atenciones anteriores al {formato_fecha(corte)}.")
+    return movidas
+
+
+def restaurar(archivo):
+    # Devuelve todas las atenciones archivadas al archivo principal y borra
+    # el historico. Quien llama tiene el bloqueo del archivo.
+    historico = HistoricoAtenciones(archivo)
+    if not historico.existe():
+        return 0
+
+    restauradas = 0
+    lista_dicts = GestorDatos._dicts_con_bitacora(archivo)
+    for d in lista_dicts:
+        archivadas = historico.atenciones(d["dni"])
+        if archivadas:
+            recientes = [a for a in d["atenciones"] if a not in archivadas]
+            d["atenciones"] = archivadas + recientes
+            restauradas += len(archivadas)
+
+    if not GestorDatos._guardar_dicts(archivo, lista_dicts):
+        raise OSError(f"No se pudieron restaurar las atenciones en {archivo}.")
+    os.remove(HistoricoAtenciones.ruta_cabecera(archivo))
+    for nombre in historico.cabecera["segmentos"]:
+        for ruta in (nombre, nombre + ".idx"):
+            try:
+                os.remove(os.path.join(historico.carpeta, ruta))
+            except FileNotFoundError:
+                pass
+    return restauradas
+
+
+if __name__ == "__main__":
+    import sys
+
+    argumentos = sys.argv[1:]
+    compresion = "lzma" if "--lzma" in argumentos else "gzip"
+    argumentos = [a for a in argumentos if a != "--lzma"]
+    if len(argumentos) != 2 or (argumentos[1] != "--restaurar" and not argumentos[1].isdigit()):
+        print("Uso: python historico.py <datos.json> <dias> [--lzma] | --restaurar")
+        sys.exit(1)
+
+    archivo = argumentos[0]
+    try:
+        with BloqueoArchivo(archivo):
+            if argumentos[1] == "--restaurar":
+                print(f"[SISTEMA] Se restauraron {restaurar(archivo)} atenciones en {archivo}.")
+            else:
+                corte = int(time.time()) - int(argumentos[1]) * 24 * 3600
+                movidas = archivar(archivo, corte, compresion)
+                print(f"[SISTEMA] Se archivaron {movidas} atenciones anteriores al {formato_fecha(corte)}.")
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
@@ -0,0 +1,208 @@
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+from multiprocessing import Pool
+
+from historial import marca_tiempo
+from modelo import (
+    AtencionTriage, GestorDatos, ValidadorDni, clase_por_edad,
+    DniInvalidoException, DniDuplicadoException
+)
+
+CAMPOS = ["dni", "nombre", "edad", "sexo", "peso", "talla", "presion", "frecuencia", "conciencia", "saturacion"]
+
+MAPA_SEXO = {"M": "Masculino", "F": "Femenino"}
+MAPA_CONCIENCIA = {"A": "Alerta", "V": "Verbal", "D": "Dolor", "I": "Inconsciente"}
+
+
+def leer_filas(ruta):
+    # Genera (numero_de_linea, fila) sin cargar el archivo completo
+    if ruta.lower().endswith(".csv"):
+        with open(ruta, "r", encoding="utf-8", newline="") as f:
+            lector = csv.DictReader(f)
+            for fila in lector:
+                yield lector.line_num, fila
+        return
+
+    with open(ruta, "r", encoding="utf-8") as f:
+        for numero, linea in enumerate(f, start=1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except json.JSONDecodeError as e:
+                fila = {"_error": f"JSON inválido: {e.msg}", "_original": linea.rstrip("\n")}
+            yield numero, fila
+
+
+def validar_fila(fila):
+    # Misma validacion que el registro interactivo; devuelve el paciente ya
+    # clasificado como dict (viaja entre procesos mas barato que el objeto)
+    if not isinstance(fila, dict):
+        raise ValueError("La fila debe ser un objeto con los campos del paciente.")
+    if "_error" in fila:
+        raise ValueError(fila["_error"])
+
+    faltantes = [c for c in CAMPOS if fila.get(c) in (None, "")]
+    if faltantes:
+        raise ValueError(f"Faltan campos: {', '.join(faltantes)}.")
+
+    dni = ValidadorDni.validar(str(fila["dni"]))
+
+    edad = int(fila["edad"])
+    if edad > 120:
+        raise ValueError("La edad debe estar entre 0 y 120 años.")
+
+    sexo = str(fila["sexo"]).strip()
+    conciencia = str(fila["conciencia"]).strip()
+
+    paciente = clase_por_edad(edad)(dni, fila["nombre"], edad, MAPA_SEXO.get(sexo.upper(), sexo))
+
+    atencion = AtencionTriage(
+        float(fila["peso"]),
+        float(fila["talla"]),
+        float(fila["presion"]),
+        int(fila["frecuencia"]),
+        MAPA_CONCIENCIA.get(conciencia.upper(), conciencia),
+        int(fila["saturacion"])
+    )
+
+    fecha = fila.get("fecha_registro")
+    if fecha:
+        # Texto con FORMATO_FECHA o marca de tiempo; un formato invalido es ValueError
+        fecha = marca_tiempo(fecha)
+        paciente.fecha_registro = fecha
+        atencion.fecha_registro = fecha
+
+    paciente.clasificar_atencion(atencion)
+    datos = paciente.to_dict()
+    datos["atenciones"] = [atencion.to_dict()]
+    return datos
+
+
+def validar_lote(lote):
+    resultados = []
+    for numero, fila in lote:
+        try:
+            resultados.append((numero, validar_fila(fila), None))
+        except (DniInvalidoException, ValueError, TypeError, AttributeError) as e:
+            resultados.append((numero, fila, str(e)))
+    return resultados
+
+
+def _en_lotes(filas, tamano):
+    filas = iter(filas)
+    while True:
+        lote = list(islice(filas, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+class Importador:
+
+    # Valida en paralelo (un lote de filas por tarea) y guarda en el almacen
+    # un lote de pacientes aceptados por escritura
+
+    def __init__(self, almacen, procesos=None, tamano_lote=1000):
+        self.almacen = almacen
+        self.procesos = procesos or os.cpu_count() or 1
+        self.tamano_lote = tamano_lote
+
+    def importar(self, ruta, archivo_errores=None):
+        archivo_errores = archivo_errores or ruta + ".errores.jsonl"
+        resumen = {"aceptadas": 0, "rechazadas": 0, "segundos": 0.0, "archivo_errores": archivo_errores}
+        inicio = time.perf_counter()
+
+        lotes = _en_lotes(leer_filas(ruta), self.tamano_lote)
+        with open(archivo_errores, "w", encoding="utf-8") as errores:
+            if self.procesos == 1:
+                self._guardar_resultados(map(validar_lote, lotes), errores, resumen)
+            else:
+                with Pool(self.procesos) as pool:
+                    # imap conserva el orden del archivo: las atenciones de un
+                    # mismo paciente se guardan en el orden en que llegaron
+                    self._guardar_resultados(pool.imap(validar_lote, lotes), errores, resumen)
+
+        resumen["segundos"] = time.perf_counter() - inicio
+        if resumen["rechazadas"] == 0:
+            os.remove(archivo_errores)
+        return resumen
+
+    def guardar_lote(self, lote):
+        # Guarda las filas aceptadas de un resultado de validar_lote;
+        # devuelve los cambios guardados y las filas rechazadas
+        cambios = []
+        rechazadas = []
+        nuevos = {}
+
+        with self.almacen.exclusion():
+            for numero, datos, motivo in lote:
+                if motivo is not None:
+                    rechazadas.append((numero, datos, motivo))
+                    continue
+                cambios.append(self._cambio_para(datos, nuevos))
+
+            # Sin compactar entre lotes: en una carga masiva la bitacora crece
+            # rapido y se vuelca una sola vez al cerrar
+            if cambios and not self.almacen.registrar_lote(cambios, compactar=False):
+                raise OSError("No se pudo guardar el lote importado.")
+        return cambios, rechazadas
+
+    def _guardar_resultados(self, resultados, errores, resumen):
+        for lote in resultados:
+            cambios, rechazadas = self.guardar_lote(lote)
+
+            for numero, datos, motivo in rechazadas:
+                errores.write(json.dumps({"linea": numero, "motivo": motivo, "fila": datos}, ensure_ascii=False) + "\n")
+            resumen["aceptadas"] += len(cambios)
+            resumen["rechazadas"] += len(rechazadas)
+
+    def _cambio_para(self, datos, nuevos):
+        atencion = AtencionTriage.from_dict(datos["atenciones"][0], confiable=True)
+
+        paciente = nuevos.get(datos["dni"]) or self.almacen.consultar_dni(datos["dni"])
+        if paciente is None:
+            datos["atenciones"] = []
+            paciente = GestorDatos._paciente_desde_dict(datos, confiable=True)
+            nuevos[paciente.dni] = paciente
+            es_nuevo = True
+        else:
+            # Paciente ya registrado: mandan sus datos guardados (edad)
+            paciente.clasificar_atencion(atencion)
+            es_nuevo = False
+
+        paciente.agregar_atencion(atencion)
+        return paciente, atencion, es_nuevo
+
+
+if __name__ == "__main__":
+    from almacenamiento import crear_almacen
+
+    # Uso: python importador.py <lote.csv|lote.jsonl> [procesos]
+    if len(sys.argv) not in (2, 3):
+        print("Uso: python importador.py <lote.csv|lote.jsonl> [procesos]")
+        sys.exit(1)
+
+    almacen = crear_almacen()
+    try:
+        almacen.cargar()
+    except DniDuplicadoException as e:
+        print(f"[ERROR] El historial contiene DNIs duplicados: {e}")
+        sys.exit(1)
+
+    importador = Importador(almacen, int(sys.argv[2]) if len(sys.argv) == 3 else None)
+    resumen = importador.importar(sys.argv[1])
+    almacen.cerrar()
+
+    total = resumen["aceptadas"] + resumen["rechazadas"]
+    velocidad = total / resumen["segundos"] if resumen["segundos"] else 0
+    print(
+        f"[SISTEMA] Importadas {resumen['aceptadas']} filas, rechazadas {resumen['rechazadas']} "
+        f"en {resumen['segundos']:.2f} s ({velocidad:.0f} filas/s)."
+    )
+    if resumen["rechazadas"]:
+        print(f"[SISTEMA] Detalle de filas rechazadas en {resumen['archivo_errores']}")
@@ -0,0 +1,558 @@
+import bisect
+import heapq
+import itertools
+import math
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+
+import metricas
+from almacenamiento import Almacen
+from historial import marca_tiempo
+
+# Puntaje de gravedad por signo vital; cada tabla va de mas a menos grave
+# y se toma el primer rango que se cumple
+PUNTOS_CONCIENCIA = {"Alerta": 0, "Verbal": 2, "Dolor": 3, "Inconsciente": 4}
+PUNTOS_SATURACION = [(85, 3), (92, 2), (94, 1)]
+PUNTOS_PRESION = [(70, 200, 3), (90, 180, 2), (100, 160, 1)]
+PUNTOS_FRECUENCIA = [(40, 130, 3), (50, 110, 2), (55, 100, 1)]
+
+
+def _puntos_rango(valor, tabla):
+    for minimo, maximo, puntos in tabla:
+        if valor < minimo or valor > maximo:
+            return puntos
+    return 0
+
+
+def puntaje_gravedad(atencion):
+    puntos = PUNTOS_CONCIENCIA.get(atencion.conciencia, 0)
+    puntos += next((p for limite, p in PUNTOS_SATURACION if atencion.saturacion < limite), 0)
+    puntos += _puntos_rango(atencion.presion, PUNTOS_PRESION)
+    puntos += _puntos_rango(atencion.frecuencia, PUNTOS_FRECUENCIA)
+    return puntos
+
+
+def orden_urgencia(atencion):
+    # Mas grave primero y, a igual gravedad, el que llego antes
+    return -puntaje_gravedad(atencion), marca_tiempo(atencion.fecha_registro)
+
+
+class ColaUrgencias:
+
+    # Monticulo de urgentes ordenado por gravedad (mayor primero) y luego por
+    # hora de llegada. Re-triar a un paciente no busca su entrada anterior:
+    # se marca como vencida y se descarta al recorrer (borrado perezoso).
+
+    def __init__(self):
+        self._monticulo = []
+        self._vigentes = {}
+        self._secuencia = itertools.count()
+
+    def __len__(self):
+        return len(self._vigentes)
+
+    def __contains__(self, dni):
+        return dni in self._vigentes
+
+    def actualizar(self, dni, atencion):
+        if atencion is None or atencion.nivel_atencion != "Urgente":
+            self.quitar(dni)
+            return
+
+        entrada = (*orden_urgencia(atencion), next(self._secuencia), dni)
+        self._vigentes[dni] = entrada
+        heapq.heappush(self._monticulo, entrada)
+        self._compactar_si_hace_falta()
+
+    def quitar(self, dni):
+        self._vigentes.pop(dni, None)
+        self._compactar_si_hace_falta()
+
+    def puntaje(self, dni):
+        entrada = self._vigentes.get(dni)
+        return None if entrada is None else -entrada[0]
+
+    def siguiente(self):
+        for dni in self.primeros(1):
+            return dni
+        return None
+
+    def primeros(self, k=None):
+        # Recorre el monticulo en orden sin desarmarlo: una cola auxiliar con
+        # los hijos de cada nodo visitado da O(k log k) para los k primeros
+        if not self._monticulo:
+            return
+        frontera = [(self._monticulo[0], 0)]
+        entregados = 0
+
+        while frontera and (k is None or entregados < k):
+            entrada, i = heapq.heappop(frontera)
+            for hijo in (2 * i + 1, 2 * i + 2):
+                if hijo < len(self._monticulo):
+                    heapq.heappush(frontera, (self._monticulo[hijo], hijo))
+
+            dni = entrada[3]
+            if self._vigentes.get(dni) is entrada:
+                entregados += 1
+                yield dni
+
+    def _compactar_si_hace_falta(self):
+        # Reconstruye cuando las entradas vencidas superan a las vigentes
+        if len(self._monticulo) > 2 * len(self._vigentes) + 16:
+            self._monticulo = list(self._vigentes.values())
+            heapq.heapify(self._monticulo)
+
+
+class ResumenSigno:
+
+    # Cantidad, suma, minimo y maximo de un signo vital que admite quitar
+    # valores: guarda cuantas veces aparece cada valor y solo recalcula el
+    # minimo/maximo cuando desaparece el ultimo valor extremo
+
+    def __init__(self):
+        self.cantidad = 0
+        self.suma = 0
+        self._frecuencias = Counter()
+        self._minimo = None
+        self._maximo = None
+
+    def agregar(self, valor):
+        self.cantidad += 1
+        self.suma += valor
+        self._frecuencias[valor] += 1
+        if self._minimo is None or valor < self._minimo:
+            self._minimo = valor
+        if self._maximo is None or valor > self._maximo:
+            self._maximo = valor
+
+    def quitar(self, valor):
+        self.cantidad -= 1
+        self.suma -= valor
+        self._frecuencias[valor] -= 1
+        if self._frecuencias[valor] == 0:
+            del self._frecuencias[valor]
+            if valor == self._minimo:
+                self._minimo = min(self._frecuencias, default=None)
+            if valor == self._maximo:
+                self._maximo = max(self._frecuencias, default=None)
+
+    def resumen(self):
+        if not self.cantidad:
+            return {"min": None, "max": None, "promedio": None}
+        return {
+            "min": self._minimo,
+            "max": self._maximo,
+            "promedio": round(self.suma / self.cantidad, 1)
+        }
+
+
+class EstadisticasIncrementales:
+
+    # Mismo resultado que Almacen.estadisticas(), mantenido al registrar en
+    # lugar de recalcularlo: cada paciente aporta su edad y su ultima atencion
+
+    SIGNOS_VITALES = ["presion", "frecuencia", "saturacion", "imc"]
+
+    def __init__(self):
+        self.total = 0
+        self.suma_edad = 0
+        vacias = Almacen.estadisticas_vacias()
+        self.por_atencion = vacias["por_atencion"]
+        self.por_imc = vacias["por_imc"]
+        self.signos = {signo: ResumenSigno() for signo in self.SIGNOS_VITALES}
+
+    @classmethod
+    def desde_pacientes(cls, pacientes):
+        estadisticas = cls()
+        for p in pacientes:
+            estadisticas.agregar_paciente(p)
+        return estadisticas
+
+    def agregar_paciente(self, paciente):
+        self.total += 1
+        self.suma_edad += paciente.edad
+        self._sumar_atencion(paciente.obtener_ultima_atencion(), 1)
+
+    def reemplazar_ultima(self, anterior, nueva):
+        self._sumar_atencion(anterior, -1)
+        self._sumar_atencion(nueva, 1)
+
+    def resumen(self):
+        stats = Almacen.estadisticas_vacias()
+        stats["total"] = self.total
+        if self.total:
+            stats["promedio_edad"] = round(self.suma_edad / self.total, 1)
+        stats["por_atencion"] = dict(self.por_atencion)
+        stats["por_imc"] = dict(self.por_imc)
+        stats["signos_vitales"] = {signo: r.resumen() for signo, r in self.signos.items()}
+        return stats
+
+    def _sumar_atencion(self, atencion, signo):
+        if atencion is None:
+            return
+
+        if atencion.nivel_atencion in self.por_atencion:
+            self.por_atencion[atencion.nivel_atencion] += signo
+        if atencion.clasificacion_imc in self.por_imc:
+            self.por_imc[atencion.clasificacion_imc] += signo
+
+        for nombre, resumen in self.signos.items():
+            valor = getattr(atencion, nombre)
+            if signo > 0:
+                resumen.agregar(valor)
+            else:
+                resumen.quitar(valor)
+
+
+def normalizar_nombre(texto):
+    # "  PERÉZ  lópez" -> "perez lopez": sin tildes, sin mayusculas, un espacio
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_tildes.casefold().split())
+
+
+def trigramas(texto, cerrar_palabras=True):
+    # Cada palabra con un espacio al inicio (y al final si se cierra), para que
+    # los inicios de palabra pesen; la consulta no cierra la ultima palabra
+    # asi "carl" encuentra "carlos"
+    gramas = set()
+    palabras = texto.split()
+    for i, palabra in enumerate(palabras):
+        cerrar = cerrar_palabras or i < len(palabras) - 1
+        marcada = " " + palabra + (" " if cerrar else "")
+        gramas.update(marcada[j:j + 3] for j in range(len(marcada) - 2))
+    return gramas
+
+
+class IndiceNombres:
+
+    # Dos indices invertidos sobre los nombres normalizados: palabra -> DNIs
+    # (con vocabulario ordenado para buscar por prefijo) y trigrama -> DNIs
+    # para tolerar errores de tipeo
+
+    SIMILITUD_MINIMA = 0.5
+
+    def __init__(self):
+        self._nombres = {}
+        self._cantidad_gramas = {}
+        self._postings = defaultdict(set)
+        self._palabras = defaultdict(set)
+        self._vocabulario = []
+
+    @classmethod
+    def desde_pacientes(cls, pacientes):
+        indice = cls()
+        for p in pacientes:
+            indice.actualizar(p.dni, p.nombre)
+        return indice
+
+    def __len__(self):
+        return len(self._nombres)
+
+    def actualizar(self, dni, nombre):
+        self.quitar(dni)
+        normalizado = normalizar_nombre(nombre)
+        gramas = trigramas(normalizado)
+        self._nombres[dni] = normalizado
+        self._cantidad_gramas[dni] = len(gramas)
+        for grama in gramas:
+            self._postings[grama].add(dni)
+        for palabra in set(normalizado.split()):
+            if palabra not in self._palabras:
+                bisect.insort(self._vocabulario, palabra)
+            self._palabras[palabra].add(dni)
+
+    def quitar(self, dni):
+        normalizado = self._nombres.pop(dni, None)
+        if normalizado is None:
+            return
+        del self._cantidad_gramas[dni]
+        for grama in trigramas(normalizado):
+            self._postings[grama].discard(dni)
+            if not self._postings[grama]:
+                del self._postings[grama]
+        for palabra in set(normalizado.split()):
+            self._palabras[palabra].discard(dni)
+            if not self._palabras[palabra]:
+                del self._palabras[palabra]
+                self._vocabulario.pop(bisect.bisect_left(self._vocabulario, palabra))
+
+    def buscar(self, texto, limite=None):
+        # Lista de (dni, similitud) de mayor a menor similitud
+        consulta = normalizar_nombre(texto)
+        if not consulta:
+            return []
+
+        gramas = trigramas(consulta, cerrar_palabras=False)
+
+        # Primero los nombres que contienen todas las palabras de la consulta
+        # (la ultima como prefijo): se intersectan las listas de palabras, que
+        # son cortas. Solo si no hay ninguno se buscan parecidos por trigramas.
+        candidatos = self._candidatos_por_palabras(consulta.split())
+        resultados = self._ordenar(consulta, gramas, candidatos, 0.0, limite)
+        if resultados or not gramas:
+            return resultados
+
+        candidatos = self._candidatos_por_trigramas(gramas, self.SIMILITUD_MINIMA)
+        return self._ordenar(consulta, gramas, candidatos, self.SIMILITUD_MINIMA, limite)
+
+    def _con_prefijo(self, prefijo):
+        inicio = bisect.bisect_left(self._vocabulario, prefijo)
+        fin = bisect.bisect_left(self._vocabulario, prefijo + "\uffff")
+        if fin - inicio == 1:
+            return self._palabras[self._vocabulario[inicio]]
+        encontrados = set()
+        for palabra in self._vocabulario[inicio:fin]:
+            encontrados |= self._palabras[palabra]
+        return encontrados
+
+    def _candidatos_por_palabras(self, palabras):
+        listas = [self._palabras.get(p, set()) for p in palabras[:-1]]
+        listas.append(self._con_prefijo(palabras[-1]))
+        listas.sort(key=len)
+        return set(listas[0]).intersection(*listas[1:])
+
+    def _candidatos_por_trigramas(self, gramas, umbral):
+        # Para compartir `necesarios` trigramas un nombre debe estar en al menos
+        # una de las (total - necesarios + 1) listas mas cortas: basta unir
+        # esas, sin recorrer las de trigramas comunes
+        necesarios = max(1, math.ceil(len(gramas) * umbral))
+        por_rareza = sorted(gramas, key=lambda g: len(self._postings.get(g, ())))
+        candidatos = set()
+        for grama in por_rareza[:len(gramas) - necesarios + 1]:
+            candidatos.update(self._postings.get(grama, ()))
+        return candidatos
+
+    def _ordenar(self, consulta, gramas, candidatos, umbral, limite):
+        listas = [self._postings.get(g, ()) for g in gramas]
+        resultados = []
+        for dni in candidatos:
+            nombre = self._nombres[dni]
+            compartidos = sum(1 for lista in listas if dni in lista)
+            contiene = consulta in nombre
+            cobertura = compartidos / len(gramas) if gramas else 1.0
+            if not contiene and cobertura < umbral:
+                continue
+            # Coincidencia exacta del texto primero, luego cobertura de la
+            # consulta y por ultimo nombres mas parecidos en largo
+            jaccard = compartidos / (len(gramas) + self._cantidad_gramas[dni] - compartidos) if gramas else 0.0
+            similitud = round((1.0 if contiene else cobertura) * 0.8 + jaccard * 0.2, 3)
+            resultados.append((dni, similitud))
+
+        resultados.sort(key=lambda r: (-r[1], self._nombres[r[0]]))
+        return resultados[:limite] if limite else resultados
+
+
+class IndiceTemporal:
+
+    # Todas las atenciones ordenadas por marca de tiempo, en arreglos
+    # paralelos: marca, DNI y posicion en el historial del paciente. Un rango
+    # se resuelve con dos bisecciones, O(log n + k). Se arma con las marcas
+    # solamente: no hace falta construir el historial de cada paciente.
+
+    def __init__(self):
+        self._marcas = array("q")
+        self._dnis = []
+        self._posiciones = array("L")
+
+    @classmethod
+    def desde_pacientes(cls, pacientes):
+        marcas = []
+        dnis = []
+        posiciones = []
+        for p in pacientes:
+            for posicion, marca in enumerate(p.marcas_atenciones()):
+                marcas.append(marca)
+                dnis.append(p.dni)
+                posiciones.append(posicion)
+
+        # Orden estable: a igual marca queda el orden del historial
+        orden = sorted(range(len(marcas)), key=marcas.__getitem__)
+        indice = cls()
+        indice._marcas = array("q", (marcas[i] for i in orden))
+        indice._dnis = [dnis[i] for i in orden]
+        indice._posiciones = array("L", (posiciones[i] for i in orden))
+        return indice
+
+    def __len__(self):
+        return len(self._marcas)
+
+    def agregar(self, marca, dni, posicion):
+        # Lo normal es registrar "ahora": va al final sin desplazar nada
+        i = bisect.bisect_right(self._marcas, marca)
+        if i == len(self._marcas):
+            self._marcas.append(marca)
+            self._dnis.append(dni)
+            self._posiciones.append(posicion)
+        else:
+            self._marcas.insert(i, marca)
+            self._dnis.insert(i, dni)
+            self._posiciones.insert(i, posicion)
+
+    def entre(self, desde, hasta):
+        # (marca, dni, posicion) con desde <= marca < hasta, de la mas antigua a la mas reciente
+        inicio = bisect.bisect_left(self._marcas, desde)
+        fin = bisect.bisect_left(self._marcas, hasta)
+        for i in range(inicio, fin):
+            yield self._marcas[i], self._dnis[i], self._posiciones[i]
+
+
+class AlmacenIndexado:
+
+    # Un Almacen junto con los indices en memoria que lo acompañan. Todo
+    # registro pasa por aqui para que la cola, las estadisticas y el indice de
+    # nombres sigan al dia (lo usan el Controlador y el servicio compartido).
+    # Con un almacen de consultas_indexadas (SQLite) no se arman: esas
+    # consultas las resuelve el almacen.
+
+    def __init__(self, almacen):
+        self.almacen = almacen
+        self.cola_urgencias = ColaUrgencias()
+        self.estadisticas = EstadisticasIncrementales()
+        self.indice_nombres = IndiceNombres()
+        # Se arma con la primera consulta por rango: el arranque no lo paga
+        self.indice_temporal = None
+        self._recargas = almacen.recargas
+
+    def cargar(self):
+        self.almacen.cargar()
+        self._indexar()
+
+    def _indexar(self):
+        # Una sola pasada por los pacientes: en memoria acotada cada
+        # recorrido vuelve a leer el archivo
+        self._recargas = self.almacen.recargas
+        self.indice_temporal = None
+        if self.almacen.consultas_indexadas:
+            self.cola_urgencias = self.estadisticas = self.indice_nombres = None
+            return
+
+        self.cola_urgencias = ColaUrgencias()
+        self.estadisticas = EstadisticasIncrementales()
+        self.indice_nombres = IndiceNombres() if self.almacen.indexar_nombres else None
+        for p in self.almacen.listar_pacientes():
+            self.cola_urgencias.actualizar(p.dni, p.obtener_ultima_atencion())
+            self.estadisticas.agregar_paciente(p)
+            if self.indice_nombres is not None:
+                self.indice_nombres.actualizar(p.dni, p.nombre)
+
+    def total_pacientes(self):
+        return self.almacen.total_pacientes()
+
+    def buscar_por_dni(self, dni):
+        return self.almacen.buscar_por_dni(dni)
+
+    def buscar_por_nombre(self, texto, limite=None):
+        # El mas parecido primero
+        if self.almacen.consultas_indexadas:
+            # Por subcadena en el almacen, sin tolerar errores de tipeo
+            if not texto.strip():
+                return []
+            return list(itertools.islice(self.almacen.buscar_por_nombre(texto), limite))
+        if self.indice_nombres is None:
+            # Sin indice (memoria acotada): recorre los pacientes, sin tolerar errores de tipeo
+            consulta = normalizar_nombre(texto)
+            if not consulta:
+                return []
+            encontrados = (p for p in self.almacen.listar_pacientes() if consulta in normalizar_nombre(p.nombre))
+            return list(itertools.islice(encontrados, limite))
+        return [self.almacen.buscar_por_dni(dni) for dni, _ in self.indice_nombres.buscar(texto, limite)]
+
+    def listar_pacientes(self):
+        return self.almacen.listar_pacientes()
+
+    def listar_pagina(self, desde, cantidad):
+        return self.almacen.listar_pagina(desde, cantidad)
+
+    def listar_urgentes(self, limite=None):
+        # Ya ordenados: el primero es el siguiente a llamar
+        if self.almacen.consultas_indexadas:
+            # Solo los urgentes (indice por nivel), ordenados como la cola
+            urgentes = sorted(self.almacen.listar_urgentes(), key=lambda p: orden_urgencia(p.obtener_ultima_atencion()))
+            return urgentes[:limite]
+        return (self.almacen.buscar_por_dni(dni) for dni in self.cola_urgencias.primeros(limite))
+
+    def resumen_estadisticas(self):
+        if self.almacen.consultas_indexadas:
+            return self.almacen.estadisticas()
+        return self.estadisticas.resumen()
+
+    def historial_archivado(self, dni):
+        return self.almacen.historial_archivado(dni)
+
+    def atenciones_entre(self, desde, hasta, solo_urgentes=False):
+        # (paciente, atencion) registradas en [desde, hasta), por hora
+        if self.almacen.rangos_de_tiempo_indexados:
+            yield from self.almacen.atenciones_entre(desde, hasta, solo_urgentes)
+            return
+
+        if self.indice_temporal is None:
+            self.indice_temporal = IndiceTemporal.desde_pacientes(self.almacen.listar_pacientes())
+        for _, dni, posicion in self.indice_temporal.entre(desde, hasta):
+            paciente = self.almacen.buscar_por_dni(dni)
+            atencion = paciente.obtener_atenciones()[posicion]
+            if not solo_urgentes or atencion.nivel_atencion == "Urgente":
+                yield paciente, atencion
+
+    def registrar(self, paciente, atencion):
+        return self.registrar_lote([(paciente, atencion)])[0]
+
+    def registrar_lote(self, pedidos):
+        # pedidos: (paciente, atencion). Si el DNI ya esta registrado manda el
+        # paciente guardado (su edad elige la franja de las reglas) y no el
+        # recibido.
+        # Devuelve los cambios (paciente, atencion, es_nuevo) ya entregados al
+        # almacen (guardados, salvo durabilidad diferida o periodica). Si el
+        # guardado falla lanza OSError (lo registrado queda en memoria, igual
+        # que en el almacen) para que quien registra lo informe.
+        with self.almacen.exclusion():
+            if self.almacen.recargas != self._recargas:
+                # Un guardado en segundo plano releyo el historial
+                self._indexar()
+            cambios = self._aplicar(pedidos)
+
+            with metricas.tramo("indices.guardar"):
+                guardado = self.almacen.registrar_lote(cambios)
+            if self.almacen.recargas != self._recargas:
+                # El almacen releyo el historial con lo que registraron otros procesos
+                self._indexar()
+        if not guardado:
+            raise OSError("No se pudo guardar el registro.")
+        return cambios
+
+    def _aplicar(self, pedidos):
+        cambios = []
+        vistos = {}
+
+        for propuesto, atencion in pedidos:
+            paciente = vistos.get(propuesto.dni) or self.almacen.buscar_por_dni(propuesto.dni)
+            es_nuevo = paciente is None
+            if es_nuevo:
+                paciente = propuesto
+            anterior = None if es_nuevo else paciente.obtener_ultima_atencion()
+            posicion = paciente.cantidad_atenciones()
+
+            # Clasificar antes de agregar: con historial columnar la atencion
+            # se copia a las columnas al agregarla
+            with metricas.tramo("indices.clasificar"):
+                paciente.clasificar_atencion(atencion)
+            paciente.agregar_atencion(atencion)
+            vistos[paciente.dni] = paciente
+            cambios.append((paciente, atencion, es_nuevo))
+
+            if self.indice_temporal is not None:
+                self.indice_temporal.agregar(marca_tiempo(atencion.fecha_registro), paciente.dni, posicion)
+            if self.almacen.consultas_indexadas:
+                continue
+            self.cola_urgencias.actualizar(paciente.dni, atencion)
+            if es_nuevo:
+                self.estadisticas.agregar_paciente(paciente)
+                if self.indice_nombres is not None:
+                    self.indice_nombres.actualizar(paciente.dni, paciente.nombre)
+            else:
+                self.estadisticas.reemplazar_ultima(anterior, atencion)
+        return cambios
+
+    def cerrar(self):
+        return self.almacen.cerrar()
@@ -0,0 +1,286 @@
+import mmap
+import struct
+
+from historial import (
+    CONCIENCIAS, CLASIFICACIONES_IMC, NIVELES_ATENCION,
+    marca_tiempo, _codigo, _entero
+)
+
+# Instantanea binaria del historial: el mismo contenido que datos.json en
+# secciones de ancho fijo, para abrirla con mmap y decodificar solo los
+# pacientes que se piden. Todo en little-endian:
+#
+#   cabecera   MAGIA, version, pacientes, atenciones, donde empieza cada
+#              seccion y largo de los textos
+#   pacientes  un registro PACIENTE por paciente, en el orden del historial
+#   atenciones un registro ATENCION por atencion, agrupadas por paciente
+#   indice     (dni, numero de paciente) ordenado por DNI, para buscar por biseccion
+#   textos     nombres en UTF-8 (cada nombre distinto una sola vez)
+#
+# Las fechas son marcas de tiempo (segundos Unix) y los campos de texto se
+# guardan con los mismos codigos que el historial columnar (historial.py).
+#
+# Limitacion: solo las consultas puntuales (buscar_registro, iterar_pacientes
+# con dni) aprovechan el mapa. GestorDatos.cargar_pacientes sigue
+# recorriendo todos los registros al iniciar y arma un Paciente por cada
+# uno, porque el registro en memoria (RegistroPacientes y los indices)
+# necesita los objetos. Lo que se evita es decodificar el historial: las
+# atenciones quedan empaquetadas (AtencionesEmpaquetadas). El mapa no queda
+# abierto despues de cargar para poder reemplazar el archivo al guardar.
+
+EXTENSION = ".bin"
+MAGIA = b"TRIAJEIB"
+VERSION = 1
+
+CABECERA = struct.Struct("<8sHIIQQQQ")
+PACIENTE = struct.Struct("<8sIHHBqII")
+ATENCION = struct.Struct("<dddHHBdBBq")
+ENTRADA_INDICE = struct.Struct("<8sI")
+
+SEXOS = ["Masculino", "Femenino"]
+
+
+def es_instantanea(ruta):
+    return ruta.endswith(EXTENSION)
+
+
+def _empaquetar_atencion(a):
+    return ATENCION.pack(
+        a["peso"], a["talla"], a["presion"],
+        _entero(a["frecuencia"], "frecuencia"),
+        _entero(a["saturacion"], "saturacion"),
+        _codigo(CONCIENCIAS, a["conciencia"], "conciencia"),
+        a["imc"],
+        _codigo(CLASIFICACIONES_IMC, a["clasificacion_imc"], "clasificacion_imc"),
+        _codigo(NIVELES_ATENCION, a["nivel_atencion"], "nivel_atencion"),
+        marca_tiempo(a["fecha_registro"])
+    )
+
+
+def _atencion_desde_campos(campos):
+    peso, talla, presion, frecuencia, saturacion, conciencia, imc, clasificacion, nivel, fecha = campos
+    return {
+        "peso": peso,
+        "talla": talla,
+        "presion": presion,
+        "frecuencia": frecuencia,
+        "conciencia": CONCIENCIAS[conciencia],
+        "saturacion": saturacion,
+        "imc": imc,
+        "clasificacion_imc": CLASIFICACIONES_IMC[clasificacion],
+        "nivel_atencion": NIVELES_ATENCION[nivel],
+        "fecha_registro": fecha
+    }
+
+
+def codificar(pacientes):
+    # pacientes: dicts con la forma de Paciente.to_dict(). Genera la
+    # instantanea por trozos de bytes (como iterencode para el JSON)
+    registros = bytearray()
+    atenciones = bytearray()
+    textos = bytearray()
+    posiciones_nombre = {}
+    indice = []
+    total_atenciones = 0
+
+    for numero, p in enumerate(pacientes):
+        dni = p["dni"].encode("ascii")
+        if len(dni) != 8 or not dni.isdigit():
+            raise ValueError(f"DNI inválido para la instantánea: {p['dni']!r}")
+
+        nombre = p["nombre"]
+        if nombre not in posiciones_nombre:
+            codificado = nombre.encode("utf-8")
+            posiciones_nombre[nombre] = (len(textos), len(codificado))
+            textos += codificado
+        desde, largo = posiciones_nombre[nombre]
+
+        lista = p.get("atenciones", [])
+        registros += PACIENTE.pack(
+            dni, desde, largo, _entero(p["edad"], "edad"), _codigo(SEXOS, p["sexo"], "sexo"),
+            marca_tiempo(p.get("fecha_registro")), total_atenciones, len(lista)
+        )
+        for a in lista:
+            atenciones += _empaquetar_atencion(a)
+        total_atenciones += len(lista)
+        indice.append((dni, numero))
+
+    indice.sort()
+    for anterior, siguiente in zip(indice, indice[1:]):
+        if anterior[0] == siguiente[0]:
+            raise ValueError(f"DNI duplicado en la instantánea: {siguiente[0].decode('ascii')}")
+
+    inicio_atenciones = CABECERA.size + len(registros)
+    inicio_indice = inicio_atenciones + len(atenciones)
+    inicio_textos = inicio_indice + len(indice) * ENTRADA_INDICE.size
+
+    yield CABECERA.pack(
+        MAGIA, VERSION, len(indice), total_atenciones,
+        inicio_atenciones, inicio_indice, inicio_textos, len(textos)
+    )
+    yield bytes(registros)
+    yield bytes(atenciones)
+    yield b"".join(ENTRADA_INDICE.pack(dni, numero) for dni, numero in indice)
+    yield bytes(textos)
+
+
+class AtencionesEmpaquetadas:
+
+    # Atenciones de un paciente tal como estan en la instantanea (copiadas
+    # fuera del mapa): se decodifican a dicts recien al recorrerlas, asi el
+    # historial antiguo ocupa ATENCION.size bytes por atencion hasta que
+    # alguien lo pide
+
+    __slots__ = ("_datos",)
+
+    def __init__(self, datos):
+        self._datos = datos
+
+    def __len__(self):
+        return len(self._datos) // ATENCION.size
+
+    def __iter__(self):
+        for campos in ATENCION.iter_unpack(self._datos):
+            yield _atencion_desde_campos(campos)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            desde, hasta, paso = indice.indices(len(self))
+            if paso != 1:
+                return list(self)[indice]
+            return AtencionesEmpaquetadas(self._datos[desde * ATENCION.size:hasta * ATENCION.size])
+
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError("Atención fuera de rango.")
+        return _atencion_desde_campos(ATENCION.unpack_from(self._datos, indice * ATENCION.size))
+
+    def marcas(self):
+        # Solo la fecha de cada atencion, sin armar los dicts
+        return [campos[-1] for campos in ATENCION.iter_unpack(self._datos)]
+
+    def __add__(self, otra):
+        return list(self) + list(otra)
+
+    def __radd__(self, otra):
+        return list(otra) + list(self)
+
+
+class Instantanea:
+
+    # Instantanea abierta con mmap: abrirla solo lee la cabecera, y cada
+    # paciente se decodifica al pedirlo
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            if f.seek(0, 2) < CABECERA.size:
+                raise ValueError(f"Instantánea inválida: {ruta} está vacía o truncada.")
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._leer_cabecera()
+        except BaseException:
+            self._mapa.close()
+            raise
+
+    def _leer_cabecera(self):
+        magia, version, pacientes, atenciones, *inicios, largo_textos = CABECERA.unpack_from(self._mapa, 0)
+        self._inicio_atenciones, self._inicio_indice, self._inicio_textos = inicios
+        if magia != MAGIA:
+            raise ValueError(f"Instantánea inválida: {self.ruta} no es una instantánea del sistema.")
+        if version != VERSION:
+            raise ValueError(f"Instantánea inválida: versión {version} no soportada.")
+
+        esperado = (
+            CABECERA.size + pacientes * PACIENTE.size == self._inicio_atenciones and
+            self._inicio_atenciones + atenciones * ATENCION.size == self._inicio_indice and
+            self._inicio_indice + pacientes * ENTRADA_INDICE.size == self._inicio_textos and
+            self._inicio_textos + largo_textos == len(self._mapa)
+        )
+        if not esperado:
+            raise ValueError(f"Instantánea inválida: {self.ruta} está truncada o dañada.")
+
+        self.total_pacientes = pacientes
+        self.total_atenciones = atenciones
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.cerrar()
+        return False
+
+    def cerrar(self):
+        self._mapa.close()
+
+    def __len__(self):
+        return self.total_pacientes
+
+    def __iter__(self):
+        for numero in range(self.total_pacientes):
+            yield self.paciente(numero)
+
+    def paciente(self, numero):
+        # Dict con la forma de Paciente.to_dict(); las atenciones quedan empaquetadas
+        dni, desde, largo, edad, sexo, fecha, primera, cantidad = PACIENTE.unpack_from(
+            self._mapa, CABECERA.size + numero * PACIENTE.size
+        )
+        inicio = self._inicio_textos + desde
+        inicio_atenciones = self._inicio_atenciones + primera * ATENCION.size
+        return {
+            "dni": dni.decode("ascii"),
+            "nombre": self._mapa[inicio:inicio + largo].decode("utf-8"),
+            "edad": edad,
+            "sexo": SEXOS[sexo],
+            "fecha_registro": fecha,
+            "atenciones": AtencionesEmpaquetadas(
+                self._mapa[inicio_atenciones:inicio_atenciones + cantidad * ATENCION.size]
+            )
+        }
+
+    def buscar(self, dni):
+        # Biseccion sobre el indice ordenado: O(log n) lecturas del mapa
+        clave = dni.encode("ascii")
+        bajo, alto = 0, self.total_pacientes
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            actual, numero = ENTRADA_INDICE.unpack_from(self._mapa, self._inicio_indice + medio * ENTRADA_INDICE.size)
+            if actual == clave:
+                return self.paciente(numero)
+            if actual < clave:
+                bajo = medio + 1
+            else:
+                alto = medio
+        return None
+
+
+def iterar_registros(ruta):
+    # Decodifica la cabecera de cada paciente (no sus atenciones). El mapa se
+    # cierra al terminar el recorrido: nada queda apuntando al archivo, que
+    # se puede reemplazar al guardar (tambien en Windows)
+    with Instantanea(ruta) as instantanea:
+        yield from instantanea
+
+
+def buscar_registro(ruta, dni):
+    with Instantanea(ruta) as instantanea:
+        return instantanea.buscar(dni)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from modelo import GestorDatos
+
+    # Conversion en ambos sentidos segun la extension del destino:
+    #   python instantanea.py datos.json datos.bin
+    #   python instantanea.py datos.bin datos.json
+    if len(sys.argv) != 3:
+        print("Uso: python instantanea.py <origen> <destino>")
+        sys.exit(1)
+
+    if not GestorDatos.convertir(sys.argv[1], sys.argv[2]):
+        sys.exit(1)
+    print(f"[SISTEMA] Se convirtió {sys.argv[1]} en {sys.argv[2]}.")
@@ -1,58 +1,129 @@
+import os
+import signal
 import sys
+import time
 import config
+import metricas
+import reglas
 
-from modelo import PacienteEstandar, PacienteAdultoMayor, AtencionTriage, GestorDatos, ValidadorDni, DniInvalidoException, PacienteNoEncontradoException
-from vista import Vista
+from modelo import Paciente, AtencionTriage, clase_por_edad, ValidadorDni, TriageException, DniInvalidoException, DniDuplicadoException, PacienteNoEncontradoException, ServicioNoDisponibleException
+from almacenamiento import crear_almacen
+from historial import HistorialColumnar
+from indices import AlmacenIndexado
 
 
 class Controlador:
     
     def __init__(self):
+        self._inicio = time.perf_counter()
+        if config.METRICAS:
+            metricas.activar(config.ARCHIVO_METRICAS, config.PERIODO_METRICAS, config.PERFILAR_OPERACION)
+        # tabulate es lo mas lento de importar y solo lo usa el menu interactivo
+        from vista import Vista
         self.vista = Vista()
-        self.pacientes = []
+        self._compilar_reglas()
 
-        self.cargar_datos_iniciales()
+        self.registro = self._crear_registro()
 
+        self.cargar_datos_iniciales()
+        self._atender_senales()
+
+    def _atender_senales(self):
+        # Un cierre ordenado (kill, cierre de la terminal) guarda lo pendiente
+        # igual que la opcion Salir
+        for nombre in ("SIGTERM", "SIGHUP"):
+            senal = getattr(signal, nombre, None)
+            if senal is not None:
+                signal.signal(senal, self._al_recibir_senal)
+
+    def _al_recibir_senal(self, numero, marco):
+        signal.signal(numero, signal.SIG_IGN)
+        print()
+        self.salir()
+
+    def _compilar_reglas(self):
+        # Reglas invalidas en config: mejor no arrancar que clasificar mal
+        try:
+            reglas.motor()
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] No se pudieron cargar las reglas de triaje: {e}")
+            sys.exit(1)
+
+    def _crear_registro(self):
+        if config.USAR_SERVICIO:
+            # Puesto cliente: el registro vive en el servicio compartido
+            from servicio import ClienteTriaje
+            return ClienteTriaje(config.DIRECCION_SERVICIO)
+
+        # Las consultas a SQLite crean pacientes temporales: el historial
+        # columnar (que no libera filas) solo tiene sentido con el almacen JSON
+        # que carga todo el historial
+        if config.HISTORIAL_COLUMNAR and config.ALMACEN == "json" and config.MEMORIA_ACOTADA_MB is None:
+            Paciente.usar_historial_columnar(HistorialColumnar())
+        return AlmacenIndexado(crear_almacen())
 
     def cargar_datos_iniciales(self):
         
-        self.pacientes = GestorDatos.cargar_pacientes(config.ARCHIVO_DB)
+        try:
+            self.registro.cargar()
+        except DniDuplicadoException as e:
+            print(f"[ERROR] El historial contiene DNIs duplicados: {e}")
+            print("[ERROR] Corrija el archivo de datos antes de iniciar el sistema.")
+            sys.exit(1)
+        except ServicioNoDisponibleException as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
        
-        if self.pacientes:
-            print(f"[SISTEMA] Se han cargado {len(self.pacientes)} pacientes del historial.")
+        total = self.registro.total_pacientes()
+        if total:
+            print(f"[SISTEMA] Se han cargado {total} pacientes del historial.")
         else:
             print("[SISTEMA] No hay historial previo. Iniciando base de datos nueva.")
 
 
     def _buscar_paciente_por_dni(self, dni):
-        for p in self.pacientes:
-            if p.dni == dni:
-                return p
-        return None
+        return self.registro.buscar_por_dni(dni)
 
+    @metricas.medido("controlador.registrar_paciente")
     def registrar_paciente(self):
 
+        # Cada fase por separado: lo que tarda quien tipea (entrada), el
+        # registro (clasificar, indices y guardado) y la respuesta en pantalla
+        with metricas.tramo("registrar.entrada"):
+            paciente, atencion = self._solicitar_atencion()
+
+        # Clasifica, guarda y actualiza los indices (local o en el servicio)
+        with metricas.tramo("registrar.registro"):
+            try:
+                paciente, atencion, _ = self.registro.registrar(paciente, atencion)
+            except (OSError, TriageException) as e:
+                # No se pudo guardar (localmente o en el servicio)
+                self.vista.mostrar_mensaje(str(e), "error")
+                self.vista.pausar()
+                return
+
+        with metricas.tramo("registrar.vista"):
+            self.vista.mostrar_mensaje(
+                f"Atención registrada para {paciente.nombre}.\n"
+                f"   Nivel de atención: {atencion.nivel_atencion.upper()}",
+                "exito"
+            )
+        self.vista.pausar()
+
+    def _solicitar_atencion(self):
+
         dni = self.vista.solicitar_dni("Ingrese DNI del paciente: ")
 
         paciente = self._buscar_paciente_por_dni(dni)   
 
         if paciente is None:
             datos_personales = self.vista.solicitar_datos_personales()
-            if datos_personales['edad'] < 65:
-                paciente = PacienteEstandar(
-                    dni,
-                    datos_personales['nombre'],
-                    datos_personales['edad'],
-                    datos_personales['sexo']
-                )
-            else:
-                paciente = PacienteAdultoMayor(
-                    dni,
-                    datos_personales['nombre'],
-                    datos_personales['edad'],
-                    datos_personales['sexo']
-                )
-            self.pacientes.append(paciente)
+            paciente = clase_por_edad(datos_personales['edad'])(
+                dni,
+                datos_personales['nombre'],
+                datos_personales['edad'],
+                datos_personales['sexo']
+            )
 
         # Solicitar datos de triaje
         datos_triaje = self.vista.solicitar_datos_triaje()
@@ -65,30 +136,22 @@ class Controlador:
             datos_triaje['conciencia'],
             datos_triaje['saturacion']
         )
+        return paciente, atencion
 
-        paciente.agregar_atencion(atencion)
-        paciente.clasificar_atencion(atencion)
-
-        GestorDatos.guardar_pacientes(config.ARCHIVO_DB, self.pacientes)
+    @metricas.medido("controlador.buscar_por_nombre")
+    def buscar_paciente_por_nombre(self):
+        texto = input("Ingrese el nombre a buscar: ").strip()
+        coincidencias = self.registro.buscar_por_nombre(texto)
 
-        self.vista.mostrar_mensaje(
-            f"Atención registrada para {paciente.nombre}.\n"
-            f"   Nivel de atención: {atencion.nivel_atencion.upper()}",
-            "exito"
-        )
-        self.vista.pausar()
+        if len(coincidencias) > 1:
+            # Homonimos o nombres parecidos: se listan todos, el mas parecido primero
+            self.vista.mostrar_tabla_pacientes(coincidencias, f"Coincidencias para '{texto}'")
+            return
 
-    def buscar_paciente_por_nombre(self):
-        texto = input("Ingrese el nombre a buscar: ").strip().lower()
-        encontrado = None
-        
-        for p in self.pacientes:
-            if texto in p.nombre.lower():
-                encontrado = p
-                break
-        
+        encontrado = coincidencias[0] if coincidencias else None
         self.vista.mostrar_reporte_paciente(encontrado)
     
+    @metricas.medido("controlador.buscar_por_dni")
     def buscar_paciente_por_dni(self):
         try:
             dni = self.vista.solicitar_dni("Ingrese el DNI a buscar: ") 
@@ -100,65 +163,31 @@ class Controlador:
             self.vista.pausar()
 
 
+    @metricas.medido("controlador.listar_pacientes")
     def listar_pacientes(self):
 
-        self.vista.mostrar_tabla_pacientes(self.pacientes, "Listado General")
+        self.vista.mostrar_tabla_pacientes(self.registro.listar_pacientes(), "Listado General")
 
 
+    @metricas.medido("controlador.listar_urgentes")
     def listar_urgentes(self):
-        urgentes = []
-
-        for p in self.pacientes:
-            ultima_atencion = p.obtener_ultima_atencion()
-
-            if ultima_atencion is None:
-                continue
-
-            if ultima_atencion.nivel_atencion == "Urgente":
-                urgentes.append(p)
-
-        self.vista.mostrar_tabla_pacientes(urgentes, "Listado de URGENCIAS")
+        # Ya ordenados: el primero es el siguiente a llamar
+        urgentes = self.registro.listar_urgentes()
+        self.vista.mostrar_tabla_pacientes(urgentes, "Listado de URGENCIAS (por prioridad)")
 
+    @metricas.medido("controlador.estadisticas")
     def calcular_estadisticas(self):
 
-        if not self.pacientes:
+        stats = self.registro.resumen_estadisticas()
+
+        if not stats["total"]:
             self.vista.mostrar_mensaje("No hay datos para estadísticas.", "error")
             self.vista.pausar()
             return
 
-        total = len(self.pacientes)
-        suma_edad = sum(p.edad for p in self.pacientes)
-        promedio = round(suma_edad / total, 1)
-
-        conteo_atencion = {"Urgente": 0, "Normal": 0}
-        conteo_imc = {
-            "Bajo peso": 0,
-            "Normal": 0,
-            "Sobrepeso": 0,
-            "Obesidad": 0,
-            "Error (Talla 0)": 0
-        }
-
-        for p in self.pacientes:
-            atencion = p.obtener_ultima_atencion()
-            if atencion is None:
-                continue
-
-            if atencion.nivel_atencion in conteo_atencion:
-                conteo_atencion[atencion.nivel_atencion] += 1
-
-            if atencion.clasificacion_imc in conteo_imc:
-                conteo_imc[atencion.clasificacion_imc] += 1
-
-        stats = {
-            "total": total,
-            "promedio_edad": promedio,
-            "por_atencion": conteo_atencion,
-            "por_imc": conteo_imc
-        }
-
         self.vista.mostrar_estadisticas(stats)
     
+    @metricas.medido("controlador.ver_historial")
     def ver_historial_paciente(self):
         try:
             dni = self.vista.solicitar_dni()
@@ -170,7 +199,8 @@ class Controlador:
                     f"No se encontró paciente con DNI {dni}."
                 )
 
-            self.vista.mostrar_historial_paciente(paciente)
+            # Lo archivado se lee recien ahora, solo para este paciente
+            self.vista.mostrar_historial_paciente(paciente, self.registro.historial_archivado(dni))
 
         except (PacienteNoEncontradoException, DniInvalidoException) as e:
             self.vista.mostrar_mensaje(str(e), "error")
@@ -178,7 +208,9 @@ class Controlador:
 
     def salir(self):
 
-        if GestorDatos.guardar_pacientes(config.ARCHIVO_DB, self.pacientes):
+        with metricas.tramo("controlador.cerrar"):
+            guardado = self.registro.cerrar()
+        if guardado:
             print(config.MSG_DESPEDIDA)
         else:
             print("Error al guardar los datos finales.")
@@ -186,12 +218,29 @@ class Controlador:
 
 
     def ejecutar(self):
+        try:
+            self._ciclo_menu()
+        except (KeyboardInterrupt, EOFError):
+            # Ctrl+C o fin de la entrada: se sale guardando
+            print()
+            self.salir()
+
+    def _ciclo_menu(self):
 
         while True:
             self.vista.limpiar_pantalla()
             self.vista.mostrar_encabezado()
             self.vista.mostrar_menu_principal()
-            
+
+            if self._inicio is not None:
+                # Tiempo hasta el primer menu y memoria tras la carga inicial
+                segundos = time.perf_counter() - self._inicio
+                print(f"[SISTEMA] Menú listo en {segundos:.2f} s | Memoria residente: {_memoria_residente_mb():.1f} MB")
+                metricas.observar("controlador.arranque", segundos)
+                self._inicio = None
+
+            # Si se edito config.ARCHIVO_REGLAS, la proxima atencion ya usa las nuevas
+            reglas.recargar_si_cambio()
             opcion = self.vista.solicitar_opcion()
 
             if opcion == '1':
@@ -215,8 +264,29 @@ class Controlador:
                 self.vista.pausar()
 
 
+def _memoria_residente_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    # Pico de memoria: KB en Linux, bytes en macOS
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / (1024 * 1024) if sys.platform == "darwin" else maximo / 1024
+
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Modo sin menu para scripts: python main.py <comando> (ver comandos.py)
+        from comandos import ejecutar_comando
+        sys.exit(ejecutar_comando(sys.argv[1:]))
+
     app = Controlador()
     app.ejecutar()
 
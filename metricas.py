@@ -0,0 +1,253 @@
+import atexit
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Metricas de latencia por operacion (opcionales, config.METRICAS).
+# Desactivadas, medido() y tramo() solo comprueban una variable del modulo;
+# activadas, cada operacion suma su duracion a un histograma y los contadores
+# se exportan a un archivo (texto de Prometheus, o JSON si termina en .json)
+# cada cierto tiempo y al salir.
+
+# Limites superiores (segundos) de las cubetas de cada histograma
+LIMITES = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIJO = "triaje"
+
+_activas = None
+_NULO = nullcontext()
+
+
+class Histograma:
+
+    __slots__ = ("cubetas", "cantidad", "suma", "maximo")
+
+    def __init__(self):
+        # Una cubeta por limite y la ultima para lo que los supera a todos
+        self.cubetas = [0] * (len(LIMITES) + 1)
+        self.cantidad = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def observar(self, segundos):
+        indice = 0
+        while indice < len(LIMITES) and segundos > LIMITES[indice]:
+            indice += 1
+        self.cubetas[indice] += 1
+        self.cantidad += 1
+        self.suma += segundos
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def percentil(self, fraccion):
+        # Limite de la cubeta donde cae el percentil (cota superior)
+        if not self.cantidad:
+            return 0.0
+        objetivo = fraccion * self.cantidad
+        acumulado = 0
+        for limite, cantidad in zip(LIMITES, self.cubetas):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return limite
+        return self.maximo
+
+    def to_dict(self):
+        return {
+            "cantidad": self.cantidad,
+            "suma": self.suma,
+            "maximo": self.maximo,
+            "p50": self.percentil(0.5),
+            "p95": self.percentil(0.95),
+            "cubetas": dict(zip([str(l) for l in LIMITES] + ["+Inf"], self.cubetas)),
+        }
+
+
+class Metricas:
+
+    def __init__(self, archivo=None, perfilar=None):
+        self.archivo = archivo
+        # Nombre de una operacion a perfilar con cProfile la proxima vez que corra
+        self.perfilar = perfilar
+        self.histogramas = {}
+        self.contadores = {}
+        self._mutex = threading.Lock()
+
+    def observar(self, nombre, segundos):
+        with self._mutex:
+            histograma = self.histogramas.get(nombre)
+            if histograma is None:
+                histograma = self.histogramas[nombre] = Histograma()
+            histograma.observar(segundos)
+
+    def contar(self, nombre, cantidad=1):
+        with self._mutex:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def to_dict(self):
+        with self._mutex:
+            return {
+                "operaciones": {nombre: h.to_dict() for nombre, h in sorted(self.histogramas.items())},
+                "contadores": dict(sorted(self.contadores.items())),
+            }
+
+    def texto_prometheus(self):
+        lineas = []
+        with self._mutex:
+            if self.histogramas:
+                familia = f"{PREFIJO}_operacion_segundos"
+                lineas.append(f"# HELP {familia} Duracion de cada operacion.")
+                lineas.append(f"# TYPE {familia} histogram")
+                for nombre, h in sorted(self.histogramas.items()):
+                    acumulado = 0
+                    for limite, cantidad in zip(list(LIMITES) + ["+Inf"], h.cubetas):
+                        acumulado += cantidad
+                        lineas.append(f'{familia}_bucket{{operacion="{nombre}",le="{limite}"}} {acumulado}')
+                    lineas.append(f'{familia}_sum{{operacion="{nombre}"}} {h.suma}')
+                    lineas.append(f'{familia}_count{{operacion="{nombre}"}} {h.cantidad}')
+
+            for nombre, valor in sorted(self.contadores.items()):
+                familia = f"{PREFIJO}_{nombre.replace('.', '_')}_total"
+                lineas.append(f"# TYPE {familia} counter")
+                lineas.append(f"{familia} {valor}")
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self, archivo=None):
+        archivo = archivo or self.archivo
+        if archivo is None:
+            return False
+        if archivo.endswith(".json"):
+            contenido = json.dumps(self.to_dict(), indent=2)
+        else:
+            contenido = self.texto_prometheus()
+
+        # Temporal + renombrado: quien lo lee nunca ve un archivo a medias
+        temporal = archivo + ".tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as f:
+                f.write(contenido)
+            os.replace(temporal, archivo)
+            return True
+        except OSError as e:
+            print(f"[ERROR] No se pudieron exportar las métricas: {e}")
+            return False
+
+
+class _Tramo:
+
+    __slots__ = ("nombre", "inicio", "perfil")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.perfil = None
+
+    def __enter__(self):
+        metricas = _activas
+        if metricas is not None and metricas.perfilar == self.nombre:
+            # Una sola captura: la operacion deja de estar pendiente
+            metricas.perfilar = None
+            self.perfil = cProfile.Profile()
+            self.perfil.enable()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        segundos = time.perf_counter() - self.inicio
+        metricas = _activas
+        if self.perfil is not None:
+            self.perfil.disable()
+            _guardar_perfil(self.perfil, self.nombre, metricas)
+        if metricas is not None:
+            metricas.observar(self.nombre, segundos)
+        return False
+
+
+def _guardar_perfil(perfil, nombre, metricas):
+    base = metricas.archivo if metricas is not None and metricas.archivo else os.path.join(os.getcwd(), "metricas")
+    ruta = f"{base}.{nombre}.prof"
+    try:
+        perfil.dump_stats(ruta)
+        print(f"[SISTEMA] Perfil de {nombre} guardado en {ruta} (python -m pstats {ruta})")
+    except OSError as e:
+        print(f"[ERROR] No se pudo guardar el perfil de {nombre}: {e}")
+
+
+def tramo(nombre):
+    # with metricas.tramo("registrar.entrada"): ...
+    if _activas is None:
+        return _NULO
+    return _Tramo(nombre)
+
+
+def medido(nombre):
+    # Decorador: la llamada completa se mide como la operacion nombre
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if _activas is None:
+                return funcion(*args, **kwargs)
+            with _Tramo(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def observar(nombre, segundos):
+    if _activas is not None:
+        _activas.observar(nombre, segundos)
+
+
+def contar(nombre, cantidad=1):
+    if _activas is not None:
+        _activas.contar(nombre, cantidad)
+
+
+def activas():
+    return _activas
+
+
+class _Exportador(threading.Thread):
+
+    def __init__(self, metricas, periodo):
+        super().__init__(name="exportador-metricas", daemon=True)
+        self.metricas = metricas
+        self.periodo = periodo
+        self.detenido = threading.Event()
+
+    def run(self):
+        while not self.detenido.wait(self.periodo):
+            self.metricas.exportar()
+
+
+_exportador = None
+
+
+def activar(archivo=None, periodo=None, perfilar=None):
+    # Reemplaza las metricas activas (si las habia) por unas vacias
+    global _activas, _exportador
+    desactivar()
+    _activas = Metricas(archivo, perfilar)
+    if archivo is not None:
+        if periodo:
+            _exportador = _Exportador(_activas, periodo)
+            _exportador.start()
+        atexit.register(_exportar_al_salir)
+    return _activas
+
+
+def desactivar():
+    global _activas, _exportador
+    if _exportador is not None:
+        _exportador.detenido.set()
+        _exportador.join()
+        _exportador = None
+    metricas, _activas = _activas, None
+    atexit.unregister(_exportar_al_salir)
+    return metricas
+
+
+def _exportar_al_salir():
+    if _activas is not None:
+        _activas.exportar()
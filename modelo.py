@@ -1,5 +1,16 @@
+import hashlib
 import json
-from datetime import datetime
+import os
+import time
+from collections import defaultdict
+
+import instantanea
+from bitacora import Bitacora
+from bloqueo import reemplazar_atomico
+import config
+import metricas
+import reglas
+from historial import marca_tiempo
 
 class TriageException(Exception):
     pass
@@ -10,6 +21,9 @@ class DniDuplicadoException(TriageException):
 class PacienteNoEncontradoException(TriageException):
     pass
 
+class ServicioNoDisponibleException(TriageException):
+    pass
+
 class DniInvalidoException(Exception):
     pass
 
@@ -31,6 +45,8 @@ class ValidadorDni:
 
 class Persona:
 
+    __slots__ = ("_dni", "_nombre", "_sexo", "_edad")
+
     def __init__(self, dni, nombre, edad, sexo):
         self.dni = dni
         self.nombre = nombre
@@ -79,10 +95,48 @@ class Persona:
 
 class Paciente(Persona):
 
+    __slots__ = ("_fecha_registro", "_lista_atencion_triaje", "_atenciones_pendientes", "_historial_confiable")
+
+    # HistorialColumnar compartido por todos los pacientes, o None para
+    # guardar cada atencion como objeto (ver usar_historial_columnar)
+    historial_columnar = None
+
     def __init__(self, dni, nombre, edad, sexo):
         super().__init__(dni, nombre, edad, sexo)
-        self.fecha_registro = datetime.now().strftime("%d-%m-%Y %H:%M")
-        self._lista_atencion_triaje = []
+        self.fecha_registro = int(time.time())
+        self._lista_atencion_triaje = self._nueva_lista_atenciones()
+        # Atenciones antiguas aun sin construir (dicts tal como se leyeron)
+        self._atenciones_pendientes = []
+        self._historial_confiable = False
+
+    @classmethod
+    def from_dict(cls, d, confiable=False):
+        if confiable:
+            # Datos escritos por GestorDatos y verificados con su firma:
+            # se omiten las validaciones y la normalizacion de los setters
+            p = cls.__new__(cls)
+            p._dni = d["dni"]
+            p._nombre = d["nombre"]
+            p._edad = d["edad"]
+            p._sexo = d["sexo"]
+            p._lista_atencion_triaje = p._nueva_lista_atenciones()
+            p._atenciones_pendientes = []
+        else:
+            p = cls(d["dni"], d["nombre"], d["edad"], d["sexo"])
+
+        p._fecha_registro = marca_tiempo(d.get("fecha_registro"))
+        p.agregar_atenciones_pendientes(d.get("atenciones", []), confiable)
+        return p
+
+    @staticmethod
+    def usar_historial_columnar(historial):
+        # Debe llamarse antes de crear o cargar pacientes
+        Paciente.historial_columnar = historial
+
+    def _nueva_lista_atenciones(self):
+        if Paciente.historial_columnar is None:
+            return []
+        return Paciente.historial_columnar.nuevas_filas()
 
     @property
     def fecha_registro(self):
@@ -90,27 +144,77 @@ class Paciente(Persona):
 
     @fecha_registro.setter
     def fecha_registro(self, valor):
-        self._fecha_registro = valor
+        # Segundos Unix; acepta el texto de los archivos anteriores
+        self._fecha_registro = marca_tiempo(valor)
 
     @property
     def lista_atencion_triage(self):
-        return self._lista_atencion_triaje
+        return self.obtener_atenciones()
 
     @lista_atencion_triage.setter
     def lista_atencion_triage(self, valor):
+        self._atenciones_pendientes = []
         self._lista_atencion_triaje = valor
 
     def agregar_atencion(self, atencion):
         self._lista_atencion_triaje.append(atencion)
 
+    def agregar_atenciones_pendientes(self, atenciones, confiable=False):
+        # Historial leido del archivo: solo se construye la ultima atencion,
+        # el resto espera hasta que alguien pida el historial completo
+        self._historial_confiable = confiable
+        if not atenciones:
+            return
+
+        if Paciente.historial_columnar is not None:
+            # En columnas el historial ya es compacto: se guarda completo
+            if confiable:
+                self._lista_atencion_triaje.extender_dicts(atenciones)
+            else:
+                for a in atenciones:
+                    self._lista_atencion_triaje.append(AtencionTriage.from_dict(a))
+            return
+
+        # Una lista de dicts o, desde una instantanea binaria, las atenciones
+        # todavia empaquetadas (se decodifican en obtener_atenciones)
+        anteriores = atenciones[:-1]
+        if self._atenciones_pendientes:
+            anteriores = self._atenciones_pendientes + anteriores
+        self._atenciones_pendientes = anteriores
+        self._lista_atencion_triaje.append(AtencionTriage.from_dict(atenciones[-1], confiable))
+
     def obtener_atenciones(self):
+        if self._atenciones_pendientes:
+            anteriores = [
+                AtencionTriage.from_dict(a, self._historial_confiable)
+                for a in self._atenciones_pendientes
+            ]
+            self._lista_atencion_triaje[:0] = anteriores
+            self._atenciones_pendientes = []
         return self._lista_atencion_triaje
 
     def obtener_ultima_atencion(self):
         return self._lista_atencion_triaje[-1] if self._lista_atencion_triaje else None
 
+    def cantidad_atenciones(self):
+        return len(self._atenciones_pendientes) + len(self._lista_atencion_triaje)
+
+    def marcas_atenciones(self):
+        # Fecha de cada atencion, en el orden de obtener_atenciones(), sin
+        # construir las atenciones pendientes
+        pendientes = self._atenciones_pendientes
+        if isinstance(pendientes, list):
+            marcas = [marca_tiempo(a.get("fecha_registro")) for a in pendientes]
+        else:
+            marcas = pendientes.marcas()
+        return marcas + [marca_tiempo(a.fecha_registro) for a in self._lista_atencion_triaje]
+
     def clasificar_atencion(self, atencion):
-        raise NotImplementedError("Debe implementarse en las subclases.")
+        # Reglas de config.REGLAS_TRIAJE (reglas.py) segun la franja de edad
+        atencion.nivel_atencion = reglas.motor().clasificar(
+            self.edad, atencion.presion, atencion.frecuencia, atencion.saturacion, atencion.conciencia
+        )
+        return atencion.nivel_atencion
 
     def to_dict(self):
         return {
@@ -119,38 +223,41 @@ class Paciente(Persona):
             "edad": self.edad,
             "sexo": self.sexo,
             "fecha_registro": self._fecha_registro,
-            "atenciones": [a.to_dict() for a in self._lista_atencion_triaje]
+            "atenciones": self._dicts_pendientes() + [a.to_dict() for a in self._lista_atencion_triaje]
         }
 
+    def _dicts_pendientes(self):
+        pendientes = self._atenciones_pendientes
+        if self._historial_confiable or not isinstance(pendientes, list):
+            return pendientes
+        # Archivo anterior: las fechas pueden venir como texto
+        return [dict(a, fecha_registro=marca_tiempo(a.get("fecha_registro"))) for a in pendientes]
+
 class PacienteEstandar(Paciente):
 
-    def clasificar_atencion(self, atencion):
-        es_urgente = (
-            atencion.presion < 90 or atencion.presion > 180 or
-            atencion.frecuencia > 100 or
-            atencion.saturacion < 92 or
-            atencion.conciencia != "Alerta"
-        )
+    __slots__ = ()
 
-        atencion.nivel_atencion = "Urgente" if es_urgente else "Normal"
-        return atencion.nivel_atencion
-    
 
 class PacienteAdultoMayor(Paciente):
 
-    def clasificar_atencion(self, atencion):
-        es_urgente = (
-            atencion.presion < 100 or atencion.presion > 160 or
-            atencion.frecuencia < 55 or atencion.frecuencia > 110 or
-            atencion.saturacion < 94 or
-            atencion.conciencia != "Alerta"
-        )
+    __slots__ = ()
+
+
+def clase_por_edad(edad):
+    # La ultima franja de las reglas (la de mayor edad, sin tope) es la de
+    # PacienteAdultoMayor; las anteriores, PacienteEstandar
+    motor = reglas.motor()
+    ultima = len(motor.franjas) - 1
+    return PacienteAdultoMayor if ultima > 0 and motor.franja(edad) == ultima else PacienteEstandar
 
-        atencion.nivel_atencion = "Urgente" if es_urgente else "Normal"
-        return atencion.nivel_atencion
-    
 
 class AtencionTriage:
+
+    __slots__ = (
+        "_peso", "_talla", "_presion", "_frecuencia", "_conciencia", "_saturacion",
+        "_imc", "_clasificacion_imc", "_nivel_atencion", "_fecha_registro"
+    )
+
     def __init__(self, peso, talla, presion, frecuencia, conciencia, saturacion):
         self.peso = peso
         self.talla = talla
@@ -162,7 +269,7 @@ class AtencionTriage:
         self._imc = 0.0
         self._clasificacion_imc = ""
         self._nivel_atencion = ""
-        self._fecha_registro = datetime.now().strftime("%d-%m-%Y %H:%M") 
+        self._fecha_registro = int(time.time())
 
         self.calcular_imc()
 
@@ -262,7 +369,7 @@ class AtencionTriage:
 
     @fecha_registro.setter
     def fecha_registro(self, valor):
-        self._fecha_registro = valor   
+        self._fecha_registro = marca_tiempo(valor)
     
     def calcular_imc(self):
         try:
@@ -282,6 +389,35 @@ class AtencionTriage:
             self._imc = 0.0
             self._clasificacion_imc = "Error (Talla 0)"
 
+    @classmethod
+    def from_dict(cls, a, confiable=False):
+        if confiable:
+            at = cls.__new__(cls)
+            at._peso = a["peso"]
+            at._talla = a["talla"]
+            at._presion = a["presion"]
+            at._frecuencia = a["frecuencia"]
+            at._conciencia = a["conciencia"]
+            at._saturacion = a["saturacion"]
+            at._imc = a["imc"]
+            at._clasificacion_imc = a["clasificacion_imc"]
+            at._nivel_atencion = a["nivel_atencion"]
+            # Las atenciones pendientes se reescriben tal como se leyeron:
+            # pueden traer la fecha en el texto de versiones anteriores
+            at._fecha_registro = marca_tiempo(a["fecha_registro"])
+            return at
+
+        at = cls(
+            a["peso"], a["talla"], a["presion"],
+            a["frecuencia"], a["conciencia"], a["saturacion"]
+        )
+        # sobrescribimos con lo que había en el JSON
+        at._imc = a.get("imc", at.imc)
+        at._clasificacion_imc = a.get("clasificacion_imc", "")
+        at.nivel_atencion = a.get("nivel_atencion", "")
+        at.fecha_registro = a.get("fecha_registro", at.fecha_registro)
+        return at
+
     def to_dict(self):
         return {
             "peso": self._peso,
@@ -296,50 +432,192 @@ class AtencionTriage:
             "fecha_registro": self._fecha_registro
         }    
 
+class RegistroPacientes:
+
+    # Indice dni -> Paciente; el dict conserva el orden de insercion y la
+    # lista (en el mismo orden) permite pedir una pagina sin recorrer todo
+    def __init__(self, pacientes=None):
+        self._por_dni = {}
+        self._orden = []
+        for p in pacientes or []:
+            self.agregar(p)
+
+    def agregar(self, paciente):
+        if paciente.dni in self._por_dni:
+            raise DniDuplicadoException(
+                f"Ya existe un paciente registrado con DNI {paciente.dni}."
+            )
+        self._por_dni[paciente.dni] = paciente
+        self._orden.append(paciente)
+
+    def buscar(self, dni):
+        return self._por_dni.get(dni)
+
+    def __contains__(self, dni):
+        return dni in self._por_dni
+
+    def __len__(self):
+        return len(self._por_dni)
+
+    def __iter__(self):
+        return iter(self._por_dni.values())
+
+    def pagina(self, desde, cantidad):
+        return self._orden[desde:desde + cantidad]
+
 class GestorDatos:
 
+    # Se incrementa si cambia la forma de los registros: un archivo firmado
+    # con otra version se vuelve a validar al cargarlo
+    FORMATO_VERSION = 2
+
     @staticmethod
     def guardar_pacientes(archivo, lista_pacientes):
-        lista_dicts = [p.to_dict() for p in lista_pacientes]
+        return GestorDatos._guardar_dicts(archivo, [p.to_dict() for p in lista_pacientes])
+
+    @staticmethod
+    def compactar_en_disco(archivo):
+        # Vuelca la bitacora en el archivo leyendo ambos de disco, sin pasar
+        # por un registro en memoria (lo usan el guardado en segundo plano,
+        # que no puede recorrer el registro mientras se sigue registrando, y
+        # el modo de memoria acotada): de a un paciente por vez
+        return GestorDatos._guardar_dicts(archivo, GestorDatos._iterar_dicts_con_bitacora(archivo))
+
+    @staticmethod
+    def convertir(origen, destino):
+        # Entre JSON e instantanea binaria (segun la extension de cada ruta),
+        # con la bitacora del origen ya aplicada
+        return GestorDatos._guardar_dicts(destino, GestorDatos._dicts_con_bitacora(origen))
+
+    @staticmethod
+    def _dicts_con_bitacora(archivo):
+        return list(GestorDatos._iterar_dicts_con_bitacora(archivo))
+
+    @staticmethod
+    def _iterar_dicts_con_bitacora(archivo):
+        nuevos, atenciones = GestorDatos._registros_bitacora(archivo)
+
+        def completar(d):
+            d["atenciones"] = d.get("atenciones", []) + atenciones.get(d["dni"], [])
+            # Un archivo anterior puede traer las fechas como texto
+            d["fecha_registro"] = marca_tiempo(d.get("fecha_registro"))
+            for a in d["atenciones"]:
+                a["fecha_registro"] = marca_tiempo(a.get("fecha_registro"))
+            return d
+
+        if os.path.exists(archivo):
+            for d in GestorDatos._iterar_registros(archivo):
+                nuevos.pop(d["dni"], None)
+                yield completar(d)
+        for d in nuevos.values():
+            yield completar(dict(d, atenciones=[]))
+
+    @staticmethod
+    def _trozos_json(dicts):
+        # El mismo texto que JSONEncoder(indent=4).iterencode(lista), pero de
+        # a un registro: sirve para un iterador que no cabe en memoria
+        vacio = True
+        yield "["
+        for d in dicts:
+            yield ("\n    " if vacio else ",\n    ") + json.dumps(d, indent=4).replace("\n", "\n    ")
+            vacio = False
+        yield "]" if vacio else "\n]"
 
+    @staticmethod
+    @metricas.medido("gestor.guardar")
+    def _guardar_dicts(archivo, lista_dicts):
+        # Se escribe un temporal y se renombra encima: un corte a mitad de
+        # la escritura deja intacto el archivo anterior
+        temporal = archivo + ".tmp"
         try:
-            with open(archivo, "w", encoding="utf-8") as f:
-                json.dump(lista_dicts, f, indent=4)
+            if instantanea.es_instantanea(archivo):
+                trozos = instantanea.codificar(lista_dicts)
+            elif isinstance(lista_dicts, list):
+                trozos = (t.encode("utf-8") for t in json.JSONEncoder(indent=4).iterencode(lista_dicts))
+            else:
+                trozos = (t.encode("utf-8") for t in GestorDatos._trozos_json(lista_dicts))
+
+            resumen = hashlib.sha256()
+            escritos = 0
+            # En binario para que el sello coincida con los bytes escritos en cualquier SO
+            with open(temporal, "wb") as f:
+                for trozo in trozos:
+                    f.write(trozo)
+                    resumen.update(trozo)
+                    escritos += len(trozo)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, archivo)
+            metricas.contar("gestor.bytes_escritos", escritos)
+            metricas.contar("gestor.guardados")
+
+            GestorDatos._escribir_sello(archivo, resumen.hexdigest(), GestorDatos.leer_version(archivo) + 1)
+
+            # El archivo ya contiene todo lo que habia en la bitacora
+            Bitacora(Bitacora.ruta_para(archivo)).vaciar()
             return True
         
         except Exception as e:
             print(f"Error al guardar: {e}")
+            try:
+                os.remove(temporal)
+            except OSError:
+                pass
             return False
 
     @staticmethod
-    def cargar_pacientes(archivo):
-        lista_pacientes = []
+    def registrar_atencion(archivo, lista_pacientes, paciente, atencion, es_nuevo=False, umbral_compactacion=None):
+        return GestorDatos.registrar_atenciones(
+            archivo, lista_pacientes, [(paciente, atencion, es_nuevo)], umbral_compactacion
+        )
 
+    @staticmethod
+    @metricas.medido("gestor.registrar_bitacora")
+    def registrar_atenciones(archivo, lista_pacientes, cambios, umbral_compactacion=None):
+        # Anexa solo los cambios (paciente, atencion, es_nuevo) a la bitacora,
+        # en una sola escritura, en lugar de reescribir todo el archivo
+        registros = []
+        for paciente, atencion, es_nuevo in cambios:
+            if es_nuevo:
+                datos_paciente = paciente.to_dict()
+                del datos_paciente["atenciones"]
+                registros.append({"tipo": "paciente", "paciente": datos_paciente})
+            registros.append({"tipo": "atencion", "dni": paciente.dni, "atencion": atencion.to_dict()})
+
+        bitacora = Bitacora(Bitacora.ruta_para(archivo))
         try:
-            with open(archivo, "r", encoding="utf-8") as f:
-                datos = json.load(f)
-
-            for d in datos:
-                # elegir clase por edad
-                Clase = PacienteEstandar if d["edad"] < 65 else PacienteAdultoMayor
-                p = Clase(d["dni"], d["nombre"], d["edad"], d["sexo"])
-                p.fecha_registro = d.get("fecha_registro", "")
-
-                for a in d.get("atenciones", []):
-                    at = AtencionTriage(
-                        a["peso"], a["talla"], a["presion"],
-                        a["frecuencia"], a["conciencia"], a["saturacion"]
-                    )
-                    # sobrescribimos con lo que había en el JSON
-                    at._imc = a.get("imc", at.imc)
-                    at._clasificacion_imc = a.get("clasificacion_imc", "")
-                    at.nivel_atencion = a.get("nivel_atencion", "")
-                    at.fecha_registro = a.get("fecha_registro", at.fecha_registro)
-
-                    p.agregar_atencion(at)
-
-                lista_pacientes.append(p)
+            bitacora.agregar(registros, GestorDatos._firma_archivo(archivo))
+            GestorDatos._incrementar_version(archivo)
+        except Exception as e:
+            print(f"Error al guardar: {e}")
+            return False
+
+        if umbral_compactacion is not None:
+            return GestorDatos.compactar(archivo, lista_pacientes, umbral_compactacion)
+        return True
+
+    @staticmethod
+    def compactar(archivo, lista_pacientes, umbral=0):
+        # Vuelca la bitacora en el archivo principal cuando supera el umbral
+        if Bitacora(Bitacora.ruta_para(archivo)).tamano() <= umbral:
+            return True
+        return GestorDatos.guardar_pacientes(archivo, lista_pacientes)
 
+    @staticmethod
+    @metricas.medido("gestor.cargar")
+    def cargar_pacientes(archivo):
+        lista_pacientes = RegistroPacientes()
+
+        try:
+            # Solo se omite la validacion si el archivo es el que escribimos
+            confiable = GestorDatos._archivo_verificado(archivo)
+            for d in GestorDatos._iterar_registros(archivo):
+                lista_pacientes.agregar(GestorDatos._paciente_desde_dict(d, confiable))
+
+        except DniDuplicadoException:
+            # No se puede continuar con un historial inconsistente:
+            # guardarlo despues perderia a uno de los pacientes duplicados
+            raise
         except FileNotFoundError:
             print("[SISTEMA] Archivo de datos no encontrado. Iniciando base de datos nueva.")
         except json.JSONDecodeError as e:
@@ -347,6 +625,201 @@ class GestorDatos:
         except Exception as e:
             print(f"[ERROR] Error inesperado al cargar datos: {e}")
 
+        GestorDatos._aplicar_bitacora(archivo, lista_pacientes)
+        metricas.contar("gestor.registros_cargados", len(lista_pacientes))
+
         return lista_pacientes
 
+    @staticmethod
+    def iterar_pacientes(archivo, dni=None):
+        # Recorre los pacientes (con la bitacora aplicada) de a uno, sin armar
+        # el registro completo; con dni solo se construye ese paciente.
+        # Es de solo lectura: no imprime ni descarta nada.
+        nuevos, atenciones = GestorDatos._registros_bitacora(archivo)
+
+        def con_bitacora(d, confiable=False):
+            paciente = GestorDatos._paciente_desde_dict(d, confiable)
+            for a in atenciones.get(paciente.dni, []):
+                paciente.agregar_atencion(AtencionTriage.from_dict(a))
+            return paciente
+
+        if os.path.exists(archivo):
+            confiable = dni is None and GestorDatos._archivo_verificado(archivo)
+            registros = GestorDatos._iterar_registros(archivo)
+            if dni is not None and instantanea.es_instantanea(archivo):
+                # La instantanea tiene indice por DNI: no hace falta recorrerla
+                encontrado = instantanea.buscar_registro(archivo, dni)
+                registros = [] if encontrado is None else [encontrado]
+
+            for d in registros:
+                # Un alta en la bitacora de un DNI que ya esta en el archivo
+                # solo aporta sus atenciones (ver _aplicar_bitacora)
+                nuevos.pop(d["dni"], None)
+                if dni is None:
+                    yield con_bitacora(d, confiable)
+                elif d["dni"] == dni:
+                    yield con_bitacora(d)
+                    return
+
+        for d in nuevos.values():
+            if dni is None or d["dni"] == dni:
+                yield con_bitacora(d)
+
+    @staticmethod
+    def _registros_bitacora(archivo):
+        # Altas (dni -> datos) y atenciones por DNI de la bitacora vigente
+        base, registros = Bitacora(Bitacora.ruta_para(archivo)).leer()
+        if base != GestorDatos._firma_archivo(archivo):
+            # Bitacora vencida: la descarta cargar_pacientes al iniciar el sistema
+            registros = []
+
+        nuevos = {}
+        atenciones = defaultdict(list)
+        for r in registros:
+            if r["tipo"] == "paciente":
+                nuevos.setdefault(r["paciente"]["dni"], r["paciente"])
+            elif r["tipo"] == "atencion":
+                atenciones[r["dni"]].append(r["atencion"])
+        return nuevos, atenciones
+
+    @staticmethod
+    def _aplicar_bitacora(archivo, lista_pacientes):
+        bitacora = Bitacora(Bitacora.ruta_para(archivo))
+        base, registros = bitacora.leer()
+
+        if not registros:
+            return
+
+        if base != GestorDatos._firma_archivo(archivo):
+            # El archivo principal cambio despues de escribir la bitacora
+            # (p. ej. una compactacion interrumpida): sus registros ya no aplican
+            print("[SISTEMA] Se descartó una bitácora que no corresponde al archivo de datos.")
+            bitacora.descartar()
+            return
+
+        for r in registros:
+            if r["tipo"] == "paciente":
+                # Dos puestos pueden dar de alta el mismo DNI a la vez: se
+                # conserva el primero y las atenciones de ambos se suman a el
+                if r["paciente"]["dni"] not in lista_pacientes:
+                    lista_pacientes.agregar(GestorDatos._paciente_desde_dict(r["paciente"]))
+            elif r["tipo"] == "atencion":
+                paciente = lista_pacientes.buscar(r["dni"])
+                if paciente is None:
+                    print(f"[ERROR] La bitácora contiene una atención para un DNI desconocido: {r['dni']}")
+                    continue
+                paciente.agregar_atencion(AtencionTriage.from_dict(r["atencion"]))
+
+        print(f"[SISTEMA] Se aplicaron {len(registros)} registros de la bitácora.")
+
+    @staticmethod
+    def _iterar_registros(archivo, tamano_bloque=1 << 16):
+        # Lee el arreglo JSON de a un paciente por vez, sin cargar el archivo entero
+        if instantanea.es_instantanea(archivo):
+            yield from instantanea.iterar_registros(archivo)
+            return
+
+        decodificador = json.JSONDecoder()
+
+        with open(archivo, "r", encoding="utf-8") as f:
+            buffer = f.read(tamano_bloque)
+            pos = 0
+            fin_archivo = not buffer
+            esperando_inicio = True
+
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+
+                if pos >= len(buffer):
+                    if fin_archivo:
+                        raise json.JSONDecodeError("Fin de archivo inesperado", buffer, pos)
+                    buffer = buffer[pos:] + f.read(tamano_bloque)
+                    pos = 0
+                    fin_archivo = len(buffer) == 0
+                    continue
+
+                if esperando_inicio:
+                    if buffer[pos] != "[":
+                        raise json.JSONDecodeError("Se esperaba un arreglo de pacientes", buffer, pos)
+                    esperando_inicio = False
+                    pos += 1
+                    continue
+
+                if buffer[pos] == "]":
+                    return
+
+                try:
+                    registro, fin = decodificador.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Registro partido entre dos bloques: leer mas y reintentar
+                    bloque = f.read(tamano_bloque)
+                    if not bloque:
+                        raise
+                    buffer = buffer[pos:] + bloque
+                    pos = 0
+                    continue
+
+                yield registro
+                pos = fin
+
+    @staticmethod
+    def _ruta_sello(archivo):
+        return archivo + ".meta"
+
+    @staticmethod
+    def _leer_sello(archivo):
+        try:
+            with open(GestorDatos._ruta_sello(archivo), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _escribir_sello(archivo, sha256, version):
+        # version cuenta todas las escrituras (guardados y anexos a la
+        # bitacora): si cambio desde que un proceso cargo el historial,
+        # otro proceso escribio entretanto
+        reemplazar_atomico(GestorDatos._ruta_sello(archivo), json.dumps({
+            "formato": GestorDatos.FORMATO_VERSION, "sha256": sha256, "version": version
+        }))
+
+    @staticmethod
+    def leer_version(archivo):
+        sello = GestorDatos._leer_sello(archivo)
+        return sello.get("version", 0) if sello else 0
+
+    @staticmethod
+    def _incrementar_version(archivo):
+        sello = GestorDatos._leer_sello(archivo) or {}
+        GestorDatos._escribir_sello(archivo, sello.get("sha256"), sello.get("version", 0) + 1)
+
+    @staticmethod
+    def _archivo_verificado(archivo):
+        sello = GestorDatos._leer_sello(archivo)
+        if sello is None:
+            return False
+
+        if sello.get("formato") != GestorDatos.FORMATO_VERSION:
+            return False
+
+        resumen = hashlib.sha256()
+        with open(archivo, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                resumen.update(bloque)
+        return resumen.hexdigest() == sello.get("sha256")
+
+    @staticmethod
+    def _firma_archivo(archivo):
+        try:
+            st = os.stat(archivo)
+        except FileNotFoundError:
+            return None
+        return {"tamano": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    @staticmethod
+    def _paciente_desde_dict(d, confiable=False):
+        # elegir clase por edad
+        return clase_por_edad(d["edad"]).from_dict(d, confiable)
+
     
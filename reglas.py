@@ -0,0 +1,215 @@
+import json
+import operator
+import os
+from functools import lru_cache
+
+import config
+from historial import CONCIENCIAS, NIVELES_ATENCION
+
+# Motor de reglas de triaje: la tabla de config.REGLAS_TRIAJE (o del archivo
+# config.ARCHIVO_REGLAS) se valida y se compila una vez a una funcion de
+# Python con las comparaciones escritas en linea. Cada compilacion es una
+# version nueva con su propio cache de (franja de edad, signos vitales).
+
+SIGNOS_NUMERICOS = ("presion", "frecuencia", "saturacion")
+SIGNOS = SIGNOS_NUMERICOS + ("conciencia",)
+OPERADORES = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "==": operator.eq, "!=": operator.ne,
+}
+NIVELES = [n for n in NIVELES_ATENCION if n]
+MAXIMO_CACHE = 1 << 16
+
+
+def _invalida(mensaje):
+    return ValueError(f"Reglas de triaje inválidas: {mensaje}")
+
+
+def _validar_condicion(condicion, donde):
+    if not isinstance(condicion, (list, tuple)) or len(condicion) != 3:
+        raise _invalida(f"{donde}: cada condición es [signo, operador, valor].")
+    signo, operador, valor = condicion
+    if signo not in SIGNOS:
+        raise _invalida(f"{donde}: signo desconocido {signo!r} (use {', '.join(SIGNOS)}).")
+    if operador not in OPERADORES:
+        raise _invalida(f"{donde}: operador desconocido {operador!r}.")
+
+    if signo == "conciencia":
+        if operador not in ("==", "!=") or valor not in CONCIENCIAS:
+            raise _invalida(f"{donde}: la conciencia se compara con == o != contra {CONCIENCIAS}.")
+    elif isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise _invalida(f"{donde}: {signo} se compara con un número, no con {valor!r}.")
+    return signo, operador, valor
+
+
+def _validar_nivel(nivel, donde):
+    if nivel not in NIVELES:
+        raise _invalida(f"{donde}: nivel {nivel!r} desconocido (use {', '.join(NIVELES)}).")
+    return nivel
+
+
+def validar(tabla):
+    # Devuelve las franjas ordenadas: (nombre, desde, hasta, reglas, por_defecto)
+    # con reglas = [(nivel, [(signo, operador, valor), ...]), ...]
+    if not isinstance(tabla, dict) or not isinstance(tabla.get("grupos"), list) or not tabla["grupos"]:
+        raise _invalida("se espera un objeto con una lista 'grupos' no vacía.")
+
+    franjas = []
+    for numero, grupo in enumerate(tabla["grupos"], start=1):
+        if not isinstance(grupo, dict):
+            raise _invalida(f"el grupo {numero} debe ser un objeto.")
+        nombre = str(grupo.get("nombre", f"grupo {numero}"))
+        desde, hasta = grupo.get("edad_desde"), grupo.get("edad_hasta")
+        if not isinstance(desde, int) or desde < 0 or (hasta is not None and (not isinstance(hasta, int) or hasta < desde)):
+            raise _invalida(f"{nombre}: edades fuera de rango ({desde!r} a {hasta!r}).")
+
+        reglas = []
+        for indice, regla in enumerate(grupo.get("niveles", []), start=1):
+            donde = f"{nombre}, nivel {indice}"
+            condiciones = regla.get("si_alguna") if isinstance(regla, dict) else None
+            if not isinstance(condiciones, list) or not condiciones:
+                raise _invalida(f"{donde}: 'si_alguna' debe ser una lista de condiciones.")
+            reglas.append((
+                _validar_nivel(regla.get("nivel"), donde),
+                [_validar_condicion(c, donde) for c in condiciones]
+            ))
+        franjas.append((nombre, desde, hasta, reglas, _validar_nivel(grupo.get("por_defecto"), nombre)))
+
+    # Franjas contiguas desde 0 y sin tope en la ultima: toda edad cae en una sola
+    franjas.sort(key=lambda f: f[1])
+    esperado = 0
+    for nombre, desde, hasta, _, _ in franjas:
+        if esperado is None or desde != esperado:
+            raise _invalida(f"{nombre}: las franjas de edad deben ser contiguas y empezar en 0.")
+        esperado = None if hasta is None else hasta + 1
+    if esperado is not None:
+        raise _invalida("la última franja de edad no debe tener 'edad_hasta'.")
+    return franjas
+
+
+def _codigo_fuente(franjas):
+    lineas = ["def franja(edad):"]
+    for indice, (_, _, hasta, _, _) in enumerate(franjas):
+        if hasta is None:
+            lineas.append(f"    return {indice}")
+        else:
+            lineas.append(f"    if edad <= {hasta!r}:")
+            lineas.append(f"        return {indice}")
+
+    lineas += ["", "def clasificar(franja, presion, frecuencia, saturacion, conciencia):"]
+    for indice, (_, _, _, reglas, por_defecto) in enumerate(franjas):
+        lineas.append(f"    if franja == {indice}:")
+        for nivel, condiciones in reglas:
+            prueba = " or ".join(f"{signo} {operador} {valor!r}" for signo, operador, valor in condiciones)
+            lineas.append(f"        if {prueba}:")
+            lineas.append(f"            return {nivel!r}")
+        lineas.append(f"        return {por_defecto!r}")
+    lineas.append("    raise ValueError(f'Franja de edad desconocida: {franja}')")
+    return "\n".join(lineas) + "\n"
+
+
+class MotorReglas:
+
+    def __init__(self, tabla, version=1):
+        self.version = version
+        self.franjas = validar(tabla)
+        self.codigo = _codigo_fuente(self.franjas)
+
+        espacio = {}
+        exec(compile(self.codigo, f"<reglas de triaje v{version}>", "exec"), espacio)
+        self._franja = espacio["franja"]
+        self._evaluar = lru_cache(maxsize=MAXIMO_CACHE)(espacio["clasificar"])
+
+    def clasificar(self, edad, presion, frecuencia, saturacion, conciencia):
+        return self._evaluar(self._franja(edad), presion, frecuencia, saturacion, conciencia)
+
+    def franja(self, edad):
+        # Posicion de la franja en self.franjas (ordenadas por edad)
+        return self._franja(edad)
+
+    def nombre_franja(self, edad):
+        return self.franjas[self._franja(edad)][0]
+
+    def clasificar_columnas(self, edad, presion, frecuencia, saturacion, conciencia):
+        # Las mismas reglas sobre columnas de NumPy, con mascaras booleanas
+        import numpy as np
+
+        signos = {"presion": presion, "frecuencia": frecuencia, "saturacion": saturacion, "conciencia": conciencia}
+        resultado = np.full(len(edad), NIVELES[0], dtype=f"<U{max(map(len, NIVELES))}")
+        # Como la funcion franja: la primera cuyo tope alcanza, la ultima el resto
+        # (una edad no entera entre dos franjas va a la siguiente)
+        pendientes = np.ones(len(edad), dtype=bool)
+        for _, _, hasta, reglas, por_defecto in self.franjas:
+            en_franja = pendientes if hasta is None else pendientes & (edad <= hasta)
+            pendientes = pendientes & ~en_franja
+            niveles = np.full(len(edad), por_defecto, dtype=resultado.dtype)
+            # De la menos a la mas prioritaria: la primera que se cumple queda encima
+            for nivel, condiciones in reversed(reglas):
+                cumple = np.zeros(len(edad), dtype=bool)
+                for signo, operador, valor in condiciones:
+                    cumple |= OPERADORES[operador](signos[signo], valor)
+                niveles = np.where(cumple, nivel, niveles)
+            resultado = np.where(en_franja, niveles, resultado)
+        return resultado
+
+
+_motor = None
+# (ruta, mtime) de lo que se compilo; ruta None = config.REGLAS_TRIAJE
+_origen = None
+
+
+def _origen_actual():
+    ruta = config.ARCHIVO_REGLAS
+    if not ruta:
+        return None, None
+    try:
+        return ruta, os.stat(ruta).st_mtime_ns
+    except OSError:
+        return ruta, None
+
+
+def motor():
+    if _motor is None:
+        cargar()
+    return _motor
+
+
+def cargar():
+    # Compila las reglas vigentes; si son invalidas se mantiene el motor anterior
+    global _motor, _origen
+    origen = _origen_actual()
+    ruta = origen[0]
+    if ruta:
+        with open(ruta, "r", encoding="utf-8") as f:
+            tabla = json.load(f)
+    else:
+        tabla = config.REGLAS_TRIAJE
+
+    _motor = MotorReglas(tabla, _motor.version + 1 if _motor is not None else 1)
+    _origen = origen
+    return _motor
+
+
+def usar(tabla):
+    # Reglas fijadas desde el codigo (pruebas, herramientas); cargar() vuelve a las de config
+    global _motor, _origen
+    _motor = MotorReglas(tabla, _motor.version + 1 if _motor is not None else 1)
+    _origen = _origen_actual()
+    return _motor
+
+
+def recargar_si_cambio():
+    # Barato si nada cambio (sin ARCHIVO_REGLAS ni siquiera consulta el disco)
+    global _origen
+    origen = _origen_actual()
+    if _motor is not None and origen == _origen:
+        return False
+    try:
+        cargar()
+    except (OSError, ValueError) as e:
+        # No se reintenta hasta que el archivo vuelva a cambiar
+        _origen = origen
+        print(f"[ERROR] No se recargaron las reglas de triaje: {e}")
+        return False
+    print(f"[SISTEMA] Reglas de triaje cargadas (versión {_motor.version}).")
+    return True
@@ -0,0 +1,71 @@
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import reglas
+from modelo import GestorDatos
+
+
+def _requiere_numpy():
+    if np is None:
+        raise ImportError("El re-triaje por lotes requiere NumPy: pip install numpy")
+
+
+def clasificar_lote(presion, frecuencia, saturacion, conciencia, edad):
+    # Las reglas vigentes de Paciente.clasificar_atencion (reglas.py),
+    # aplicadas a columnas completas con mascaras booleanas
+    _requiere_numpy()
+
+    return reglas.motor().clasificar_columnas(
+        np.asarray(edad),
+        np.asarray(presion, dtype=float),
+        np.asarray(frecuencia, dtype=float),
+        np.asarray(saturacion, dtype=float),
+        np.asarray(conciencia)
+    )
+
+
+def columnas_atenciones(pacientes):
+    # Todas las atenciones de todos los pacientes, una columna por campo
+    _requiere_numpy()
+
+    columnas = {campo: [] for campo in ("dni", "presion", "frecuencia", "saturacion", "conciencia", "edad", "nivel_atencion")}
+    for p in pacientes:
+        for a in p.obtener_atenciones():
+            columnas["dni"].append(p.dni)
+            columnas["presion"].append(a.presion)
+            columnas["frecuencia"].append(a.frecuencia)
+            columnas["saturacion"].append(a.saturacion)
+            columnas["conciencia"].append(a.conciencia)
+            columnas["edad"].append(p.edad)
+            columnas["nivel_atencion"].append(a.nivel_atencion)
+
+    return {campo: np.asarray(valores) for campo, valores in columnas.items()}
+
+
+def auditar(pacientes):
+    # Re-triaje de todo el historial: devuelve los niveles recalculados y los
+    # indices de las atenciones cuyo nivel guardado no coincide
+    columnas = columnas_atenciones(pacientes)
+    niveles = clasificar_lote(
+        columnas["presion"], columnas["frecuencia"], columnas["saturacion"],
+        columnas["conciencia"], columnas["edad"]
+    )
+    discrepancias = np.flatnonzero(niveles != columnas["nivel_atencion"])
+    return columnas, niveles, discrepancias
+
+
+if __name__ == "__main__":
+    import config
+
+    archivo = sys.argv[1] if len(sys.argv) > 1 else config.ARCHIVO_DB
+    columnas, niveles, discrepancias = auditar(GestorDatos.cargar_pacientes(archivo))
+
+    print(f"[SISTEMA] Atenciones re-clasificadas: {len(niveles)}")
+    print(f"[SISTEMA] Urgentes con las reglas actuales: {int((niveles == 'Urgente').sum())}")
+    print(f"[SISTEMA] Decisiones que cambian: {len(discrepancias)}")
+    for i in discrepancias[:20]:
+        print(f"  - DNI {columnas['dni'][i]}: {columnas['nivel_atencion'][i]} -> {niveles[i]}")
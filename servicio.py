@@ -0,0 +1,371 @@
+import asyncio
+import json
+import signal
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from almacenamiento import crear_almacen
+from historial import HistorialColumnar
+from indices import AlmacenIndexado
+from modelo import (
+    Paciente, AtencionTriage, GestorDatos, TriageException, DniInvalidoException,
+    DniDuplicadoException, ServicioNoDisponibleException
+)
+
+# Servicio compartido entre puestos de triaje: un solo registro en memoria y
+# un protocolo de lineas JSON sobre TCP o socket Unix. Cada pedido es
+# {"op": ..., ...} y cada respuesta {"ok": true, "resultado": ...} o
+# {"ok": false, "error": "..."}.
+
+
+def separar_direccion(direccion):
+    if direccion.startswith("unix:"):
+        return "unix", direccion[len("unix:"):]
+    host, puerto = direccion.rsplit(":", 1)
+    return "tcp", (host, int(puerto))
+
+
+def _resumen(paciente):
+    # Para los listados basta la ultima atencion
+    datos = paciente.to_dict()
+    datos["atenciones"] = datos["atenciones"][-1:]
+    return datos
+
+
+class ServidorTriaje:
+
+    # El registro se toca solo desde un hilo propio (un unico trabajador):
+    # ni las consultas ni los registros bloquean el bucle de eventos, aunque
+    # el almacen lea o escriba en disco (SQLite, memoria acotada), y una
+    # consulta ve el registro antes o despues de un lote, nunca a medias.
+    # Los registros van a una cola que atiende una unica tarea escritora, asi
+    # los lotes se aplican en orden de llegada. Despues de cada lote se espera
+    # el guardado en disco (fsync y, si toca, la compactacion) en otro hilo
+    # mientras se siguen respondiendo consultas. Para eso el almacen guarda
+    # con su escritor en segundo plano; con esperar_guardado=False se
+    # responde sin esperarlo (durabilidad "diferido" o "periodico").
+
+    CONSULTAS = {
+        "total": "_total",
+        "buscar_dni": "_buscar_dni",
+        "buscar_nombre": "_buscar_nombre",
+        "listar": "_listar",
+        "urgentes": "_urgentes",
+        "estadisticas": "_estadisticas",
+        "archivadas": "_archivadas",
+    }
+
+    def __init__(self, registro, esperar_guardado=True):
+        self.registro = registro
+        self.esperar_guardado = esperar_guardado
+        self._pendientes = None
+        self._escritor = None
+        self._hilo_registro = None
+        self._servidor = None
+        self._conexiones = set()
+
+    async def iniciar(self, direccion):
+        self._pendientes = asyncio.Queue()
+        self._hilo_registro = ThreadPoolExecutor(max_workers=1, thread_name_prefix="registro")
+        self._escritor = asyncio.create_task(self._escribir())
+
+        tipo, destino = separar_direccion(direccion)
+        if tipo == "unix":
+            self._servidor = await asyncio.start_unix_server(self._atender, path=destino)
+        else:
+            self._servidor = await asyncio.start_server(self._atender, *destino)
+        return self._servidor
+
+    def direccion(self):
+        # Direccion real (util con puerto 0)
+        destino = self._servidor.sockets[0].getsockname()
+        if isinstance(destino, str):
+            return f"unix:{destino}"
+        return f"{destino[0]}:{destino[1]}"
+
+    async def detener(self):
+        self._servidor.close()
+        for escritor in list(self._conexiones):
+            escritor.close()
+        await self._servidor.wait_closed()
+
+        # Termina de guardar lo que ya estaba en cola antes de cerrar el almacen
+        await self._pendientes.join()
+        self._escritor.cancel()
+        cerrado = await self._en_registro(self.registro.cerrar)
+        self._hilo_registro.shutdown()
+        return cerrado
+
+    async def _en_registro(self, funcion, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._hilo_registro, funcion, *args)
+
+    async def _atender(self, lector, escritor):
+        self._conexiones.add(escritor)
+        try:
+            while True:
+                try:
+                    linea = await lector.readline()
+                except ValueError:
+                    # Linea mas larga que el limite del lector: el resto del
+                    # pedido seguiria llegando como si fueran otros
+                    await self._enviar(escritor, {"ok": False, "error": "Pedido demasiado largo."})
+                    break
+                if not linea:
+                    break
+                await self._enviar(escritor, await self._responder(linea))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self._conexiones.discard(escritor)
+            escritor.close()
+
+    @staticmethod
+    async def _enviar(escritor, respuesta):
+        escritor.write(json.dumps(respuesta, ensure_ascii=False).encode("utf-8") + b"\n")
+        await escritor.drain()
+
+    async def _responder(self, linea):
+        try:
+            pedido = json.loads(linea)
+            if not isinstance(pedido, dict):
+                raise ValueError("El pedido debe ser un objeto JSON.")
+            operacion = pedido.get("op")
+
+            if operacion == "registrar":
+                futuro = asyncio.get_running_loop().create_future()
+                await self._pendientes.put((pedido, futuro))
+                resultado = await futuro
+            elif operacion in self.CONSULTAS:
+                resultado = await self._en_registro(getattr(self, self.CONSULTAS[operacion]), pedido)
+            else:
+                raise ValueError(f"Operación desconocida: {operacion}")
+
+            return {"ok": True, "resultado": resultado}
+        except (TriageException, DniInvalidoException, ValueError, KeyError, TypeError, AttributeError) as e:
+            return {"ok": False, "error": str(e)}
+
+    def _total(self, pedido):
+        return self.registro.total_pacientes()
+
+    def _buscar_dni(self, pedido):
+        paciente = self.registro.buscar_por_dni(pedido["dni"])
+        return None if paciente is None else paciente.to_dict()
+
+    def _buscar_nombre(self, pedido):
+        return [_resumen(p) for p in self.registro.buscar_por_nombre(pedido["texto"], pedido.get("limite"))]
+
+    def _listar(self, pedido):
+        desde, cantidad = pedido.get("desde", 0), pedido["cantidad"]
+        if not isinstance(desde, int) or not isinstance(cantidad, int) or desde < 0 or cantidad < 0:
+            raise ValueError("desde y cantidad deben ser enteros no negativos.")
+        return [_resumen(p) for p in self.registro.listar_pagina(desde, cantidad)]
+
+    def _urgentes(self, pedido):
+        return [_resumen(p) for p in self.registro.listar_urgentes(pedido.get("limite"))]
+
+    def _estadisticas(self, pedido):
+        return self.registro.resumen_estadisticas()
+
+    def _archivadas(self, pedido):
+        return [a.to_dict() for a in self.registro.historial_archivado(pedido["dni"])]
+
+    async def _escribir(self):
+        # Unica tarea que escribe: junta los registros que llegaron mientras
+        # se guardaba el lote anterior y los guarda con una sola escritura
+        while True:
+            lote = [await self._pendientes.get()]
+            while not self._pendientes.empty():
+                lote.append(self._pendientes.get_nowait())
+
+            try:
+                await self._guardar(lote)
+            finally:
+                for _ in lote:
+                    self._pendientes.task_done()
+
+    async def _guardar(self, lote):
+        pedidos = []
+        futuros = []
+
+        for pedido, futuro in lote:
+            try:
+                datos = pedido["paciente"]
+                paciente = GestorDatos._paciente_desde_dict({
+                    "dni": datos["dni"], "nombre": datos["nombre"], "edad": datos["edad"],
+                    "sexo": datos["sexo"], "fecha_registro": datos.get("fecha_registro", "")
+                })
+                # Solo los signos vitales: IMC y nivel los calcula el servicio
+                a = pedido["atencion"]
+                atencion = AtencionTriage(a["peso"], a["talla"], a["presion"], a["frecuencia"], a["conciencia"], a["saturacion"])
+                atencion.fecha_registro = a.get("fecha_registro", atencion.fecha_registro)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                if not futuro.done():
+                    futuro.set_exception(ValueError(f"Datos de registro inválidos: {e}"))
+                continue
+
+            pedidos.append((paciente, atencion))
+            futuros.append(futuro)
+
+        if not pedidos:
+            return
+
+        try:
+            cambios = await self._en_registro(self.registro.registrar_lote, pedidos)
+            # Almacen sin escritor en segundo plano (SQLite, memoria acotada,
+            # que leen del disco en cada consulta): ya guardo, no hay pendientes
+            if self.esperar_guardado and not await asyncio.to_thread(self.registro.almacen.guardar_pendientes):
+                raise OSError("No se pudo guardar el registro.")
+        except Exception as e:
+            # La tarea escritora no puede morir: el error vuelve a cada puesto
+            for futuro in futuros:
+                if not futuro.done():
+                    futuro.set_exception(TriageException(f"No se pudo guardar el registro: {e}"))
+            return
+
+        # Un puesto que se desconecto mientras esperaba deja su futuro cancelado
+        for futuro, (paciente, atencion, es_nuevo) in zip(futuros, cambios):
+            if not futuro.done():
+                futuro.set_result({"paciente": _resumen(paciente), "atencion": atencion.to_dict(), "nuevo": es_nuevo})
+
+
+class ClienteTriaje:
+
+    # Mismas operaciones que AlmacenIndexado, resueltas por el servicio: el
+    # Controlador lo usa en lugar del registro local (config.USAR_SERVICIO)
+
+    TAMANO_BLOQUE = 500
+
+    def __init__(self, direccion):
+        self.direccion = direccion
+        self._conexion = None
+        self._archivo = None
+
+    def cargar(self):
+        tipo, destino = separar_direccion(self.direccion)
+        try:
+            if tipo == "unix":
+                conexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                conexion.connect(destino)
+            else:
+                conexion = socket.create_connection(destino)
+                conexion.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            raise ServicioNoDisponibleException(
+                f"No se pudo conectar al servicio de triaje en {self.direccion}: {e}"
+            ) from e
+
+        self._conexion = conexion
+        self._archivo = conexion.makefile("rwb")
+
+    def total_pacientes(self):
+        return self._pedir("total")
+
+    def buscar_por_dni(self, dni):
+        datos = self._pedir("buscar_dni", dni=dni)
+        return None if datos is None else self._paciente(datos)
+
+    def buscar_por_nombre(self, texto, limite=None):
+        return [self._paciente(d) for d in self._pedir("buscar_nombre", texto=texto, limite=limite)]
+
+    def listar_pacientes(self):
+        # Por bloques: la Vista pagina y solo pide lo que va mostrando
+        desde = 0
+        while True:
+            bloque = self._pedir("listar", desde=desde, cantidad=self.TAMANO_BLOQUE)
+            for datos in bloque:
+                yield self._paciente(datos)
+            if len(bloque) < self.TAMANO_BLOQUE:
+                return
+            desde += len(bloque)
+
+    def listar_urgentes(self, limite=None):
+        return [self._paciente(d) for d in self._pedir("urgentes", limite=limite)]
+
+    def resumen_estadisticas(self):
+        return self._pedir("estadisticas")
+
+    def historial_archivado(self, dni):
+        return [AtencionTriage.from_dict(d, confiable=True) for d in self._pedir("archivadas", dni=dni)]
+
+    def registrar(self, paciente, atencion):
+        datos_paciente = paciente.to_dict()
+        del datos_paciente["atenciones"]
+
+        resultado = self._pedir("registrar", paciente=datos_paciente, atencion=atencion.to_dict())
+        return (
+            self._paciente(resultado["paciente"]),
+            AtencionTriage.from_dict(resultado["atencion"], confiable=True),
+            resultado["nuevo"]
+        )
+
+    def cerrar(self):
+        # Lo registrado ya lo guardo el servicio
+        if self._conexion is not None:
+            self._archivo.close()
+            self._conexion.close()
+            self._conexion = None
+        return True
+
+    def _pedir(self, operacion, **datos):
+        datos["op"] = operacion
+        try:
+            self._archivo.write(json.dumps(datos, ensure_ascii=False).encode("utf-8") + b"\n")
+            self._archivo.flush()
+            linea = self._archivo.readline()
+        except OSError as e:
+            raise ServicioNoDisponibleException(f"Se perdió la conexión con el servicio: {e}") from e
+
+        if not linea:
+            raise ServicioNoDisponibleException("El servicio de triaje cerró la conexión.")
+
+        respuesta = json.loads(linea)
+        if not respuesta["ok"]:
+            raise TriageException(respuesta["error"])
+        return respuesta["resultado"]
+
+    @staticmethod
+    def _paciente(datos):
+        # Datos generados por el servicio a partir de pacientes ya validados
+        return GestorDatos._paciente_desde_dict(datos, confiable=True)
+
+
+async def servir(direccion):
+    if config.HISTORIAL_COLUMNAR and config.ALMACEN == "json":
+        Paciente.usar_historial_columnar(HistorialColumnar())
+
+    # Con "inmediato" guarda el escritor en segundo plano y cada registro
+    # espera ese guardado antes de responder
+    inmediato = config.DURABILIDAD == "inmediato"
+    registro = AlmacenIndexado(crear_almacen("diferido" if inmediato else None))
+    registro.cargar()
+
+    servidor = ServidorTriaje(registro, esperar_guardado=inmediato)
+    await servidor.iniciar(direccion)
+    print(f"[SISTEMA] Servicio de triaje en {servidor.direccion()} ({registro.total_pacientes()} pacientes).")
+
+    detener = asyncio.Event()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(senal, detener.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: Ctrl+C cancela asyncio.run; lo registrado ya esta en la bitacora
+            pass
+    await detener.wait()
+
+    if await servidor.detener():
+        print(config.MSG_DESPEDIDA)
+    else:
+        print("Error al guardar los datos finales.")
+
+
+if __name__ == "__main__":
+    # Uso: python servicio.py [host:puerto | unix:/ruta]
+    try:
+        asyncio.run(servir(sys.argv[1] if len(sys.argv) > 1 else config.DIRECCION_SERVICIO))
+    except DniDuplicadoException as e:
+        print(f"[ERROR] El historial contiene DNIs duplicados: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,237 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+import fragmentacion
+from almacenamiento import AlmacenJson, AlmacenFragmentado, AlmacenSqlite
+from historial import marca_tiempo
+from modelo import PacienteEstandar, AtencionTriage, GestorDatos
+
+
+def _escritor(archivo, indice, usar_bitacora, cantidad):
+    # Un puesto independiente: carga, registra y cierra sin saber de los demas
+    almacen = AlmacenJson(archivo, usar_bitacora, umbral_compactacion=0 if usar_bitacora else None)
+    almacen.cargar()
+
+    registros = [(f"7{indice:02d}{i:05d}", f"Paciente {indice} {i}") for i in range(cantidad)]
+    # Todos dan de alta el mismo DNI nuevo y atienden a un paciente existente
+    registros += [("66660000", "Alta Compartida"), ("80545678", "Maria Lopez")]
+
+    for dni, nombre in registros:
+        paciente = almacen.buscar_por_dni(dni)
+        es_nuevo = paciente is None
+        if es_nuevo:
+            paciente = PacienteEstandar(dni, nombre, 40, "Femenino")
+        atencion = AtencionTriage(70, 170, 120, 80, "Alerta", 98)
+        paciente.clasificar_atencion(atencion)
+        paciente.agregar_atencion(atencion)
+        almacen.registrar_atencion(paciente, atencion, es_nuevo)
+
+    almacen.cerrar()
+
+
+class TestAlmacenes(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        archivo = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, archivo)
+
+        self.json = AlmacenJson(archivo, usar_bitacora=True)
+        self.json.cargar()
+
+        self.sqlite = AlmacenSqlite(os.path.join(self.carpeta, "datos.db"))
+        self.sqlite.cargar()
+        self.sqlite.importar(GestorDatos.cargar_pacientes(archivo))
+
+    def tearDown(self):
+        self.sqlite.cerrar()
+        shutil.rmtree(self.carpeta)
+
+    def test_mismas_consultas_en_ambos_almacenes(self):
+        for almacen in (self.json, self.sqlite):
+            with self.subTest(almacen=type(almacen).__name__):
+                self.assertEqual(almacen.total_pacientes(), self.json.total_pacientes())
+                self.assertEqual(
+                    [p.dni for p in almacen.listar_urgentes()],
+                    [p.dni for p in self.json.listar_urgentes()]
+                )
+                self.assertEqual(almacen.estadisticas(), self.json.estadisticas())
+                self.assertEqual(
+                    [p.dni for p in almacen.buscar_por_nombre("PEREZ")],
+                    [p.dni for p in self.json.buscar_por_nombre("perez")]
+                )
+                todos = [p.dni for p in almacen.listar_pacientes()]
+                for desde, cantidad in [(0, 2), (1, 3), (4, 10), (100, 5)]:
+                    self.assertEqual([p.dni for p in almacen.listar_pagina(desde, cantidad)], todos[desde:desde + cantidad])
+
+    def test_historial_completo_por_dni(self):
+        esperado = self.json.buscar_por_dni("80545678").to_dict()
+        self.assertEqual(self.sqlite.buscar_por_dni("80545678").to_dict(), esperado)
+        self.assertIsNone(self.sqlite.buscar_por_dni("00000000"))
+
+    def test_registro_actualiza_ultima_atencion(self):
+        for almacen in (self.json, self.sqlite):
+            with self.subTest(almacen=type(almacen).__name__):
+                paciente = PacienteEstandar("11112222", "Nuevo Paciente", 40, "Femenino")
+                atencion = AtencionTriage(70, 165, 80, 90, "Alerta", 97)
+                paciente.agregar_atencion(atencion)
+                paciente.clasificar_atencion(atencion)
+                self.assertTrue(almacen.registrar_atencion(paciente, atencion, True))
+
+                self.assertIn("11112222", [p.dni for p in almacen.listar_urgentes()])
+                self.assertEqual(almacen.buscar_por_dni("11112222").nombre, "Nuevo Paciente")
+
+    def test_atenciones_por_rango_de_tiempo(self):
+        desde, hasta = marca_tiempo("01-12-2025 00:00"), marca_tiempo("31-12-2025 00:00")
+        for solo_urgentes in (False, True):
+            with self.subTest(solo_urgentes=solo_urgentes):
+                esperado = [
+                    (p.dni, a.to_dict()) for p, a in self.json.atenciones_entre(desde, hasta, solo_urgentes)
+                ]
+                self.assertTrue(esperado)
+                self.assertEqual(
+                    [(p.dni, a.to_dict()) for p, a in self.sqlite.atenciones_entre(desde, hasta, solo_urgentes)],
+                    esperado
+                )
+                marcas = [a["fecha_registro"] for _, a in esperado]
+                self.assertEqual(marcas, sorted(marcas))
+                self.assertTrue(all(desde <= m < hasta for m in marcas))
+
+
+class TestEscritoresConcurrentes(unittest.TestCase):
+
+    PROCESOS = 6
+    REGISTROS = 5
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, self.archivo)
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def test_ningun_puesto_pisa_a_otro(self):
+        for usar_bitacora in (True, False):
+            with self.subTest(usar_bitacora=usar_bitacora):
+                shutil.copy(config.ARCHIVO_DB, self.archivo)
+                iniciales = len(GestorDatos.cargar_pacientes(self.archivo))
+
+                procesos = [
+                    multiprocessing.Process(target=_escritor, args=(self.archivo, i, usar_bitacora, self.REGISTROS))
+                    for i in range(self.PROCESOS)
+                ]
+                for p in procesos:
+                    p.start()
+                for p in procesos:
+                    p.join(timeout=60)
+                    self.assertEqual(p.exitcode, 0)
+
+                pacientes = GestorDatos.cargar_pacientes(self.archivo)
+                self.assertEqual(len(pacientes), iniciales + self.PROCESOS * self.REGISTROS + 1)
+                self.assertEqual(len(pacientes.buscar("66660000").obtener_atenciones()), self.PROCESOS)
+                self.assertEqual(len(pacientes.buscar("80545678").obtener_atenciones()), 2 + self.PROCESOS)
+                self.assertTrue(GestorDatos._archivo_verificado(self.archivo))
+
+    def test_corte_durante_el_guardado_conserva_el_archivo(self):
+        with open(self.archivo, "rb") as f:
+            original = f.read()
+
+        almacen = AlmacenJson(self.archivo, usar_bitacora=False)
+        almacen.cargar()
+
+        def cortar(*args):
+            yield "[\n"
+            raise OSError("disco lleno")
+
+        with mock.patch("json.JSONEncoder.iterencode", cortar), mock.patch("builtins.print"):
+            self.assertFalse(almacen.cerrar())
+
+        with open(self.archivo, "rb") as f:
+            self.assertEqual(f.read(), original)
+        self.assertFalse(os.path.exists(self.archivo + ".tmp"))
+
+
+class TestAlmacenFragmentado(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, self.archivo)
+        self.original = GestorDatos.cargar_pacientes(self.archivo)
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def _resumen(self, pacientes):
+        return sorted((p.dni, p.cantidad_atenciones()) for p in pacientes)
+
+    def test_fragmentado_equivale_al_archivo_unico(self):
+        almacen = AlmacenFragmentado(self.archivo, 4, hilos_carga=2, usar_bitacora=False)
+        with mock.patch("builtins.print"):
+            almacen.cargar()
+
+        self.assertFalse(os.path.exists(self.archivo))
+        self.assertEqual(len(almacen.fragmentos), 4)
+        self.assertEqual(self._resumen(almacen.listar_pacientes()), self._resumen(self.original))
+        self.assertEqual(almacen.estadisticas(), AlmacenJson.estadisticas_de(list(self.original)))
+        for indice, fragmento in enumerate(almacen.fragmentos):
+            for p in fragmento.listar_pacientes():
+                self.assertEqual(fragmentacion.fragmento_de(p.dni, 4), indice)
+                self.assertIs(almacen.buscar_por_dni(p.dni), p)
+        todos = almacen.listar_pacientes()
+        for desde in range(len(todos) + 1):
+            self.assertEqual(almacen.listar_pagina(desde, 2), todos[desde:desde + 2])
+
+    def test_registro_solo_reescribe_su_fragmento(self):
+        with mock.patch("builtins.print"):
+            fragmentacion.refragmentar(self.archivo, 4)
+        almacen = AlmacenFragmentado(self.archivo, 4, usar_bitacora=False)
+        almacen.cargar()
+        antes = [os.stat(f.archivo).st_mtime_ns for f in almacen.fragmentos]
+
+        paciente = PacienteEstandar("55554444", "Paciente Fragmento", 30, "Femenino")
+        atencion = AtencionTriage(70, 170, 120, 80, "Alerta", 98)
+        paciente.clasificar_atencion(atencion)
+        paciente.agregar_atencion(atencion)
+        self.assertTrue(almacen.registrar_atencion(paciente, atencion, True))
+
+        propio = fragmentacion.fragmento_de("55554444", 4)
+        despues = [os.stat(f.archivo).st_mtime_ns for f in almacen.fragmentos]
+        self.assertEqual(
+            [i for i in range(4) if antes[i] != despues[i]], [propio]
+        )
+
+        otro = AlmacenFragmentado(self.archivo, 0, usar_bitacora=False)
+        otro.cargar()
+        self.assertEqual(otro.buscar_por_dni("55554444").nombre, "Paciente Fragmento")
+        self.assertEqual(otro.total_pacientes(), len(self.original) + 1)
+
+    def test_refragmentar_y_volver_a_un_archivo(self):
+        with mock.patch("builtins.print"):
+            fragmentacion.refragmentar(self.archivo, 4)
+            # Un registro en la bitacora de un fragmento tambien se conserva
+            almacen = AlmacenFragmentado(self.archivo, 4)
+            almacen.abrir()
+            paciente = PacienteEstandar("55554444", "Paciente Fragmento", 30, "Femenino")
+            atencion = AtencionTriage(70, 170, 120, 80, "Alerta", 98)
+            paciente.clasificar_atencion(atencion)
+            paciente.agregar_atencion(atencion)
+            almacen.registrar_atencion(paciente, atencion, True)
+            esperado = self._resumen(list(self.original) + [paciente])
+
+            self.assertEqual(fragmentacion.refragmentar(self.archivo, 3), len(esperado))
+            self.assertEqual(fragmentacion.refragmentar(self.archivo, 0), len(esperado))
+
+        self.assertIsNone(fragmentacion.leer_manifiesto(self.archivo))
+        self.assertEqual(sorted(os.listdir(self.carpeta)), ["datos.json", "datos.json.meta"])
+        self.assertEqual(self._resumen(GestorDatos.cargar_pacientes(self.archivo)), esperado)
+
+
+if __name__ == '__main__':
+    unittest.main()
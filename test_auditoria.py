@@ -0,0 +1,149 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import auditoria
+import historico
+from bitacora import Bitacora
+from modelo import PacienteEstandar, PacienteAdultoMayor, AtencionTriage, GestorDatos
+
+
+def _paciente(clase, dni, edad, *signos):
+    paciente = clase(dni, f"Paciente {dni}", edad, "Femenino")
+    for presion, saturacion in signos:
+        atencion = AtencionTriage(70, 170, presion, 80, "Alerta", saturacion)
+        paciente.clasificar_atencion(atencion)
+        paciente.agregar_atencion(atencion)
+    return paciente
+
+
+class TestAuditoria(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+
+        pacientes = [_paciente(PacienteEstandar, f"{20_000_000 + i}", 40, (120, 98), (120, 85)) for i in range(40)]
+        pacientes.append(_paciente(PacienteAdultoMayor, "30000000", 70, (95, 98)))
+        dicts = [p.to_dict() for p in pacientes]
+
+        # Lo que la carga normal no revisa
+        dicts[3]["atenciones"][1]["nivel_atencion"] = "Normal"
+        dicts[5]["atenciones"][0]["imc"] = 30.0
+        dicts[7]["dni"] = "1234567X"
+        dicts[9]["atenciones"][0]["presion"] = 500
+        del dicts[11]["nombre"]
+        dicts[13]["dni"] = dicts[14]["dni"]
+        # El adulto mayor con presion 95 es urgente; con las reglas del adulto no
+        dicts[-1]["atenciones"][0]["nivel_atencion"] = "Normal"
+        GestorDatos._guardar_dicts(self.archivo, dicts)
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def _hallazgos(self, informe):
+        return sorted((h["tipo"], h["dni"], h["atencion"]) for h in informe["hallazgos"])
+
+    def test_informa_diferencias_invalidos_y_duplicados(self):
+        informe = auditoria.auditar([self.archivo], procesos=1)
+
+        self.assertEqual(informe["pacientes"], 41)
+        self.assertEqual(informe["atenciones"], 81)
+        self.assertEqual(self._hallazgos(informe), [
+            ("atencion_invalida", "20000009", 0),
+            ("dni_invalido", "1234567X", None),
+            ("imc", "20000005", 0),
+            ("nivel_atencion", "20000003", 1),
+            ("nivel_atencion", "30000000", 0),
+            ("paciente_invalido", "1234567X", None),
+            ("paciente_invalido", "20000011", None),
+        ])
+        self.assertEqual(informe["dnis_duplicados"], [{"dni": "20000014", "veces": 2}])
+        self.assertEqual(informe["resumen"]["dni_duplicado"], 1)
+
+        resumido = auditoria.auditar([self.archivo], procesos=1, limite=2)
+        self.assertEqual(resumido["hallazgos"], informe["hallazgos"][:2])
+        self.assertEqual(resumido["resumen"], informe["resumen"])
+
+    def test_mismo_informe_en_paralelo_y_con_otro_formato(self):
+        esperado = auditoria.auditar([self.archivo], procesos=1)
+
+        # Tramos mucho mas chicos que un paciente y mas de un proceso
+        with mock.patch.object(auditoria, "TAMANO_TRAMO", 97):
+            paralelo = auditoria.auditar([self.archivo], procesos=3)
+        # Sin indent=4 el archivo se lee en el proceso principal
+        compacto = os.path.join(self.carpeta, "compacto.json")
+        with open(self.archivo, "r", encoding="utf-8") as f, open(compacto, "w", encoding="utf-8") as g:
+            json.dump(json.load(f), g)
+        de_a_lotes = auditoria.auditar([compacto], procesos=2)
+
+        for informe in (paralelo, de_a_lotes):
+            self.assertEqual(informe["hallazgos"], esperado["hallazgos"])
+            self.assertEqual(informe["dnis_duplicados"], esperado["dnis_duplicados"])
+            self.assertEqual(informe["atenciones"], esperado["atenciones"])
+
+    def test_audita_bitacora_e_historico(self):
+        # La primera atencion de cada paciente pasa al archivo historico
+        historico.archivar(self.archivo, int(time.time()) + 3600)
+        nuevo = _paciente(PacienteEstandar, "40000000", 40, (120, 98)).to_dict()
+        atencion_nuevo = nuevo.pop("atenciones")[0]
+        atencion_nuevo["nivel_atencion"] = "Urgente"
+        atencion_existente = _paciente(PacienteEstandar, "20000001", 40, (120, 98)).to_dict()["atenciones"][0]
+        atencion_existente["imc"] = 99.0
+        Bitacora(Bitacora.ruta_para(self.archivo)).agregar([
+            # Dos puestos dan de alta el mismo DNI
+            {"tipo": "paciente", "paciente": nuevo},
+            {"tipo": "paciente", "paciente": nuevo},
+            {"tipo": "atencion", "dni": "40000000", "atencion": atencion_nuevo},
+            {"tipo": "atencion", "dni": "20000001", "atencion": atencion_existente},
+            {"tipo": "atencion", "dni": "49999999", "atencion": atencion_existente},
+        ], GestorDatos._firma_archivo(self.archivo))
+
+        informe = auditoria.auditar([self.archivo], procesos=1)
+        self.assertEqual(informe["pacientes"], 43)
+        self.assertEqual(informe["atenciones"], 84)
+        self.assertEqual(sorted((h["tipo"], h["dni"], h["atencion"], h.get("origen", "")) for h in informe["hallazgos"]), [
+            ("atencion_invalida", "20000009", 0, "historico"),
+            ("dni_desconocido", "49999999", 0, "bitacora"),
+            ("dni_invalido", "1234567X", None, ""),
+            ("imc", "20000001", 0, "bitacora"),
+            ("imc", "20000005", 0, "historico"),
+            ("nivel_atencion", "20000003", 0, ""),
+            ("nivel_atencion", "30000000", 0, ""),
+            ("nivel_atencion", "40000000", 0, "bitacora"),
+            ("paciente_invalido", "1234567X", None, ""),
+            ("paciente_invalido", "20000011", None, ""),
+        ])
+        self.assertEqual(
+            sorted(d["dni"] for d in informe["dnis_duplicados"]), ["20000014", "40000000"]
+        )
+
+        with mock.patch.object(auditoria, "TAMANO_TRAMO", 97):
+            paralelo = auditoria.auditar([self.archivo], procesos=3)
+        self.assertEqual(paralelo["hallazgos"], informe["hallazgos"])
+        self.assertEqual(paralelo["atenciones"], informe["atenciones"])
+
+        # Una bitacora escrita sobre otra version del archivo no se aplica: se informa
+        with open(self.archivo, "a", encoding="utf-8") as f:
+            f.write("\n")
+        vencida = auditoria.auditar([self.archivo], procesos=1)
+        self.assertEqual(vencida["pacientes"], 41)
+        self.assertEqual(vencida["resumen"]["bitacora_vencida"], 1)
+
+    def test_registro_corrupto_no_detiene_la_auditoria(self):
+        with open(self.archivo, "rb") as f:
+            contenido = f.read()
+        with open(self.archivo, "wb") as f:
+            f.write(contenido.replace(b'"20000020",', b'"20000020"', 1))
+
+        informe = auditoria.auditar([self.archivo], procesos=2)
+        self.assertEqual(informe["pacientes"], 41)
+        self.assertEqual(informe["resumen"]["registro_corrupto"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
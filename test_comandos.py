@@ -0,0 +1,113 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+from unittest import mock
+
+import config
+from comandos import ejecutar_comando
+from modelo import GestorDatos
+
+
+class TestComandos(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, self.archivo)
+        self.parches = [
+            mock.patch.object(config, "ALMACEN", "json"),
+            mock.patch.object(config, "ARCHIVO_DB", self.archivo),
+            mock.patch.object(config, "USAR_BITACORA", True),
+        ]
+        for parche in self.parches:
+            parche.start()
+
+    def tearDown(self):
+        for parche in self.parches:
+            parche.stop()
+        shutil.rmtree(self.carpeta)
+
+    def _ejecutar(self, *argumentos):
+        salida, errores = io.StringIO(), io.StringIO()
+        with redirect_stdout(salida), redirect_stderr(errores):
+            codigo = ejecutar_comando(list(argumentos))
+        return codigo, salida.getvalue(), errores.getvalue()
+
+    def test_lookup_json_sin_cargar_el_historial(self):
+        with mock.patch.object(GestorDatos, "cargar_pacientes") as cargar:
+            codigo, salida, _ = self._ejecutar("lookup", "80545678", "--json")
+        cargar.assert_not_called()
+        self.assertEqual(codigo, 0)
+        self.assertEqual(json.loads(salida)["nombre"], "Maria Lopez")
+
+        codigo, _, errores = self._ejecutar("lookup", "00000000")
+        self.assertEqual(codigo, 1)
+        self.assertIn("[ERROR]", errores)
+
+    def test_urgentes_y_stats_coinciden_con_la_carga_completa(self):
+        pacientes = GestorDatos.cargar_pacientes(self.archivo)
+        urgentes = {p.dni for p in pacientes if p.obtener_ultima_atencion().nivel_atencion == "Urgente"}
+
+        _, salida, _ = self._ejecutar("urgentes", "--json")
+        datos = json.loads(salida)
+        self.assertEqual(datos["total"], len(urgentes))
+        self.assertEqual({p["dni"] for p in datos["pacientes"]}, urgentes)
+
+        _, salida, _ = self._ejecutar("stats", "--json")
+        self.assertEqual(json.loads(salida)["total"], len(pacientes))
+
+    def test_register_anexa_a_la_bitacora(self):
+        registro = os.path.join(self.carpeta, "registro.json")
+        with open(registro, "w", encoding="utf-8") as f:
+            json.dump([
+                {"dni": "80545678", "nombre": "Maria Lopez", "edad": 82, "sexo": "F", "peso": 60, "talla": 155,
+                 "presion": 120, "frecuencia": 70, "conciencia": "A", "saturacion": 97},
+                {"dni": "12", "nombre": "Mal Dni", "edad": 30, "sexo": "M", "peso": 60, "talla": 155,
+                 "presion": 120, "frecuencia": 70, "conciencia": "A", "saturacion": 97},
+            ], f)
+
+        with open(self.archivo, "rb") as f:
+            original = f.read()
+        codigo, _, errores = self._ejecutar("register", "--from-json", registro)
+
+        self.assertEqual(codigo, 1)
+        self.assertIn("Registro 2 rechazado", errores)
+        with open(self.archivo, "rb") as f:
+            self.assertEqual(f.read(), original)
+
+        paciente = GestorDatos.cargar_pacientes(self.archivo).buscar("80545678")
+        self.assertEqual(len(paciente.obtener_atenciones()), 3)
+        self.assertEqual(paciente.obtener_ultima_atencion().nivel_atencion, "Normal")
+
+    def test_register_informa_guardado_fallido(self):
+        registro = os.path.join(self.carpeta, "registro.json")
+        with open(registro, "w", encoding="utf-8") as f:
+            json.dump({"dni": "70000001", "nombre": "Paciente Nuevo", "edad": 40, "sexo": "F", "peso": 60,
+                       "talla": 155, "presion": 120, "frecuencia": 70, "conciencia": "A", "saturacion": 97}, f)
+
+        with mock.patch("almacenamiento.AlmacenJson.registrar_lote", return_value=False):
+            codigo, _, errores = self._ejecutar("register", "--from-json", registro)
+        self.assertEqual(codigo, 1)
+        self.assertIn("[ERROR] No se pudo guardar el lote importado.", errores)
+
+    def test_recientes_solo_trae_las_ultimas_horas(self):
+        registro = os.path.join(self.carpeta, "registro.json")
+        with open(registro, "w", encoding="utf-8") as f:
+            json.dump({"dni": "70000001", "nombre": "Paciente Nuevo", "edad": 40, "sexo": "F", "peso": 60,
+                       "talla": 155, "presion": 120, "frecuencia": 70, "conciencia": "A", "saturacion": 97}, f)
+        self.assertEqual(self._ejecutar("register", "--from-json", registro)[0], 0)
+
+        codigo, salida, _ = self._ejecutar("recientes", "--horas", "2", "--json")
+        self.assertEqual(codigo, 0)
+        self.assertEqual([a["dni"] for a in json.loads(salida)["atenciones"]], ["70000001"])
+
+        _, salida, _ = self._ejecutar("recientes", "--horas", "2", "--urgentes", "--json")
+        self.assertEqual(json.loads(salida)["total"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+import desplazamientos
+from almacenamiento import AlmacenJson, AlmacenAcotado
+from desplazamientos import CachePacientes, IndiceDesplazamientos
+from indices import AlmacenIndexado
+from modelo import PacienteEstandar, AtencionTriage, GestorDatos, DniDuplicadoException
+
+
+def _registrar(registro, dni, nombre, saturacion):
+    registro.registrar(PacienteEstandar(dni, nombre, 40, "Femenino"), AtencionTriage(70, 170, 120, 80, "Alerta", saturacion))
+
+
+class TestIndiceDesplazamientos(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def test_posiciones_en_bytes_con_caracteres_no_ascii(self):
+        registros = [
+            {"dni": "12345678", "nombre": "Peñaloza Íñiguez", "edad": 40, "sexo": "Femenino", "atenciones": []},
+            {"dni": "87654321", "nombre": "Ana Lopez", "edad": 30, "sexo": "Femenino", "atenciones": []},
+        ]
+        with open(self.archivo, "w", encoding="utf-8") as f:
+            json.dump(registros, f, ensure_ascii=False)
+
+        with open(self.archivo, "rb") as f:
+            contenido = f.read()
+        # Bloques chicos: los registros quedan partidos entre lecturas
+        leidos = list(desplazamientos.iterar_registros(self.archivo, tamano_bloque=7))
+        self.assertEqual([d for d, _, _ in leidos], registros)
+        for d, inicio, longitud in leidos:
+            self.assertEqual(json.loads(contenido[inicio:inicio + longitud]), d)
+
+    def test_indice_crece_y_se_rehace_si_cambia_el_archivo(self):
+        pacientes = [PacienteEstandar(f"{10_000_000 + i}", f"Paciente {i}", 40, "Femenino") for i in range(300)]
+        GestorDatos.guardar_pacientes(self.archivo, pacientes)
+
+        # Pocas ranuras al empezar: la tabla se duplica varias veces
+        with mock.patch.object(desplazamientos, "BYTES_POR_RANURA", 1 << 20):
+            indice = desplazamientos.indexar(self.archivo)
+        self.assertEqual(len(indice), 300)
+        self.assertTrue(indice.confiable)
+        self.assertIsNone(indice.buscar("99999999"))
+        with open(self.archivo, "rb") as f:
+            contenido = f.read()
+        inicio, longitud = indice.buscar("10000150")
+        self.assertEqual(json.loads(contenido[inicio:inicio + longitud])["nombre"], "Paciente 150")
+        indice.cerrar()
+
+        GestorDatos.guardar_pacientes(self.archivo, pacientes[:10])
+        self.assertIsNone(IndiceDesplazamientos.abrir(self.archivo))
+
+    def test_dni_duplicado(self):
+        paciente = PacienteEstandar("12345678", "Ana Lopez", 40, "Femenino")
+        GestorDatos.guardar_pacientes(self.archivo, [paciente, paciente])
+        with self.assertRaises(DniDuplicadoException):
+            desplazamientos.indexar(self.archivo)
+        self.assertEqual(sorted(os.listdir(self.carpeta)), ["datos.json", "datos.json.meta"])
+
+    def test_cache_descarta_los_menos_usados(self):
+        cache = CachePacientes(presupuesto=300)
+        for dni in ("a", "b", "c"):
+            cache.guardar(dni, dni.upper(), 100)
+        cache.obtener("a")
+        cache.guardar("d", "D", 100)
+
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.obtener("a"), "A")
+        self.assertEqual(cache.usado, 300)
+
+
+class TestAlmacenAcotado(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, self.archivo)
+        self.copia = os.path.join(self.carpeta, "copia.json")
+        shutil.copy(config.ARCHIVO_DB, self.copia)
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def _comparar(self, acotado, completo):
+        self.assertEqual(acotado.total_pacientes(), completo.total_pacientes())
+        self.assertEqual(acotado.resumen_estadisticas(), completo.resumen_estadisticas())
+        self.assertEqual([p.dni for p in acotado.listar_urgentes()], [p.dni for p in completo.listar_urgentes()])
+        self.assertEqual(
+            {p.dni: p.to_dict() for p in acotado.listar_pacientes()},
+            {p.dni: p.to_dict() for p in completo.listar_pacientes()}
+        )
+        # Los registrados en el mismo segundo pueden salir en otro orden
+        self.assertEqual(
+            sorted(json.dumps([p.dni, a.to_dict()]) for p, a in acotado.atenciones_entre(0, 2 ** 40)),
+            sorted(json.dumps([p.dni, a.to_dict()]) for p, a in completo.atenciones_entre(0, 2 ** 40))
+        )
+
+    def test_equivale_al_historial_en_memoria(self):
+        completo = AlmacenIndexado(AlmacenJson(self.copia))
+        completo.cargar()
+        # Cache de un solo paciente y compactacion en cada registro
+        acotado = AlmacenIndexado(AlmacenAcotado(self.archivo, 1, umbral_compactacion=0))
+        acotado.cargar()
+        self._comparar(acotado, completo)
+
+        dni = next(iter(completo.listar_pacientes())).dni
+        for registro in (completo, acotado):
+            _registrar(registro, "55556666", "Alta Nueva", 85)
+            _registrar(registro, dni, "Ignorado", 99)
+            _registrar(registro, "55556666", "Ignorado", 98)
+        self._comparar(acotado, completo)
+        self.assertEqual(acotado.buscar_por_dni("55556666").cantidad_atenciones(), 2)
+        self.assertEqual(len(acotado.almacen.cache), 1)
+        acotado.cerrar()
+
+        otro = AlmacenIndexado(AlmacenAcotado(self.archivo, 1 << 20))
+        otro.cargar()
+        self._comparar(otro, completo)
+        self.assertEqual([p.dni for p in otro.buscar_por_nombre("alta  NUEVA")], ["55556666"])
+
+    def test_relee_lo_que_registra_otro_proceso(self):
+        acotado = AlmacenIndexado(AlmacenAcotado(self.archivo, 1 << 20))
+        acotado.cargar()
+
+        otro = AlmacenJson(self.archivo, umbral_compactacion=0)
+        otro.cargar()
+        paciente = PacienteEstandar("44443333", "Otro Puesto", 40, "Femenino")
+        atencion = AtencionTriage(70, 170, 120, 80, "Alerta", 80)
+        paciente.clasificar_atencion(atencion)
+        paciente.agregar_atencion(atencion)
+        otro.registrar_atencion(paciente, atencion, True)
+
+        _registrar(acotado, "55556666", "Alta Nueva", 98)
+        self.assertEqual(acotado.almacen.recargas, 1)
+        self.assertIsNotNone(acotado.buscar_por_dni("44443333"))
+        self.assertIn("44443333", [p.dni for p in acotado.listar_urgentes()])
+        self.assertEqual(acotado.total_pacientes(), len(GestorDatos.cargar_pacientes(self.archivo)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import config
+from almacenamiento import AlmacenJson
+from bitacora import Bitacora
+from escritor import EscritorDiferido
+from indices import AlmacenIndexado
+from modelo import PacienteEstandar, AtencionTriage, GestorDatos
+
+
+def _pedido(indice):
+    paciente = PacienteEstandar(f"7{indice:07d}", f"Paciente {indice}", 40, "Femenino")
+    return paciente, AtencionTriage(70, 170, 120, 80, "Alerta", 98)
+
+
+class TestEscritorDiferido(unittest.TestCase):
+
+    def setUp(self):
+        self.llamadas = 0
+        self.guardado = threading.Event()
+
+    def _guardar(self):
+        self.llamadas += 1
+        self.guardado.set()
+        return True
+
+    def test_junta_los_avisos_seguidos_en_un_guardado(self):
+        escritor = EscritorDiferido(self._guardar, "diferido", ventana=0.1)
+        for _ in range(50):
+            escritor.avisar()
+
+        self.assertTrue(self.guardado.wait(2))
+        escritor.detener()
+        self.assertEqual(self.llamadas, 1)
+
+    def test_periodico_solo_guarda_si_hubo_avisos(self):
+        escritor = EscritorDiferido(self._guardar, "periodico", periodo=0.05)
+        time.sleep(0.2)
+        self.assertEqual(self.llamadas, 0)
+
+        escritor.avisar()
+        self.assertTrue(self.guardado.wait(2))
+        escritor.detener()
+        self.assertEqual(self.llamadas, 1)
+
+    def test_detener_guarda_lo_pendiente(self):
+        escritor = EscritorDiferido(self._guardar, "diferido", ventana=60)
+        escritor.avisar()
+        self.assertTrue(escritor.detener())
+        self.assertEqual(self.llamadas, 1)
+
+    def test_un_guardado_fallido_se_reintenta(self):
+        resultados = iter([False, True])
+        escritor = EscritorDiferido(lambda: next(resultados), "diferido", ventana=60)
+        escritor.avisar()
+        self.assertFalse(escritor.vaciar())
+        self.assertTrue(escritor.detener())
+
+    def test_reintenta_con_espera_creciente(self):
+        # Sin la espera, el hilo reintentaria sin pausa (ventana ya vencida)
+        escritor = EscritorDiferido(self._fallar, "diferido", ventana=0.01)
+        escritor.REINTENTO_INICIAL = 0.1
+        escritor.avisar()
+        time.sleep(0.5)
+        # Intentos a los 0.01, 0.11 y 0.31 s
+        self.assertLessEqual(self.llamadas, 4)
+        self.assertFalse(escritor.detener())
+
+    def _fallar(self):
+        self.llamadas += 1
+        return False
+
+
+class TestDurabilidadDiferida(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, self.archivo)
+        self.iniciales = len(GestorDatos.cargar_pacientes(self.archivo))
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def _registro(self, usar_bitacora, umbral=None):
+        registro = AlmacenIndexado(AlmacenJson(
+            self.archivo, usar_bitacora, umbral, durabilidad="diferido", ventana_guardado=60
+        ))
+        registro.cargar()
+        return registro
+
+    def test_registrar_no_escribe_hasta_el_guardado(self):
+        registro = self._registro(usar_bitacora=True)
+        registro.registrar(*_pedido(1))
+
+        # Visible en memoria, todavia no en disco
+        self.assertIsNotNone(registro.buscar_por_dni("70000001"))
+        self.assertEqual(Bitacora(Bitacora.ruta_para(self.archivo)).tamano(), 0)
+
+        self.assertTrue(registro.almacen.guardar_pendientes())
+        self.assertIsNotNone(next(GestorDatos.iterar_pacientes(self.archivo, "70000001"), None))
+        registro.cerrar()
+
+    def test_cierre_ordenado_no_pierde_registros(self):
+        for usar_bitacora, umbral in [(True, None), (True, 0), (False, None)]:
+            with self.subTest(usar_bitacora=usar_bitacora, umbral=umbral):
+                shutil.copy(config.ARCHIVO_DB, self.archivo)
+                registro = self._registro(usar_bitacora, umbral)
+
+                for i in range(200):
+                    registro.registrar(*_pedido(i))
+                    if i % 50 == 0:
+                        # Guardados intercalados con los registros
+                        registro.almacen.guardar_pendientes()
+                # Segunda atencion para pacientes ya registrados
+                for i in range(0, 200, 20):
+                    registro.registrar(*_pedido(i))
+                self.assertTrue(registro.cerrar())
+
+                pacientes = GestorDatos.cargar_pacientes(self.archivo)
+                self.assertEqual(len(pacientes), self.iniciales + 200)
+                self.assertEqual(len(pacientes.buscar("70000020").obtener_atenciones()), 2)
+                self.assertEqual(len(pacientes.buscar("70000021").obtener_atenciones()), 1)
+
+    def test_compactar_en_disco_equivale_a_cargar(self):
+        almacen = AlmacenJson(self.archivo, usar_bitacora=True)
+        almacen.cargar()
+        paciente, atencion = _pedido(1)
+        paciente.clasificar_atencion(atencion)
+        paciente.agregar_atencion(atencion)
+        almacen.registrar_atencion(paciente, atencion, True)
+
+        esperado = [p.to_dict() for p in GestorDatos.cargar_pacientes(self.archivo)]
+        self.assertTrue(GestorDatos.compactar_en_disco(self.archivo))
+        self.assertEqual(Bitacora(Bitacora.ruta_para(self.archivo)).tamano(), 0)
+        self.assertEqual([p.to_dict() for p in GestorDatos.cargar_pacientes(self.archivo)], esperado)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from historial import HistorialColumnar, VistaAtencion, marca_tiempo
+from modelo import Paciente, PacienteAdultoMayor, AtencionTriage, GestorDatos
+
+
+class TestHistorialColumnar(unittest.TestCase):
+
+    def setUp(self):
+        # Copia sin la bitacora que pueda haber dejado el sistema
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos.json"), self.archivo)
+        self.esperado = [p.to_dict() for p in GestorDatos.cargar_pacientes(self.archivo)]
+        Paciente.usar_historial_columnar(HistorialColumnar())
+
+    def tearDown(self):
+        Paciente.usar_historial_columnar(None)
+        shutil.rmtree(self.carpeta)
+
+    def test_misma_informacion_que_los_objetos(self):
+        pacientes = GestorDatos.cargar_pacientes(self.archivo)
+        self.assertEqual([p.to_dict() for p in pacientes], self.esperado)
+
+        ultima = pacientes.buscar("80545678").obtener_ultima_atencion()
+        self.assertIsInstance(ultima, VistaAtencion)
+        self.assertEqual(ultima.conciencia, "Dolor")
+        self.assertEqual(ultima.fecha_registro, marca_tiempo("09-12-2025 16:03"))
+
+    def test_reclasificar_escribe_en_la_columna(self):
+        paciente = PacienteAdultoMayor("87654321", "Abuelo Test", 80, "Masculino")
+        atencion = AtencionTriage(70, 165, 120, 80, "Alerta", 98)
+        paciente.clasificar_atencion(atencion)
+        paciente.agregar_atencion(atencion)
+
+        vista = paciente.obtener_ultima_atencion()
+        self.assertEqual(vista.nivel_atencion, "Normal")
+        vista.nivel_atencion = "Urgente"
+        self.assertEqual(paciente.to_dict()["atenciones"][0]["nivel_atencion"], "Urgente")
+
+    def test_objetos_sin_dict(self):
+        paciente = PacienteAdultoMayor("87654321", "Abuelo Test", 80, "Masculino")
+        self.assertFalse(hasattr(paciente, "__dict__"))
+        self.assertFalse(hasattr(AtencionTriage(70, 165, 120, 80, "Alerta", 98), "__dict__"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import historico
+from almacenamiento import AlmacenJson
+from historico import HistoricoAtenciones
+from modelo import PacienteEstandar, AtencionTriage, GestorDatos
+
+DIA = 24 * 3600
+
+
+def _paciente(dni, dias_atras, ahora):
+    paciente = PacienteEstandar(dni, f"Paciente {dni}", 40, "Femenino")
+    paciente.fecha_registro = ahora - dias_atras[0] * DIA
+    for i, dias in enumerate(dias_atras):
+        # La presion distingue cada atencion; la ultima del primero es urgente
+        atencion = AtencionTriage(70, 170, 100 + i, 80, "Alerta", 85 if dias == 1 else 98)
+        atencion.fecha_registro = ahora - dias * DIA
+        paciente.clasificar_atencion(atencion)
+        paciente.agregar_atencion(atencion)
+    return paciente
+
+
+class TestHistorico(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+        self.ahora = int(time.time())
+        self.pacientes = [
+            _paciente("11111111", [400, 300, 200, 10, 1], self.ahora),
+            # Su unica atencion es antigua, pero es la ultima: no se archiva
+            _paciente("22222222", [500], self.ahora),
+            _paciente("33333333", [5, 2], self.ahora),
+        ]
+        GestorDatos.guardar_pacientes(self.archivo, self.pacientes)
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def _historial(self, almacen, dni):
+        paciente = almacen.buscar_por_dni(dni)
+        return [a.to_dict() for a in almacen.historial_archivado(dni) + list(paciente.obtener_atenciones())]
+
+    def _original(self, dni):
+        return [a.to_dict() for p in self.pacientes if p.dni == dni for a in p.obtener_atenciones()]
+
+    def test_archiva_atenciones_antiguas_y_las_lee_al_pedirlas(self):
+        tamano = os.path.getsize(self.archivo)
+        esperado = AlmacenJson(self.archivo)
+        esperado.cargar()
+        estadisticas = esperado.estadisticas()
+
+        self.assertEqual(historico.archivar(self.archivo, self.ahora - 100 * DIA), 3)
+        self.assertLess(os.path.getsize(self.archivo), tamano)
+
+        almacen = AlmacenJson(self.archivo)
+        almacen.cargar()
+        self.assertEqual(almacen.buscar_por_dni("11111111").cantidad_atenciones(), 2)
+        self.assertEqual(almacen.buscar_por_dni("22222222").cantidad_atenciones(), 1)
+        self.assertEqual(almacen.estadisticas(), estadisticas)
+        self.assertEqual([p.dni for p in almacen.listar_urgentes()], ["11111111"])
+        for p in self.pacientes:
+            self.assertEqual(self._historial(almacen, p.dni), self._original(p.dni))
+
+    def test_segmentos_sucesivos_y_lzma(self):
+        historico.archivar(self.archivo, self.ahora - 250 * DIA)
+        historico.archivar(self.archivo, self.ahora - 100 * DIA, "lzma")
+
+        cabecera = HistoricoAtenciones.leer_cabecera(self.archivo)
+        self.assertEqual(len(cabecera["segmentos"]), 2)
+        self.assertTrue(cabecera["segmentos"][1].endswith(".xz"))
+        self.assertEqual(HistoricoAtenciones(self.archivo).cantidad(), 3)
+        # En los dos segmentos, contado una vez
+        self.assertEqual(HistoricoAtenciones(self.archivo).dnis(), ["11111111"])
+
+        almacen = AlmacenJson(self.archivo)
+        almacen.cargar()
+        self.assertEqual(self._historial(almacen, "11111111"), self._original("11111111"))
+
+    def test_corte_antes_de_reescribir_no_duplica(self):
+        with mock.patch.object(GestorDatos, "_guardar_dicts", return_value=False):
+            with self.assertRaises(OSError):
+                historico.archivar(self.archivo, self.ahora - 100 * DIA)
+
+        # El principal sigue completo y lo archivado no se muestra dos veces
+        almacen = AlmacenJson(self.archivo)
+        almacen.cargar()
+        self.assertEqual(self._historial(almacen, "11111111"), self._original("11111111"))
+
+        self.assertEqual(historico.archivar(self.archivo, self.ahora - 100 * DIA), 0)
+        self.assertEqual(HistoricoAtenciones(self.archivo).cantidad(), 3)
+        almacen = AlmacenJson(self.archivo)
+        almacen.cargar()
+        self.assertEqual(almacen.buscar_por_dni("11111111").cantidad_atenciones(), 2)
+        self.assertEqual(self._historial(almacen, "11111111"), self._original("11111111"))
+
+    def test_restaurar_devuelve_todo_al_archivo_principal(self):
+        historico.archivar(self.archivo, self.ahora - 100 * DIA)
+        self.assertEqual(historico.restaurar(self.archivo), 3)
+
+        self.assertEqual(sorted(os.listdir(self.carpeta)), ["datos.json", "datos.json.meta"])
+        pacientes = GestorDatos.cargar_pacientes(self.archivo)
+        for p in self.pacientes:
+            self.assertEqual([a.to_dict() for a in pacientes.buscar(p.dni).obtener_atenciones()],
+                             self._original(p.dni))
+
+    def test_archivado_automatico_una_vez_por_intervalo(self):
+        almacen = AlmacenJson(self.archivo, dias_historico=100)
+        with mock.patch("builtins.print") as salida:
+            almacen.cargar()
+        salida.assert_called_once()
+        self.assertEqual(almacen.buscar_por_dni("11111111").cantidad_atenciones(), 2)
+
+        # Una atencion que envejece no se archiva hasta el proximo intervalo
+        with mock.patch.object(historico, "archivar") as archivar:
+            AlmacenJson(self.archivo, dias_historico=1).cargar()
+        archivar.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import config
+from almacenamiento import AlmacenJson, AlmacenSqlite
+from importador import Importador, validar_fila
+from modelo import PacienteAdultoMayor, GestorDatos
+
+ENCABEZADO = "dni,nombre,edad,sexo,peso,talla,presion,frecuencia,conciencia,saturacion\n"
+
+
+class TestImportador(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, self.archivo)
+        self.almacen = AlmacenJson(self.archivo)
+        self.almacen.cargar()
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def _escribir(self, nombre, contenido):
+        ruta = os.path.join(self.carpeta, nombre)
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        return ruta
+
+    def test_validar_fila_clasifica_con_la_subclase(self):
+        datos = validar_fila({
+            "dni": "22223333", "nombre": "rosa diaz", "edad": "70", "sexo": "F",
+            "peso": "60", "talla": "160", "presion": "150", "frecuencia": "105",
+            "conciencia": "A", "saturacion": "96"
+        })
+        self.assertEqual(datos["nombre"], "Rosa Diaz")
+        self.assertEqual(datos["sexo"], "Femenino")
+        # 105 lpm es normal para el estandar pero no para el adulto mayor
+        self.assertEqual(datos["atenciones"][0]["nivel_atencion"], "Normal")
+
+    def test_csv_con_rechazos_en_paralelo(self):
+        ruta = self._escribir("lote.csv", ENCABEZADO + (
+            "30000001,Ana Lopez,30,Femenino,60,160,120,80,Alerta,98\n"
+            "30000002,Luis Mora,80,M,70,170,120,80,V,98\n"
+            "123,Dni Corto,30,M,70,170,120,80,A,98\n"
+            "30000003,Sin Talla,30,M,70,,120,80,A,98\n"
+            "30000001,Ana Lopez,30,Femenino,60,160,120,80,Dolor,98\n"
+        ))
+        resumen = Importador(self.almacen, procesos=2, tamano_lote=2).importar(ruta)
+
+        self.assertEqual((resumen["aceptadas"], resumen["rechazadas"]), (3, 2))
+        with open(resumen["archivo_errores"], encoding="utf-8") as f:
+            errores = [json.loads(linea) for linea in f]
+        self.assertEqual([e["linea"] for e in errores], [4, 5])
+        self.assertIn("talla", errores[1]["motivo"])
+
+        ana = self.almacen.buscar_por_dni("30000001")
+        self.assertEqual([a.nivel_atencion for a in ana.obtener_atenciones()], ["Normal", "Urgente"])
+        self.assertIsInstance(self.almacen.buscar_por_dni("30000002"), PacienteAdultoMayor)
+
+        # Lo importado quedo en la bitacora y se recupera al recargar
+        recargado = GestorDatos.cargar_pacientes(self.archivo)
+        self.assertEqual(len(recargado.buscar("30000001").obtener_atenciones()), 2)
+
+    def test_jsonl_hacia_sqlite(self):
+        almacen = AlmacenSqlite(os.path.join(self.carpeta, "datos.db"))
+        almacen.cargar()
+        ruta = self._escribir("lote.jsonl", "\n".join([
+            json.dumps({"dni": "40000001", "nombre": "Eva Paz", "edad": 40, "sexo": "F", "peso": 55,
+                        "talla": 158, "presion": 85, "frecuencia": 80, "conciencia": "A", "saturacion": 97}),
+            "{no es json",
+        ]) + "\n")
+        resumen = Importador(almacen, procesos=1).importar(ruta)
+
+        self.assertEqual((resumen["aceptadas"], resumen["rechazadas"]), (1, 1))
+        self.assertEqual([p.dni for p in almacen.listar_urgentes()], ["40000001"])
+        almacen.cerrar()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import config
+from almacenamiento import AlmacenJson, AlmacenSqlite
+from historial import marca_tiempo
+from indices import (
+    AlmacenIndexado, ColaUrgencias, EstadisticasIncrementales, IndiceNombres, IndiceTemporal, puntaje_gravedad
+)
+from modelo import AtencionTriage, GestorDatos, PacienteEstandar, PacienteAdultoMayor, RegistroPacientes
+
+
+def _atencion(presion=120, frecuencia=80, saturacion=98, conciencia="Alerta", nivel="Urgente", fecha="01-01-2025 08:00"):
+    atencion = AtencionTriage(70, 170, presion, frecuencia, conciencia, saturacion)
+    atencion.nivel_atencion = nivel
+    atencion.fecha_registro = fecha
+    return atencion
+
+
+class TestColaUrgencias(unittest.TestCase):
+
+    def test_orden_por_gravedad_y_llegada(self):
+        cola = ColaUrgencias()
+        cola.actualizar("00000001", _atencion(saturacion=91, fecha="01-01-2025 08:10"))
+        cola.actualizar("00000002", _atencion(conciencia="Inconsciente", fecha="01-01-2025 08:20"))
+        cola.actualizar("00000003", _atencion(saturacion=91, fecha="01-01-2025 08:00"))
+
+        self.assertEqual(list(cola.primeros()), ["00000002", "00000003", "00000001"])
+        self.assertEqual(cola.siguiente(), "00000002")
+        self.assertEqual(list(cola.primeros(2)), ["00000002", "00000003"])
+
+    def test_retriaje_reemplaza_o_quita_la_entrada(self):
+        cola = ColaUrgencias()
+        cola.actualizar("00000001", _atencion(saturacion=91))
+        cola.actualizar("00000002", _atencion(saturacion=80))
+        cola.actualizar("00000001", _atencion(conciencia="Inconsciente", saturacion=80))
+        self.assertEqual(list(cola.primeros()), ["00000001", "00000002"])
+
+        cola.actualizar("00000001", _atencion(nivel="Normal"))
+        self.assertEqual(list(cola.primeros()), ["00000002"])
+        self.assertNotIn("00000001", cola)
+
+    def test_coincide_con_ordenar_todo(self):
+        random.seed(7)
+        cola = ColaUrgencias()
+        ultimas = {}
+        for i in range(2000):
+            dni = f"{random.randrange(300):08d}"
+            atencion = _atencion(
+                presion=random.randint(50, 200), frecuencia=random.randint(30, 150),
+                saturacion=random.randint(80, 100),
+                conciencia=random.choice(["Alerta", "Verbal", "Dolor", "Inconsciente"]),
+                nivel=random.choice(["Urgente", "Normal"]),
+                fecha=(datetime(2025, 1, 1) + timedelta(minutes=i)).strftime("%d-%m-%Y %H:%M")
+            )
+            cola.actualizar(dni, atencion)
+            ultimas[dni] = (i, atencion)
+
+        urgentes = [(dni, i, a) for dni, (i, a) in ultimas.items() if a.nivel_atencion == "Urgente"]
+        esperado = [dni for dni, _, _ in sorted(urgentes, key=lambda u: (-puntaje_gravedad(u[2]), u[1]))]
+        self.assertEqual(list(cola.primeros()), esperado)
+
+
+class TestEstadisticasIncrementales(unittest.TestCase):
+
+    def _recalcular(self, pacientes):
+        almacen = AlmacenJson(None)
+        almacen.pacientes = pacientes
+        stats = almacen.estadisticas()
+
+        ultimas = [p.obtener_ultima_atencion() for p in pacientes if p.obtener_ultima_atencion()]
+        stats["signos_vitales"] = {}
+        for signo in EstadisticasIncrementales.SIGNOS_VITALES:
+            valores = [getattr(a, signo) for a in ultimas]
+            stats["signos_vitales"][signo] = {
+                "min": min(valores, default=None),
+                "max": max(valores, default=None),
+                "promedio": round(sum(valores) / len(valores), 1) if valores else None
+            }
+        return stats
+
+    def test_coincide_con_recalcular_todo(self):
+        random.seed(11)
+        pacientes = RegistroPacientes()
+        estadisticas = EstadisticasIncrementales()
+        self.assertEqual(estadisticas.resumen(), self._recalcular(pacientes))
+
+        for i in range(500):
+            dni = f"{random.randrange(120):08d}"
+            atencion = _atencion(
+                presion=random.randint(60, 200), frecuencia=random.randint(40, 150),
+                saturacion=random.randint(80, 100), nivel=random.choice(["Urgente", "Normal"])
+            )
+            paciente = pacientes.buscar(dni)
+            if paciente is None:
+                edad = random.randint(0, 99)
+                Clase = PacienteEstandar if edad < 65 else PacienteAdultoMayor
+                paciente = Clase(dni, "Paciente Test", edad, "Femenino")
+                paciente.agregar_atencion(atencion)
+                pacientes.agregar(paciente)
+                estadisticas.agregar_paciente(paciente)
+            else:
+                anterior = paciente.obtener_ultima_atencion()
+                paciente.agregar_atencion(atencion)
+                estadisticas.reemplazar_ultima(anterior, atencion)
+
+            if i % 50 == 0:
+                self.assertEqual(estadisticas.resumen(), self._recalcular(pacientes))
+
+        self.assertEqual(estadisticas.resumen(), self._recalcular(pacientes))
+        self.assertEqual(EstadisticasIncrementales.desde_pacientes(pacientes).resumen(), estadisticas.resumen())
+
+
+class TestIndiceNombres(unittest.TestCase):
+
+    def setUp(self):
+        self.indice = IndiceNombres()
+        for dni, nombre in [("00000001", "Juan Peréz"), ("00000002", "Juan Perez"),
+                            ("00000003", "Carlos Ruiz"), ("00000004", "María López")]:
+            self.indice.actualizar(dni, nombre)
+
+    def _dnis(self, texto):
+        return [dni for dni, _ in self.indice.buscar(texto)]
+
+    def test_ignora_tildes_y_mayusculas(self):
+        self.assertEqual(sorted(self._dnis("PEREZ")), ["00000001", "00000002"])
+        self.assertEqual(self._dnis("maria lopez"), ["00000004"])
+
+    def test_prefijo_y_errores_de_tipeo(self):
+        self.assertEqual(self._dnis("carl"), ["00000003"])
+        self.assertEqual(self._dnis("Carlos Ruis"), ["00000003"])
+        self.assertEqual(self._dnis("zzz"), [])
+
+    def test_ordena_por_similitud(self):
+        self.indice.actualizar("00000005", "Juan Perez Gonzales Del Campo")
+        resultados = self.indice.buscar("juan perez")
+        self.assertEqual(resultados[-1][0], "00000005")
+        self.assertGreater(resultados[0][1], resultados[-1][1])
+
+    def test_actualizar_reemplaza_el_nombre(self):
+        self.indice.actualizar("00000003", "Pedro Gomez")
+        self.assertEqual(self._dnis("carlos"), [])
+        self.assertEqual(self._dnis("gomez"), ["00000003"])
+
+
+class TestIndiceTemporal(unittest.TestCase):
+
+    def test_rango_coincide_con_recorrer_todo(self):
+        generador = random.Random(7)
+        todas = []
+        indice = IndiceTemporal()
+        for i in range(500):
+            marca = generador.randrange(0, 10_000)
+            todas.append((marca, f"{i:08d}", 0))
+            indice.agregar(marca, f"{i:08d}", 0)
+
+        todas.sort(key=lambda t: t[0])
+        for _ in range(50):
+            desde = generador.randrange(0, 10_000)
+            hasta = desde + generador.randrange(0, 3_000)
+            self.assertEqual(list(indice.entre(desde, hasta)), [t for t in todas if desde <= t[0] < hasta])
+
+    def test_almacen_indexado_sigue_los_registros(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        archivo = os.path.join(carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, archivo)
+
+        registro = AlmacenIndexado(AlmacenJson(archivo, usar_bitacora=True))
+        registro.cargar()
+        desde, hasta = marca_tiempo("01-12-2025 00:00"), marca_tiempo("31-12-2025 00:00")
+        # La primera consulta arma el indice; los registros siguientes lo actualizan
+        antes = len(list(registro.atenciones_entre(desde, hasta)))
+
+        paciente = PacienteEstandar("70000001", "Paciente Nuevo", 40, "Femenino")
+        registro.registrar(paciente, _atencion(fecha="15-12-2025 10:00"))
+        registro.registrar(registro.buscar_por_dni("80545678"), _atencion(fecha="15-12-2025 09:00"))
+        self.assertEqual(len(registro.indice_temporal), len(list(registro.atenciones_entre(0, 2 ** 40))))
+        self.assertEqual(len(list(registro.atenciones_entre(desde, hasta))), antes + 2)
+
+        for solo_urgentes in (False, True):
+            with self.subTest(solo_urgentes=solo_urgentes):
+                self.assertEqual(
+                    [(p.dni, a.to_dict()) for p, a in registro.atenciones_entre(desde, hasta, solo_urgentes)],
+                    [(p.dni, a.to_dict()) for p, a in registro.almacen.atenciones_entre(desde, hasta, solo_urgentes)]
+                )
+
+        recientes = [p.dni for p, _ in registro.atenciones_entre(marca_tiempo("15-12-2025 00:00"), hasta)]
+        self.assertEqual(recientes[-2:], ["80545678", "70000001"])
+        registro.cerrar()
+
+    def test_guardado_fallido_se_informa(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        archivo = os.path.join(carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, archivo)
+
+        registro = AlmacenIndexado(AlmacenJson(archivo, usar_bitacora=True))
+        registro.cargar()
+        paciente = PacienteEstandar("70000001", "Paciente Nuevo", 40, "Femenino")
+        with mock.patch.object(registro.almacen, "registrar_lote", return_value=False):
+            with self.assertRaises(OSError):
+                registro.registrar(paciente, _atencion())
+
+    def test_consultas_indexadas_las_resuelve_el_almacen(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        archivo = os.path.join(carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, archivo)
+
+        memoria = AlmacenIndexado(AlmacenJson(archivo, usar_bitacora=True))
+        memoria.cargar()
+        almacen = AlmacenSqlite(os.path.join(carpeta, "datos.db"))
+        almacen.cargar()
+        almacen.importar(GestorDatos.cargar_pacientes(archivo))
+        sqlite = AlmacenIndexado(almacen)
+        sqlite.cargar()
+        # Sin cola, estadisticas ni indice de nombres en memoria
+        self.assertIsNone(sqlite.cola_urgencias)
+        self.assertIsNone(sqlite.estadisticas)
+
+        for registro in (memoria, sqlite):
+            registro.registrar(PacienteEstandar("70000001", "Paciente Nuevo", 40, "Femenino"),
+                               _atencion(conciencia="Inconsciente", fecha="15-12-2025 10:00"))
+
+        self.assertEqual([p.dni for p in sqlite.listar_urgentes()], [p.dni for p in memoria.listar_urgentes()])
+        self.assertEqual([p.dni for p in sqlite.listar_urgentes(3)], [p.dni for p in memoria.listar_urgentes(3)])
+        esperado = memoria.resumen_estadisticas()
+        del esperado["signos_vitales"]
+        self.assertEqual(sqlite.resumen_estadisticas(), esperado)
+        self.assertEqual({p.dni for p in sqlite.buscar_por_nombre("lopez")},
+                         {p.dni for p in memoria.buscar_por_nombre("lopez") if "lopez" in p.nombre.lower()})
+        memoria.cerrar()
+        sqlite.cerrar()
+
+
+if __name__ == '__main__':
+    unittest.main()
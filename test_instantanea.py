@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import config
+import instantanea
+from almacenamiento import AlmacenJson
+from instantanea import Instantanea, AtencionesEmpaquetadas
+from modelo import GestorDatos, PacienteEstandar, AtencionTriage
+
+
+class TestInstantanea(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.json = os.path.join(self.carpeta, "datos.json")
+        self.bin = os.path.join(self.carpeta, "datos.bin")
+        shutil.copy(config.ARCHIVO_DB, self.json)
+        self.assertTrue(GestorDatos.convertir(self.json, self.bin))
+        self.originales = [p.to_dict() for p in GestorDatos.cargar_pacientes(self.json)]
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def test_conversion_ida_y_vuelta(self):
+        vuelta = os.path.join(self.carpeta, "vuelta.json")
+        self.assertTrue(GestorDatos.convertir(self.bin, vuelta))
+
+        for ruta in (self.bin, vuelta):
+            with self.subTest(ruta=os.path.basename(ruta)):
+                self.assertEqual([p.to_dict() for p in GestorDatos.cargar_pacientes(ruta)], self.originales)
+        self.assertTrue(GestorDatos._archivo_verificado(self.bin))
+        self.assertLess(os.path.getsize(self.bin), os.path.getsize(self.json))
+
+    def test_busqueda_por_dni_con_el_indice(self):
+        with Instantanea(self.bin) as datos:
+            self.assertEqual(len(datos), len(self.originales))
+            for original in self.originales:
+                encontrado = datos.buscar(original["dni"])
+                self.assertEqual(encontrado["nombre"], original["nombre"])
+                self.assertEqual(list(encontrado["atenciones"]), original["atenciones"])
+            self.assertIsNone(datos.buscar("00000000"))
+
+    def test_historial_antiguo_queda_empaquetado(self):
+        dni = max(self.originales, key=lambda d: len(d["atenciones"]))["dni"]
+        paciente = GestorDatos.cargar_pacientes(self.bin).buscar(dni)
+
+        self.assertIsInstance(paciente._atenciones_pendientes, AtencionesEmpaquetadas)
+        esperado = next(d for d in self.originales if d["dni"] == dni)["atenciones"]
+        self.assertEqual([a.to_dict() for a in paciente.obtener_atenciones()], esperado)
+
+    def test_archivo_que_no_es_instantanea(self):
+        falso = os.path.join(self.carpeta, "falso.bin")
+        shutil.copy(self.json, falso)
+        with self.assertRaises(ValueError):
+            Instantanea(falso)
+
+        with open(self.bin, "rb") as f:
+            truncado = f.read()[:-10]
+        with open(falso, "wb") as f:
+            f.write(truncado)
+        with self.assertRaises(ValueError):
+            Instantanea(falso)
+
+    def test_almacen_sobre_instantanea(self):
+        almacen = AlmacenJson(self.bin, usar_bitacora=True)
+        almacen.cargar()
+        paciente = PacienteEstandar("70000001", "Paciente Nuevo", 40, "Femenino")
+        atencion = AtencionTriage(70, 170, 120, 80, "Alerta", 98)
+        paciente.clasificar_atencion(atencion)
+        paciente.agregar_atencion(atencion)
+        almacen.registrar_atencion(paciente, atencion, True)
+
+        # Antes de compactar: instantanea + bitacora
+        self.assertIsNotNone(next(GestorDatos.iterar_pacientes(self.bin, "70000001"), None))
+        self.assertTrue(almacen.cerrar())
+
+        self.assertTrue(instantanea.es_instantanea(self.bin))
+        with Instantanea(self.bin) as datos:
+            self.assertEqual(len(datos), len(self.originales) + 1)
+            self.assertEqual(datos.buscar("70000001")["nombre"], "Paciente Nuevo")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+import config
+import metricas
+from metricas import Histograma
+from modelo import GestorDatos
+
+
+class TestHistograma(unittest.TestCase):
+
+    def test_cubetas_y_percentiles(self):
+        h = Histograma()
+        for segundos in [0.0001] * 90 + [0.3] * 9 + [60]:
+            h.observar(segundos)
+
+        self.assertEqual(h.cantidad, 100)
+        self.assertEqual(h.cubetas[0], 90)
+        self.assertEqual(h.cubetas[-1], 1)
+        self.assertEqual(h.percentil(0.5), metricas.LIMITES[0])
+        self.assertEqual(h.percentil(0.95), 0.5)
+        self.assertEqual(h.maximo, 60)
+
+
+class TestMetricas(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "metricas.prom")
+
+    def tearDown(self):
+        metricas.desactivar()
+        shutil.rmtree(self.carpeta)
+
+    def test_desactivadas_no_registran_nada(self):
+        @metricas.medido("prueba.suma")
+        def sumar(a, b):
+            return a + b
+
+        self.assertIsNone(metricas.activas())
+        self.assertEqual(sumar(2, 3), 5)
+        with metricas.tramo("prueba.tramo"):
+            pass
+        metricas.contar("prueba.contador")
+
+        activas = metricas.activar()
+        self.assertEqual(activas.to_dict(), {"operaciones": {}, "contadores": {}})
+        self.assertEqual(sumar(2, 3), 5)
+        self.assertEqual(activas.histogramas["prueba.suma"].cantidad, 1)
+
+    def test_carga_y_guardado_instrumentados(self):
+        datos = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, datos)
+        activas = metricas.activar(self.archivo)
+
+        pacientes = GestorDatos.cargar_pacientes(datos)
+        self.assertTrue(GestorDatos.guardar_pacientes(datos, pacientes))
+
+        self.assertEqual(activas.contadores["gestor.registros_cargados"], len(pacientes))
+        self.assertEqual(activas.contadores["gestor.bytes_escritos"], os.path.getsize(datos))
+        self.assertEqual(activas.histogramas["gestor.cargar"].cantidad, 1)
+        self.assertEqual(activas.histogramas["gestor.guardar"].cantidad, 1)
+
+        self.assertTrue(activas.exportar())
+        with open(self.archivo, encoding="utf-8") as f:
+            texto = f.read()
+        self.assertIn('triaje_operacion_segundos_count{operacion="gestor.guardar"} 1', texto)
+        self.assertIn('triaje_operacion_segundos_bucket{operacion="gestor.cargar",le="+Inf"} 1', texto)
+        self.assertIn(f"triaje_gestor_registros_cargados_total {len(pacientes)}", texto)
+
+        como_json = os.path.join(self.carpeta, "metricas.json")
+        self.assertTrue(activas.exportar(como_json))
+        with open(como_json, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["operaciones"]["gestor.cargar"]["cantidad"], 1)
+
+    def test_perfil_de_una_sola_operacion(self):
+        metricas.activar(self.archivo, perfilar="prueba.lenta")
+
+        with redirect_stdout(StringIO()):
+            for _ in range(2):
+                with metricas.tramo("prueba.lenta"):
+                    sorted(range(1000), reverse=True)
+
+        perfil = self.archivo + ".prueba.lenta.prof"
+        self.assertTrue(os.path.exists(perfil))
+        self.assertIsNone(metricas.activas().perfilar)
+        self.assertGreater(pstats.Stats(perfil).total_calls, 0)
+        self.assertEqual(metricas.activas().histogramas["prueba.lenta"].cantidad, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,11 @@
+import json
+import os
+import shutil
+import tempfile
 import unittest
-from modelo import PacienteEstandar, PacienteAdultoMayor, AtencionTriage
+from bitacora import Bitacora
+from historial import marca_tiempo, formato_fecha
+from modelo import PacienteEstandar, PacienteAdultoMayor, AtencionTriage, RegistroPacientes, GestorDatos, DniDuplicadoException
 
 
 class TestTriaje(unittest.TestCase):
@@ -48,5 +54,177 @@ class TestTriaje(unittest.TestCase):
 
 
 
+class TestRegistroPacientes(unittest.TestCase):
+
+    def setUp(self):
+        self.registro = RegistroPacientes()
+        self.registro.agregar(PacienteEstandar("12345678", "Primero", 30, "Masculino"))
+        self.registro.agregar(PacienteAdultoMayor("87654321", "Segundo", 70, "Femenino"))
+
+    def test_busqueda_por_dni(self):
+        self.assertEqual(self.registro.buscar("87654321").nombre, "Segundo")
+        self.assertIsNone(self.registro.buscar("00000000"))
+        self.assertIn("12345678", self.registro)
+
+    def test_conserva_orden_de_insercion(self):
+        self.assertEqual([p.dni for p in self.registro], ["12345678", "87654321"])
+        self.assertEqual(len(self.registro), 2)
+
+    def test_rechaza_dni_duplicado(self):
+        with self.assertRaises(DniDuplicadoException):
+            self.registro.agregar(PacienteEstandar("12345678", "Otro", 40, "Femenino"))
+
+    def test_carga_rechaza_dni_duplicado(self):
+        datos = [p.to_dict() for p in self.registro]
+        datos.append(datos[0])
+        with tempfile.TemporaryDirectory() as carpeta:
+            archivo = os.path.join(carpeta, "datos.json")
+            with open(archivo, "w", encoding="utf-8") as f:
+                json.dump(datos, f)
+            with self.assertRaises(DniDuplicadoException):
+                GestorDatos.cargar_pacientes(archivo)
+
+
+
+class TestBitacora(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.TemporaryDirectory()
+        self.archivo = os.path.join(self.carpeta.name, "datos.json")
+        self.pacientes = RegistroPacientes([PacienteEstandar("12345678", "Inicial", 30, "Masculino")])
+        GestorDatos.guardar_pacientes(self.archivo, self.pacientes)
+
+    def tearDown(self):
+        self.carpeta.cleanup()
+
+    def _registrar(self, dni, umbral=None):
+        paciente = PacienteAdultoMayor(dni, "Nuevo", 70, "Femenino")
+        atencion = AtencionTriage(60, 160, 120, 80, "Alerta", 98)
+        paciente.agregar_atencion(atencion)
+        paciente.clasificar_atencion(atencion)
+        self.pacientes.agregar(paciente)
+        GestorDatos.registrar_atencion(self.archivo, self.pacientes, paciente, atencion, True, umbral)
+
+    def test_registro_no_reescribe_archivo_principal(self):
+        with open(self.archivo, encoding="utf-8") as f:
+            antes = f.read()
+        self._registrar("87654321")
+        with open(self.archivo, encoding="utf-8") as f:
+            self.assertEqual(f.read(), antes)
+
+        cargados = GestorDatos.cargar_pacientes(self.archivo)
+        self.assertEqual(len(cargados), 2)
+        self.assertEqual(cargados.buscar("87654321").obtener_ultima_atencion().nivel_atencion, "Normal")
+
+    def test_compactacion_vuelca_bitacora(self):
+        self._registrar("87654321", umbral=0)
+        self.assertEqual(Bitacora(Bitacora.ruta_para(self.archivo)).tamano(), 0)
+        with open(self.archivo, encoding="utf-8") as f:
+            self.assertEqual(len(json.load(f)), 2)
+
+    def test_descarta_bitacora_de_otro_archivo(self):
+        self._registrar("87654321")
+        # El archivo principal se modifica por fuera despues de la bitacora
+        with open(self.archivo, "a", encoding="utf-8") as f:
+            f.write("\n")
+        self.assertEqual(len(GestorDatos.cargar_pacientes(self.archivo)), 1)
+        self.assertTrue(os.path.exists(Bitacora.ruta_para(self.archivo) + ".descartada"))
+
+    def test_linea_incompleta_no_pierde_los_registros_siguientes(self):
+        bitacora = Bitacora(Bitacora.ruta_para(self.archivo))
+        bitacora.agregar([{"tipo": "atencion", "dni": "1"}], "firma")
+        # Corte a mitad de la escritura del segundo registro
+        with open(bitacora.ruta, "a", encoding="utf-8") as f:
+            f.write('{"tipo": "atencion", "dn')
+        bitacora.agregar([{"tipo": "atencion", "dni": "3"}, {"tipo": "atencion", "dni": "4"}], "firma")
+
+        base, registros = bitacora.leer()
+        self.assertEqual(base, "firma")
+        self.assertEqual([r["dni"] for r in registros], ["1", "3", "4"])
+
+        # Una bitacora que ya quedo con la linea pegada pierde solo esa linea
+        with open(bitacora.ruta, "a", encoding="utf-8") as f:
+            f.write('{"tipo": "atencion", "dn{"tipo": "atencion", "dni": "5"}\n{"tipo": "atencion", "dni": "6"}\n')
+        self.assertEqual([r["dni"] for r in bitacora.leer()[1]], ["1", "3", "4", "6"])
+
+    def test_base_incompleta_se_vuelve_a_escribir(self):
+        bitacora = Bitacora(Bitacora.ruta_para(self.archivo))
+        with open(bitacora.ruta, "w", encoding="utf-8") as f:
+            f.write('{"tipo": "base", "fir')
+        bitacora.agregar([{"tipo": "atencion", "dni": "1"}], "firma")
+        self.assertEqual(bitacora.leer(), ("firma", [{"tipo": "atencion", "dni": "1"}]))
+
+
+
+class TestCargaDiferida(unittest.TestCase):
+
+    def setUp(self):
+        # Copia sin la bitacora que pueda haber dejado el sistema
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos.json"), self.archivo)
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def test_lectura_por_bloques_equivale_a_json_load(self):
+        with open(self.archivo, encoding="utf-8") as f:
+            esperado = json.load(f)
+        # Bloques diminutos para forzar registros partidos entre lecturas
+        leidos = list(GestorDatos._iterar_registros(self.archivo, tamano_bloque=7))
+        self.assertEqual(leidos, esperado)
+
+    def test_historial_se_construye_al_pedirlo(self):
+        paciente = GestorDatos.cargar_pacientes(self.archivo).buscar("80545678")
+        self.assertEqual(len(paciente._lista_atencion_triaje), 1)
+        self.assertEqual(paciente.obtener_ultima_atencion().fecha_registro, marca_tiempo("09-12-2025 16:03"))
+
+        historial = paciente.obtener_atenciones()
+        self.assertEqual(
+            [formato_fecha(a.fecha_registro) for a in historial], ["26-11-2025 09:15", "09-12-2025 16:03"]
+        )
+        self.assertEqual(paciente._atenciones_pendientes, [])
+
+
+
+class TestCargaConfiable(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.TemporaryDirectory()
+        self.archivo = os.path.join(self.carpeta.name, "datos.json")
+        origen = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos.json")
+        self.pacientes = GestorDatos.cargar_pacientes(origen)
+
+    def tearDown(self):
+        self.carpeta.cleanup()
+
+    def test_from_dict_confiable_equivale_al_validado(self):
+        for p in self.pacientes:
+            d = p.to_dict()
+            rapido = type(p).from_dict(d, confiable=True)
+            self.assertEqual(rapido.to_dict(), d)
+            self.assertEqual(rapido.obtener_atenciones()[0].to_dict(), d["atenciones"][0])
+
+    def test_sello_detecta_cambios_en_el_archivo(self):
+        GestorDatos.guardar_pacientes(self.archivo, self.pacientes)
+        self.assertTrue(GestorDatos._archivo_verificado(self.archivo))
+
+        with open(self.archivo, "a", encoding="utf-8") as f:
+            f.write(" ")
+        self.assertFalse(GestorDatos._archivo_verificado(self.archivo))
+
+    def test_archivo_alterado_se_vuelve_a_validar(self):
+        GestorDatos.guardar_pacientes(self.archivo, self.pacientes)
+        with open(self.archivo, encoding="utf-8") as f:
+            datos = json.load(f)
+        datos[0]["nombre"] = "  nombre editado  "
+        with open(self.archivo, "w", encoding="utf-8") as f:
+            json.dump(datos, f)
+
+        cargados = GestorDatos.cargar_pacientes(self.archivo)
+        self.assertEqual(cargados.buscar(datos[0]["dni"]).nombre, "Nombre Editado")
+
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,185 @@
+import copy
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+import config
+import reglas
+from modelo import PacienteEstandar, PacienteAdultoMayor, AtencionTriage, clase_por_edad
+
+PRESIONES = [0, 89, 90, 99, 100, 160, 161, 180, 181, 200]
+FRECUENCIAS = [0, 54, 55, 100, 101, 110, 111, 200]
+SATURACIONES = [0, 91, 92, 93, 94, 100]
+CONCIENCIAS = ["Alerta", "Verbal", "Dolor", "Inconsciente"]
+EDADES = [0, 30, 64, 65, 80, 120]
+
+
+def _clasificacion_anterior(edad, presion, frecuencia, saturacion, conciencia):
+    # Las reglas que estaban escritas en PacienteEstandar y PacienteAdultoMayor
+    if edad < 65:
+        urgente = (presion < 90 or presion > 180 or frecuencia > 100 or
+                   saturacion < 92 or conciencia != "Alerta")
+    else:
+        urgente = (presion < 100 or presion > 160 or frecuencia < 55 or frecuencia > 110 or
+                   saturacion < 94 or conciencia != "Alerta")
+    return "Urgente" if urgente else "Normal"
+
+
+class TestMotorReglas(unittest.TestCase):
+
+    def tearDown(self):
+        reglas.cargar()
+
+    def test_reglas_de_config_coinciden_con_las_anteriores(self):
+        motor = reglas.cargar()
+        for caso in itertools.product(EDADES, PRESIONES, FRECUENCIAS, SATURACIONES, CONCIENCIAS):
+            self.assertEqual(motor.clasificar(*caso), _clasificacion_anterior(*caso), caso)
+
+    def test_clasificar_atencion_usa_el_motor(self):
+        self.assertIs(clase_por_edad(64), PacienteEstandar)
+        self.assertIs(clase_por_edad(65), PacienteAdultoMayor)
+
+        paciente = clase_por_edad(70)("12345678", "Paciente Test", 70, "Femenino")
+        atencion = AtencionTriage(70, 170, 170, 80, "Alerta", 98)
+        self.assertEqual(paciente.clasificar_atencion(atencion), "Urgente")
+
+        # Otra tabla: el mismo paciente se clasifica con la nueva
+        tabla = copy.deepcopy(config.REGLAS_TRIAJE)
+        tabla["grupos"][1]["niveles"][0]["si_alguna"] = [["saturacion", "<", 80]]
+        reglas.usar(tabla)
+        self.assertEqual(paciente.clasificar_atencion(atencion), "Normal")
+
+    def test_clase_por_edad_sigue_las_franjas(self):
+        tabla = copy.deepcopy(config.REGLAS_TRIAJE)
+        tabla["grupos"][0]["edad_hasta"] = 69
+        tabla["grupos"][1]["edad_desde"] = 70
+        reglas.usar(tabla)
+        self.assertIs(clase_por_edad(69), PacienteEstandar)
+        self.assertIs(clase_por_edad(69.5), PacienteAdultoMayor)
+        self.assertIs(clase_por_edad(70), PacienteAdultoMayor)
+
+        # Una sola franja: nadie es adulto mayor
+        reglas.usar({"grupos": [dict(tabla["grupos"][0], edad_hasta=None)]})
+        self.assertIs(clase_por_edad(90), PacienteEstandar)
+
+    def test_columnas_coinciden_con_la_version_escalar(self):
+        try:
+            import numpy as np
+        except ImportError:
+            self.skipTest("NumPy no esta instalado")
+
+        motor = reglas.motor()
+        casos = list(itertools.product(EDADES, PRESIONES, FRECUENCIAS, SATURACIONES, CONCIENCIAS))
+        columnas = [np.asarray(c) for c in zip(*casos)]
+        self.assertEqual(
+            list(motor.clasificar_columnas(*columnas)),
+            [motor.clasificar(*caso) for caso in casos]
+        )
+
+    def test_columnas_con_edades_no_enteras(self):
+        try:
+            import numpy as np
+        except ImportError:
+            self.skipTest("NumPy no esta instalado")
+
+        motor = reglas.motor()
+        # 64.5 no esta en ninguna franja entera: la escalar la manda a la siguiente
+        casos = [(edad, 120, 105, 95, "Alerta") for edad in (0.5, 30.2, 64.5, 64.99, 65.0, 90.5)]
+        self.assertEqual(motor.clasificar(64.5, 120, 105, 95, "Alerta"), "Normal")
+        columnas = [np.asarray(c) for c in zip(*casos)]
+        self.assertEqual(
+            list(motor.clasificar_columnas(*columnas)),
+            [motor.clasificar(*caso) for caso in casos]
+        )
+
+    def test_tablas_invalidas(self):
+        valida = config.REGLAS_TRIAJE
+        invalidas = []
+
+        sin_adulto_mayor = copy.deepcopy(valida)
+        del sin_adulto_mayor["grupos"][1]
+        invalidas.append(sin_adulto_mayor)
+
+        con_hueco = copy.deepcopy(valida)
+        con_hueco["grupos"][1]["edad_desde"] = 70
+        invalidas.append(con_hueco)
+
+        signo_desconocido = copy.deepcopy(valida)
+        signo_desconocido["grupos"][0]["niveles"][0]["si_alguna"].append(["temperatura", ">", 38])
+        invalidas.append(signo_desconocido)
+
+        nivel_desconocido = copy.deepcopy(valida)
+        nivel_desconocido["grupos"][0]["niveles"][0]["nivel"] = "Critico"
+        invalidas.append(nivel_desconocido)
+
+        conciencia_numerica = copy.deepcopy(valida)
+        conciencia_numerica["grupos"][0]["niveles"][0]["si_alguna"].append(["conciencia", "<", 3])
+        invalidas.append(conciencia_numerica)
+
+        for tabla in invalidas + [{}, {"grupos": []}]:
+            with self.subTest(tabla=tabla), self.assertRaises(ValueError):
+                reglas.MotorReglas(tabla)
+
+
+class TestRecargaDeReglas(unittest.TestCase):
+
+    def setUp(self):
+        # Las limpiezas corren al reves: primero se quita el parche y al final
+        # se vuelve a las reglas de config
+        self.addCleanup(reglas.cargar)
+        self.carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.carpeta)
+        self.archivo = os.path.join(self.carpeta, "reglas.json")
+        self.escribir(config.REGLAS_TRIAJE)
+
+        parche = mock.patch.object(config, "ARCHIVO_REGLAS", self.archivo)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def escribir(self, tabla, contenido=None):
+        with open(self.archivo, "w", encoding="utf-8") as f:
+            f.write(json.dumps(tabla) if contenido is None else contenido)
+        # El mtime cambia aunque la escritura caiga en el mismo instante
+        estado = os.stat(self.archivo)
+        os.utime(self.archivo, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000_000))
+
+    def test_recarga_al_cambiar_el_archivo(self):
+        with redirect_stdout(StringIO()):
+            self.assertTrue(reglas.recargar_si_cambio())
+            self.assertFalse(reglas.recargar_si_cambio())
+        version = reglas.motor().version
+        self.assertEqual(reglas.motor().clasificar(30, 120, 80, 91, "Alerta"), "Urgente")
+
+        tabla = copy.deepcopy(config.REGLAS_TRIAJE)
+        tabla["grupos"][0]["niveles"][0]["si_alguna"] = [["saturacion", "<", 85]]
+        self.escribir(tabla)
+        with redirect_stdout(StringIO()):
+            self.assertTrue(reglas.recargar_si_cambio())
+
+        self.assertEqual(reglas.motor().version, version + 1)
+        self.assertEqual(reglas.motor().clasificar(30, 120, 80, 91, "Alerta"), "Normal")
+
+    def test_archivo_invalido_mantiene_las_reglas_anteriores(self):
+        with redirect_stdout(StringIO()):
+            reglas.recargar_si_cambio()
+        anterior = reglas.motor()
+
+        self.escribir(None, "{ no es json")
+        salida = StringIO()
+        with redirect_stdout(salida):
+            self.assertFalse(reglas.recargar_si_cambio())
+            # No se reintenta hasta el proximo cambio
+            self.assertFalse(reglas.recargar_si_cambio())
+
+        self.assertIs(reglas.motor(), anterior)
+        self.assertEqual(salida.getvalue().count("[ERROR]"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
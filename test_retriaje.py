@@ -0,0 +1,43 @@
+import itertools
+import unittest
+
+from modelo import PacienteEstandar, PacienteAdultoMayor, AtencionTriage
+import retriaje
+
+
+@unittest.skipUnless(retriaje.np is not None, "NumPy no esta instalado")
+class TestRetriajePorLotes(unittest.TestCase):
+
+    def test_coincide_con_clasificar_atencion(self):
+        # Todos los bordes de las reglas de ambos grupos de edad
+        presiones = [0, 89, 90, 99, 100, 160, 161, 180, 181, 200]
+        frecuencias = [0, 54, 55, 100, 101, 110, 111, 200]
+        saturaciones = [0, 91, 92, 93, 94, 100]
+        conciencias = ["Alerta", "Verbal", "Dolor", "Inconsciente"]
+        edades = [30, 64, 65, 80]
+
+        casos = list(itertools.product(presiones, frecuencias, saturaciones, conciencias, edades))
+        esperado = []
+        for presion, frecuencia, saturacion, conciencia, edad in casos:
+            Clase = PacienteEstandar if edad < 65 else PacienteAdultoMayor
+            paciente = Clase("12345678", "Paciente Test", edad, "Femenino")
+            atencion = AtencionTriage(70, 170, presion, frecuencia, conciencia, saturacion)
+            esperado.append(paciente.clasificar_atencion(atencion))
+
+        columnas = list(zip(*casos))
+        niveles = retriaje.clasificar_lote(*columnas)
+        self.assertEqual(list(niveles), esperado)
+
+    def test_auditoria_detecta_niveles_desactualizados(self):
+        paciente = PacienteEstandar("12345678", "Paciente Test", 30, "Femenino")
+        atencion = AtencionTriage(70, 170, 120, 80, "Alerta", 85)
+        atencion.nivel_atencion = "Normal"
+        paciente.agregar_atencion(atencion)
+
+        _, niveles, discrepancias = retriaje.auditar([paciente])
+        self.assertEqual(list(niveles), ["Urgente"])
+        self.assertEqual(list(discrepancias), [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
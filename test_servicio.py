@@ -0,0 +1,203 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import config
+from almacenamiento import AlmacenJson, AlmacenSqlite
+from indices import AlmacenIndexado
+from modelo import PacienteEstandar, AtencionTriage, GestorDatos, TriageException
+from servicio import ServidorTriaje, ClienteTriaje
+
+
+class TestServicio(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.carpeta, "datos.json")
+        shutil.copy(config.ARCHIVO_DB, self.archivo)
+
+        # Como en servir() con durabilidad "inmediato": guarda el escritor en segundo plano
+        registro = AlmacenIndexado(AlmacenJson(self.archivo, durabilidad="diferido", ventana_guardado=60))
+        registro.cargar()
+        self.servidor = ServidorTriaje(registro)
+
+        # Servicio en su propio hilo con su bucle de eventos, como un proceso aparte
+        self.bucle = asyncio.new_event_loop()
+        self.hilo = threading.Thread(target=self.bucle.run_forever, daemon=True)
+        self.hilo.start()
+        self._en_bucle(self.servidor.iniciar("127.0.0.1:0"))
+        self.clientes = []
+
+    def tearDown(self):
+        for cliente in self.clientes:
+            cliente.cerrar()
+        self.assertTrue(self._en_bucle(self.servidor.detener()))
+        self.bucle.call_soon_threadsafe(self.bucle.stop)
+        self.hilo.join()
+        self.bucle.close()
+        shutil.rmtree(self.carpeta)
+
+    def _en_bucle(self, corrutina):
+        return asyncio.run_coroutine_threadsafe(corrutina, self.bucle).result(timeout=10)
+
+    def _cliente(self):
+        cliente = ClienteTriaje(self.servidor.direccion())
+        cliente.cargar()
+        self.clientes.append(cliente)
+        return cliente
+
+    def test_un_puesto_ve_lo_que_registra_otro(self):
+        puesto_a, puesto_b = self._cliente(), self._cliente()
+
+        paciente = PacienteEstandar("55556666", "Julia Rios", 35, "Femenino")
+        paciente, atencion, nuevo = puesto_a.registrar(paciente, AtencionTriage(60, 160, 85, 80, "Alerta", 97))
+        self.assertTrue(nuevo)
+        self.assertEqual(atencion.nivel_atencion, "Urgente")
+
+        self.assertEqual(puesto_b.buscar_por_dni("55556666").nombre, "Julia Rios")
+        self.assertIn("55556666", [p.dni for p in puesto_b.listar_urgentes()])
+        self.assertEqual([p.dni for p in puesto_b.buscar_por_nombre("julia")], ["55556666"])
+        self.assertEqual(puesto_b.resumen_estadisticas()["total"], puesto_b.total_pacientes())
+
+    def test_registros_concurrentes_se_guardan_todos(self):
+        puestos = [self._cliente() for _ in range(4)]
+
+        def registrar(cliente, indice):
+            for i in range(25):
+                dni = f"9{indice}{i:06d}"
+                cliente.registrar(
+                    PacienteEstandar(dni, f"Paciente {indice} {i}", 40, "Masculino"),
+                    AtencionTriage(70, 170, 120, 80, "Alerta", 98)
+                )
+
+        hilos = [threading.Thread(target=registrar, args=(c, i)) for i, c in enumerate(puestos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        total = puestos[0].total_pacientes()
+        self.assertEqual(len(list(puestos[1].listar_pacientes())), total)
+        self.assertEqual(len(GestorDatos.cargar_pacientes(self.archivo)), total)
+
+    def test_consultas_no_esperan_al_guardado(self):
+        consultas, puesto = self._cliente(), self._cliente()
+        en_disco = threading.Event()
+        seguir = threading.Event()
+        registrar_atenciones = GestorDatos.registrar_atenciones
+
+        def guardado_lento(*args, **kwargs):
+            en_disco.set()
+            seguir.wait(timeout=10)
+            return registrar_atenciones(*args, **kwargs)
+
+        resultado = []
+        with mock.patch.object(GestorDatos, "registrar_atenciones", side_effect=guardado_lento):
+            hilo = threading.Thread(target=lambda: resultado.append(puesto.registrar(
+                PacienteEstandar("55556666", "Julia Rios", 35, "Femenino"), AtencionTriage(60, 160, 85, 80, "Alerta", 97)
+            )))
+            hilo.start()
+            self.assertTrue(en_disco.wait(timeout=10))
+
+            # Mientras se guarda: el registro ya esta entero en memoria y no responde hasta guardarlo
+            self.assertEqual(consultas.buscar_por_dni("55556666").nombre, "Julia Rios")
+            self.assertIn("55556666", [p.dni for p in consultas.listar_urgentes()])
+            self.assertEqual(resultado, [])
+            seguir.set()
+            hilo.join()
+
+        self.assertTrue(resultado[0][2])
+        self.assertIsNotNone(GestorDatos.cargar_pacientes(self.archivo).buscar("55556666"))
+
+    def test_registro_invalido_devuelve_error(self):
+        cliente = self._cliente()
+        with self.assertRaises(TriageException):
+            cliente._pedir("registrar", paciente={"dni": "1"}, atencion={})
+        with self.assertRaises(TriageException):
+            cliente._pedir("borrar_todo")
+        for pedido in (b'[1]', b'"x"', b'{"op": "buscar_nombre", "texto": 5}', b'{"op"'):
+            with self.subTest(pedido=pedido):
+                cliente._archivo.write(pedido + b"\n")
+                cliente._archivo.flush()
+                self.assertFalse(json.loads(cliente._archivo.readline())["ok"])
+        # La conexion sigue sirviendo despues de un error
+        self.assertGreater(cliente.total_pacientes(), 0)
+
+    def test_pedido_demasiado_largo_cierra_la_conexion(self):
+        cliente = self._cliente()
+        cliente._archivo.write(b'{"op": "total", "relleno": "' + b"x" * (1 << 17) + b'"}\n')
+        cliente._archivo.flush()
+        self.assertEqual(json.loads(cliente._archivo.readline()), {"ok": False, "error": "Pedido demasiado largo."})
+        try:
+            fin = cliente._archivo.readline()
+        except ConnectionResetError:
+            # Cerrada con parte del pedido sin leer
+            fin = b""
+        self.assertEqual(fin, b"")
+        # Los demas puestos siguen atendidos
+        self.assertGreater(self._cliente().total_pacientes(), 0)
+
+    def test_registrar_lote_no_bloquea_el_bucle(self):
+        otro, puesto = self._cliente(), self._cliente()
+        en_registro = threading.Event()
+        seguir = threading.Event()
+        registrar_lote = self.servidor.registro.registrar_lote
+
+        def registro_lento(*args, **kwargs):
+            en_registro.set()
+            seguir.wait(timeout=10)
+            return registrar_lote(*args, **kwargs)
+
+        resultado = []
+        with mock.patch.object(self.servidor.registro, "registrar_lote", side_effect=registro_lento):
+            hilo = threading.Thread(target=lambda: resultado.append(puesto.registrar(
+                PacienteEstandar("55556666", "Julia Rios", 35, "Femenino"), AtencionTriage(60, 160, 85, 80, "Alerta", 97)
+            )))
+            hilo.start()
+            self.assertTrue(en_registro.wait(timeout=10))
+
+            # El bucle sigue atendiendo mientras se aplica el lote
+            with self.assertRaises(TriageException):
+                otro._pedir("borrar_todo")
+            seguir.set()
+            hilo.join()
+
+        self.assertTrue(resultado[0][2])
+        self.assertEqual(otro.buscar_por_dni("55556666").nombre, "Julia Rios")
+
+
+class TestServicioSqlite(unittest.TestCase):
+
+    def test_registra_y_consulta_desde_el_hilo_del_registro(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        almacen = AlmacenSqlite(os.path.join(carpeta, "datos.db"))
+        almacen.cargar()
+        almacen.importar(GestorDatos.cargar_pacientes(config.ARCHIVO_DB))
+        registro = AlmacenIndexado(almacen)
+        registro.cargar()
+        servidor = ServidorTriaje(registro)
+
+        async def probar():
+            await servidor.iniciar("127.0.0.1:0")
+            cliente = ClienteTriaje(servidor.direccion())
+            # El cliente es bloqueante: se usa desde otro hilo
+            await asyncio.to_thread(cliente.cargar)
+            _, _, nuevo = await asyncio.to_thread(
+                cliente.registrar,
+                PacienteEstandar("55556666", "Julia Rios", 35, "Femenino"), AtencionTriage(60, 160, 85, 80, "Alerta", 97)
+            )
+            encontrado = await asyncio.to_thread(cliente.buscar_por_dni, "55556666")
+            cliente.cerrar()
+            return nuevo, encontrado.nombre, await servidor.detener()
+
+        self.assertEqual(asyncio.run(probar()), (True, "Julia Rios", True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import config
+from modelo import PacienteEstandar, AtencionTriage
+from vista import Vista, FilasPaginadas, calcular_anchos, tabla_ancho_fijo
+
+
+def _pacientes(n):
+    for i in range(n):
+        p = PacienteEstandar(f"{i:08d}", f"Paciente {i}", 30, "Femenino")
+        atencion = AtencionTriage(70, 170, 120, 80, "Alerta", 98)
+        p.clasificar_atencion(atencion)
+        p.agregar_atencion(atencion)
+        yield p
+
+
+class TestFilasPaginadas(unittest.TestCase):
+
+    def test_iterador_se_consume_por_pagina(self):
+        leidos = []
+        fuente = (leidos.append(i) or i for i in range(95))
+        filas = FilasPaginadas(fuente, 20)
+
+        self.assertEqual(filas.pagina(1), list(range(20, 40)))
+        self.assertEqual(len(leidos), 40)
+        self.assertIsNone(filas.total_paginas())
+
+        self.assertEqual(filas.ajustar_pagina(99), 4)
+        self.assertEqual(filas.total_paginas(), 5)
+        self.assertEqual(filas.pagina(4), list(range(80, 95)))
+
+    def test_secuencia_no_se_copia(self):
+        datos = list(range(10))
+        filas = FilasPaginadas(datos, 4)
+        self.assertEqual(filas.total_paginas(), 3)
+        self.assertTrue(filas.cabe_en_una_pagina() is False)
+        self.assertEqual(len(filas.muestra(5)), 5)
+
+
+class TestTablaAnchoFijo(unittest.TestCase):
+
+    def test_recorta_y_alinea(self):
+        anchos = calcular_anchos(["Nombre", "Edad"], [["Nombre muy largo para la columna", 7]], maximo=10)
+        tabla = tabla_ancho_fijo(["Nombre", "Edad"], [["Nombre muy largo para la columna", 7]], anchos)
+        lineas = tabla.splitlines()
+        self.assertEqual(lineas[2], "Nombre mu… │    7")
+        self.assertEqual(len({len(l) for l in lineas}), 1)
+
+
+class TestListadoPaginado(unittest.TestCase):
+
+    def test_navegacion_entre_paginas(self):
+        vista = Vista()
+        salida = io.StringIO()
+        respuestas = iter(["S", "3", "A", ""])
+        with mock.patch("builtins.input", lambda _: next(respuestas)), \
+                mock.patch.object(Vista, "limpiar_pantalla"), mock.patch.object(config, "TAMANO_PAGINA", 20), \
+                mock.patch.object(config, "MUESTRA_ANCHOS_TABLA", 30), redirect_stdout(salida):
+            vista.mostrar_tabla_pacientes(_pacientes(50), "Prueba")
+
+        paginas = [l for l in salida.getvalue().splitlines() if l.startswith("Página")]
+        self.assertEqual(paginas, ["Página 1 de ?", "Página 2 de ?", "Página 3 de 3", "Página 2 de 3"])
+
+
+if __name__ == '__main__':
+    unittest.main()
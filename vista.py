@@ -1,7 +1,91 @@
 import os
+import random
+from itertools import islice
 from tabulate import tabulate
 import config 
 from modelo import ValidadorDni, DniInvalidoException
+from historial import formato_fecha
+
+
+class FilasPaginadas:
+
+    # Acceso por pagina a una secuencia o a un iterador. De un iterador solo
+    # se consume lo necesario para llegar a la pagina pedida, y lo leido se
+    # conserva para poder volver atras.
+
+    def __init__(self, elementos, tamano_pagina):
+        self.tamano_pagina = tamano_pagina
+        if hasattr(elementos, "__getitem__") and hasattr(elementos, "__len__"):
+            self._leidos = elementos
+            self._pendientes = None
+        else:
+            self._leidos = []
+            self._pendientes = iter(elementos)
+
+    def _leer_hasta(self, cantidad):
+        if self._pendientes is None or len(self._leidos) >= cantidad:
+            return
+        self._leidos.extend(islice(self._pendientes, cantidad - len(self._leidos)))
+        if len(self._leidos) < cantidad:
+            self._pendientes = None
+
+    def vacia(self):
+        self._leer_hasta(1)
+        return len(self._leidos) == 0
+
+    def cabe_en_una_pagina(self):
+        self._leer_hasta(self.tamano_pagina + 1)
+        return len(self._leidos) <= self.tamano_pagina
+
+    def total_paginas(self):
+        # None mientras el iterador no se haya agotado
+        if self._pendientes is not None:
+            return None
+        return max(1, -(-len(self._leidos) // self.tamano_pagina))
+
+    def ajustar_pagina(self, pagina):
+        # Limita un salto a las paginas que existen
+        pagina = max(0, pagina)
+        self._leer_hasta((pagina + 1) * self.tamano_pagina)
+        total = self.total_paginas()
+        return pagina if total is None else min(pagina, total - 1)
+
+    def pagina(self, numero):
+        inicio = numero * self.tamano_pagina
+        self._leer_hasta(inicio + self.tamano_pagina)
+        return self._leidos[inicio:inicio + self.tamano_pagina]
+
+    def muestra(self, cantidad):
+        # Secuencia completa: muestra al azar; iterador: lo ya leido
+        if self._pendientes is None and len(self._leidos) > cantidad:
+            return [self._leidos[i] for i in random.sample(range(len(self._leidos)), cantidad)]
+        self._leer_hasta(cantidad)
+        return list(self._leidos[:cantidad])
+
+
+def calcular_anchos(encabezados, filas, maximo=30):
+    anchos = [len(str(e)) for e in encabezados]
+    for fila in filas:
+        for i, celda in enumerate(fila):
+            anchos[i] = max(anchos[i], len(str(celda)))
+    return [min(a, maximo) for a in anchos]
+
+
+def tabla_ancho_fijo(encabezados, filas, anchos):
+    # Alternativa a tabulate para listados grandes: sin medir cada pagina
+    def celda(valor, ancho):
+        texto = str(valor)
+        if len(texto) > ancho:
+            texto = texto[:ancho - 1] + "…"
+        return texto.rjust(ancho) if isinstance(valor, (int, float)) else texto.ljust(ancho)
+
+    lineas = [
+        " │ ".join(celda(e, a) for e, a in zip(encabezados, anchos)),
+        "─┼─".join("─" * a for a in anchos)
+    ]
+    for fila in filas:
+        lineas.append(" │ ".join(celda(v, a) for v, a in zip(fila, anchos)))
+    return "\n".join(lineas)
 
 
 class Vista:
@@ -120,42 +204,78 @@ class Vista:
 
     def mostrar_tabla_pacientes(self, lista_pacientes, titulo="Listado de Pacientes"):
 
+        # lista_pacientes puede ser una lista o un iterador: solo se leen y
+        # formatean los pacientes de la pagina que se muestra
+        filas = FilasPaginadas(lista_pacientes, config.TAMANO_PAGINA)
+
         print(f"\n=== {titulo} ===")
 
-        if not lista_pacientes:
+        if filas.vacia():
             print("[INFO] No hay pacientes para mostrar.")
             self.pausar()
             return
-        
-        datos_tabla = []
-
-        for p in lista_pacientes:
-            at = p.obtener_ultima_atencion()
-            if at is None:
-                datos_tabla.append([
-                    p.dni,
-                    p.nombre,
-                    f"{p.edad} años",
-                    p.sexo,
-                    "-", "-", "-", "-", "-", "-", "SIN ATENCIÓN"
-                ])
+
+        if filas.cabe_en_una_pagina() and config.RENDERIZADOR_TABLAS != "fijo":
+            datos_tabla = [self._fila_paciente(p) for p in filas.pagina(0)]
+            print(tabulate(datos_tabla, headers=config.ENCABEZADOS_TABLA, tablefmt="fancy_grid"))
+            self.pausar()
+            return
+
+        self._paginar_pacientes(filas, titulo)
+
+    def _fila_paciente(self, p):
+        at = p.obtener_ultima_atencion()
+        if at is None:
+            return [
+                p.dni,
+                p.nombre,
+                f"{p.edad} años",
+                p.sexo,
+                "-", "-", "-", "-", "-", "-", "SIN ATENCIÓN"
+            ]
+        return [
+            p.dni,
+            p.nombre,
+            f"{p.edad} años",
+            p.sexo,
+            at.peso,
+            at.talla,
+            at.imc,
+            at.clasificacion_imc,
+            at.presion,
+            f"{at.saturacion}%",
+            at.nivel_atencion.upper()
+        ]
+
+    def _paginar_pacientes(self, filas, titulo):
+
+        # Anchos fijos para todas las paginas, a partir de una muestra
+        muestra = [self._fila_paciente(p) for p in filas.muestra(config.MUESTRA_ANCHOS_TABLA)]
+        anchos = calcular_anchos(config.ENCABEZADOS_TABLA, muestra)
+        pagina = 0
+
+        while True:
+            contenido = filas.pagina(pagina)
+            total = filas.total_paginas()
+
+            self.limpiar_pantalla()
+            print(f"\n=== {titulo} ===")
+            print(tabla_ancho_fijo(config.ENCABEZADOS_TABLA, [self._fila_paciente(p) for p in contenido], anchos))
+            print(f"\nPágina {pagina + 1} de {total if total is not None else '?'}")
+
+            opcion = input("[S]iguiente  [A]nterior  [N°] Ir a página  [ENTER] Volver: ").strip().upper()
+            if opcion == "":
+                return
+            if opcion == "S":
+                destino = pagina + 1
+            elif opcion == "A":
+                destino = pagina - 1
+            elif opcion.isdigit():
+                destino = int(opcion) - 1
             else:
-                datos_tabla.append([
-                    p.dni,
-                    p.nombre,
-                    f"{p.edad} años",
-                    p.sexo,
-                    at.peso,
-                    at.talla,
-                    at.imc,
-                    at.clasificacion_imc,
-                    at.presion,
-                    f"{at.saturacion}%",
-                    at.nivel_atencion.upper()
-                ])
-
-        print(tabulate(datos_tabla, headers=config.ENCABEZADOS_TABLA, tablefmt="fancy_grid"))
-        self.pausar()
+                continue
+
+            pagina = filas.ajustar_pagina(destino)
 
 
     def mostrar_reporte_paciente(self, paciente):
@@ -170,7 +290,7 @@ class Vista:
         print("\n" + "="*40)
         print(f"📄 FICHA DEL PACIENTE: {paciente.nombre.upper()}")
         print("="*40)
-        print(f"📅 Registrado: {paciente.fecha_registro}")
+        print(f"📅 Registrado: {formato_fecha(paciente.fecha_registro)}")
         print(f"👤 Edad: {paciente.edad} años | Sexo: {paciente.sexo}")
         print(f"⚖️  Peso: {p_ultima_atencion.peso} kg | Talla: {p_ultima_atencion.talla} cm")
         print("-" * 40)
@@ -196,6 +316,14 @@ class Vista:
         print("Por Nivel de Atención:")
         for k, v in stats["por_atencion"].items():
             print(f"  - {k}: {v}")
+
+        if stats.get("signos_vitales"):
+            print("-" * 40)
+            print("Signos Vitales (última atención):")
+            etiquetas = {"presion": "Presión", "frecuencia": "Frecuencia", "saturacion": "Saturación", "imc": "IMC"}
+            for signo, r in stats["signos_vitales"].items():
+                if r["promedio"] is not None:
+                    print(f"  - {etiquetas.get(signo, signo)}: prom. {r['promedio']} | mín. {r['min']} | máx. {r['max']}")
         print("=" * 40)
         self.pausar()
 
@@ -209,7 +337,7 @@ class Vista:
             except DniInvalidoException as e:
                 print(f"❌ {e}")   # muestra el error
 
-    def mostrar_historial_paciente(self, paciente):
+    def mostrar_historial_paciente(self, paciente, archivadas=()):
 
         if not paciente:
             self.mostrar_mensaje("Paciente no encontrado.", "error")
@@ -226,11 +354,14 @@ class Vista:
         print(f"DNI: {paciente.dni} | Edad: {paciente.edad} años | Sexo: {paciente.sexo}")
         print("="*50)
 
+        if archivadas:
+            print(f"Incluye {len(archivadas)} atenciones del archivo histórico.")
+
         filas = []
-        for i, a in enumerate(paciente.lista_atencion_triage, start=1):
+        for i, a in enumerate(list(archivadas) + list(paciente.lista_atencion_triage), start=1):
             filas.append([
                 i,
-                a.fecha_registro,
+                formato_fecha(a.fecha_registro),
                 a.peso,
                 a.talla,
                 a.imc,